@@ -4,6 +4,7 @@ from django.contrib.contenttypes.admin import GenericTabularInline
 from django.forms import models
 
 from store.admin import ProductAdmin
+from store.fastadmin import FastAdminMixin
 from tags.models import TaggedItem
 from store.models import Product
 
@@ -11,7 +12,7 @@ from core.models import User
 
 
 @admin.register(User)
-class UserAdmin(BaseUserAdmin):
+class UserAdmin(FastAdminMixin, BaseUserAdmin):
     add_fieldsets = (
         (None, {
             'classes': ('wide',),
@@ -0,0 +1,24 @@
+from django.contrib.contenttypes.models import ContentType
+from django.db import models
+
+
+def group_by_content_type(targets):
+    """
+    Turns (model, ids) pairs into {content_type_id: (model, ids)},
+    merging the ids of pairs for the same model.
+    """
+    groups = {}
+    for model, ids in targets:
+        content_type = ContentType.objects.get_for_model(model)
+        _, group_ids = groups.setdefault(content_type.id, (model, set()))
+        group_ids.update(ids)
+    return groups
+
+
+def generic_condition(groups):
+    # one (content_type, object_id IN ...) branch per model, served by
+    # the (content_type, object_id) index
+    condition = models.Q(pk__in=[])
+    for content_type_id, (_, ids) in groups.items():
+        condition |= models.Q(content_type_id=content_type_id, object_id__in=ids)
+    return condition
@@ -4,3 +4,9 @@ from django.contrib.auth.models import AbstractUser
 
 class User(AbstractUser):
     email = models.EmailField(unique=True)
+
+    class Meta(AbstractUser.Meta):
+        # customers are ordered and searched by name
+        indexes = [
+            models.Index(fields=['first_name', 'last_name'], name='core_user_name_idx'),
+        ]
@@ -0,0 +1,112 @@
+import atexit
+import threading
+from functools import lru_cache
+
+from django.conf import settings
+from django.db import connections
+from django.dispatch import Signal
+
+from core.generic import group_by_content_type
+from likes.models import LikeCounter
+
+# sent after pending changes reached the database, with
+# changes={(content_type_id, object_id): delta}
+like_counts_flushed = Signal()
+
+
+class LikeCounterBuffer:
+    """
+    Collects like counter changes in memory and writes them in batches,
+    so a burst of likes on a popular object becomes a single UPDATE.
+
+    Changes are flushed `flush_interval` seconds after the first pending
+    one by a timer thread, as soon as `max_pending` objects have pending
+    changes, and when the process exits. With `flush_interval` 0 every
+    change is written right away.
+    """
+
+    def __init__(self, flush_interval=5, max_pending=1000):
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+        self.pending = {}
+        self.lock = threading.Lock()
+        self.timer = None
+
+    def add(self, content_type_id, object_id, delta):
+        key = (content_type_id, object_id)
+        with self.lock:
+            self.pending[key] = self.pending.get(key, 0) + delta
+            full = len(self.pending) >= self.max_pending
+            if not full and self.flush_interval and self.timer is None:
+                self.timer = threading.Timer(self.flush_interval, self.flush_from_timer)
+                self.timer.daemon = True
+                self.timer.start()
+        if full or not self.flush_interval:
+            self.flush()
+
+    def pending_for_many(self, targets):
+        """Returns {(model, id): delta} of the changes not flushed yet."""
+        if not self.pending:
+            return {}
+        groups = group_by_content_type(targets)
+        with self.lock:
+            pending = dict(self.pending)
+        deltas = {}
+        for (content_type_id, object_id), delta in pending.items():
+            group = groups.get(content_type_id)
+            if group and object_id in group[1] and delta:
+                deltas[(group[0], object_id)] = delta
+        return deltas
+
+    def flush(self):
+        """Writes the pending changes and returns how many objects changed."""
+        with self.lock:
+            changes, self.pending = self.pending, {}
+            if self.timer is not None:
+                self.timer.cancel()
+                self.timer = None
+        if not changes:
+            return 0
+        try:
+            LikeCounter.objects.apply(changes)
+        except Exception:
+            # keep the changes for the next flush instead of losing them
+            with self.lock:
+                for key, delta in changes.items():
+                    self.pending[key] = self.pending.get(key, 0) + delta
+            raise
+        like_counts_flushed.send(sender=LikeCounter, changes=changes)
+        return len(changes)
+
+    def flush_from_timer(self):
+        try:
+            self.flush()
+        finally:
+            # the timer thread's connections are not closed by Django
+            connections.close_all()
+
+
+@lru_cache(maxsize=None)
+def get_like_counter_buffer():
+    buffer = LikeCounterBuffer(
+        flush_interval=getattr(settings, 'LIKES_COUNTER_FLUSH_INTERVAL', 5),
+        max_pending=getattr(settings, 'LIKES_COUNTER_MAX_PENDING', 1000))
+    atexit.register(buffer.flush)
+    return buffer
+
+
+def prefetch_like_counts(instances, to_attr='likes_count'):
+    """
+    Sets `to_attr` on each instance to its number of likes, read for all
+    the instances, of any models, from the counters in one query.
+    Changes of this process that are not flushed yet are included.
+    """
+    ids = {}
+    for instance in instances:
+        ids.setdefault(type(instance), []).append(instance.pk)
+    counts = LikeCounter.objects.get_counts_for_many(ids.items())
+    pending = get_like_counter_buffer().pending_for_many(ids.items())
+    for key, delta in pending.items():
+        counts[key] = counts.get(key, 0) + delta
+    for instance in instances:
+        setattr(instance, to_attr, counts.get((type(instance), instance.pk), 0))
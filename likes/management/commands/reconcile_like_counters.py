@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from likes.models import LikeCounter
+
+
+class Command(BaseCommand):
+    help = 'Rebuilds the like counters from the liked items.'
+
+    def handle(self, *args, **options):
+        changed = LikeCounter.objects.reconcile()
+        self.stdout.write(self.style.SUCCESS(f'{changed} like counters fixed.'))
@@ -0,0 +1,41 @@
+# Generated by Django 4.0.3 on 2026-10-18 03:48
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def count_likes(apps, schema_editor):
+    LikedItem = apps.get_model('likes', 'LikedItem')
+    LikeCounter = apps.get_model('likes', 'LikeCounter')
+    counts = LikedItem.objects \
+        .order_by() \
+        .values_list('content_type_id', 'object_id') \
+        .annotate(count=models.Count('id'))
+    LikeCounter.objects.bulk_create(
+        [LikeCounter(content_type_id=content_type_id, object_id=object_id, count=count)
+         for content_type_id, object_id, count in counts],
+        batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('contenttypes', '0002_remove_content_type_name'),
+        ('likes', '0002_likeditem_object_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LikeCounter',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('object_id', models.PositiveIntegerField()),
+                ('count', models.IntegerField(default=0)),
+                ('content_type', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='contenttypes.contenttype')),
+            ],
+            options={
+                'unique_together': {('content_type', 'object_id')},
+            },
+        ),
+        migrations.RunPython(count_likes, migrations.RunPython.noop),
+    ]
@@ -1,13 +1,124 @@
 from django.conf import settings
-from django.db import models
+from django.db import models, transaction
 from django.contrib.auth.models import User
 from django.contrib.contenttypes.models import ContentType
 from django.contrib.contenttypes.fields import GenericForeignKey
 
+from core.generic import generic_condition, group_by_content_type
+
+
+class LikedItemManager(models.Manager):
+    def get_counts_for_many(self, targets):
+        """
+        Returns {(model, id): number of likes} for (model, ids) pairs,
+        from a single grouped query. Objects without likes are left out.
+        """
+        groups = group_by_content_type(targets)
+        counts = {}
+        if not groups:
+            return counts
+        rows = self.filter(generic_condition(groups)) \
+            .values_list('content_type_id', 'object_id') \
+            .annotate(count=models.Count('id')) \
+            .order_by()
+        for content_type_id, object_id, count in rows:
+            model, _ = groups[content_type_id]
+            counts[(model, object_id)] = count
+        return counts
+
 
 class LikedItem(models.Model):
+    objects = LikedItemManager()
     user = models.ForeignKey(settings.AUTH_USER_MODEL,
                              on_delete=models.CASCADE)
     content_type = models.ForeignKey(ContentType, on_delete=models.CASCADE)
     object_id = models.PositiveIntegerField()
     content_object = GenericForeignKey()
+
+    class Meta:
+        # generic relations are always looked up by both columns
+        indexes = [
+            models.Index(fields=['content_type', 'object_id'],
+                         name='likes_likeditem_object_idx'),
+        ]
+
+
+class LikeCounterManager(models.Manager):
+    def get_counts_for_many(self, targets):
+        """
+        Returns {(model, id): number of likes} for (model, ids) pairs from
+        the maintained counters, one unique index lookup per object.
+        Objects without a counter are left out.
+        """
+        groups = group_by_content_type(targets)
+        counts = {}
+        if not groups:
+            return counts
+        rows = self.filter(generic_condition(groups)) \
+            .values_list('content_type_id', 'object_id', 'count')
+        for content_type_id, object_id, count in rows:
+            model, _ = groups[content_type_id]
+            counts[(model, object_id)] = count
+        return counts
+
+    def apply(self, deltas):
+        """
+        Adds {(content_type_id, object_id): delta} to the counters: one
+        INSERT creating the missing rows, then one UPDATE ... SET count =
+        count + n per distinct (content type, delta).
+        """
+        deltas = {key: delta for key, delta in deltas.items() if delta}
+        if not deltas:
+            return
+        by_delta = {}
+        for (content_type_id, object_id), delta in deltas.items():
+            by_delta.setdefault((content_type_id, delta), []).append(object_id)
+        with transaction.atomic():
+            self.bulk_create(
+                [LikeCounter(content_type_id=content_type_id, object_id=object_id)
+                 for content_type_id, object_id in deltas],
+                batch_size=1000, ignore_conflicts=True)
+            for (content_type_id, delta), object_ids in by_delta.items():
+                self.filter(content_type_id=content_type_id, object_id__in=object_ids) \
+                    .update(count=models.F('count') + delta)
+
+    def reconcile(self):
+        """
+        Recounts likes with one GROUP BY over LikedItem and fixes the
+        counters that drifted, creating missing ones. Returns the number
+        of counters changed.
+        """
+        counts = {
+            (content_type_id, object_id): count
+            for content_type_id, object_id, count in LikedItem.objects
+            .order_by()
+            .values_list('content_type_id', 'object_id')
+            .annotate(count=models.Count('id'))
+        }
+        drifted = []
+        for counter in self.iterator():
+            count = counts.pop((counter.content_type_id, counter.object_id), 0)
+            if counter.count != count:
+                counter.count = count
+                drifted.append(counter)
+        missing = [
+            LikeCounter(content_type_id=content_type_id, object_id=object_id, count=count)
+            for (content_type_id, object_id), count in counts.items()
+        ]
+        with transaction.atomic():
+            self.bulk_update(drifted, ['count'], batch_size=1000)
+            self.bulk_create(missing, batch_size=1000)
+        return len(drifted) + len(missing)
+
+
+class LikeCounter(models.Model):
+    # number of likes per object, maintained by likes.counters so reading
+    # it never counts LikedItem rows
+    objects = LikeCounterManager()
+    content_type = models.ForeignKey(ContentType, on_delete=models.CASCADE)
+    object_id = models.PositiveIntegerField()
+    count = models.IntegerField(default=0)
+
+    class Meta:
+        unique_together = [['content_type', 'object_id']]
+
@@ -0,0 +1,22 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from likes.counters import get_like_counter_buffer
+from likes.models import LikedItem
+
+
+def count_like(instance, delta):
+    # only counted once the like is committed
+    transaction.on_commit(lambda: get_like_counter_buffer().add(
+        instance.content_type_id, instance.object_id, delta))
+
+
+@receiver(post_save, sender=LikedItem)
+def count_saved_like(sender, **kwargs):
+    if kwargs['created'] and not kwargs['raw']:
+        count_like(kwargs['instance'], 1)
+
+
+@receiver(post_delete, sender=LikedItem)
+def count_deleted_like(sender, **kwargs):
+    count_like(kwargs['instance'], -1)
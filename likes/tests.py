@@ -1,3 +1,128 @@
-from django.test import TestCase
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.contenttypes.models import ContentType
+from django.test import TestCase, TransactionTestCase
+
+from core.models import User
+from likes.counters import LikeCounterBuffer, like_counts_flushed
+from likes.models import LikeCounter, LikedItem
+
+
+def counts():
+    return {
+        (content_type_id, object_id): count
+        for content_type_id, object_id, count in LikeCounter.objects
+        .values_list('content_type_id', 'object_id', 'count')
+    }
+
+
+class LikeCounterBufferTest(TestCase):
+    def setUp(self):
+        self.content_type_id = ContentType.objects.get_for_model(User).id
+        self.flushed = []
+
+        def receiver(sender, changes, **kwargs):
+            self.flushed.append(changes)
+        like_counts_flushed.connect(receiver, weak=False)
+        self.addCleanup(like_counts_flushed.disconnect, receiver)
+
+    def key(self, object_id):
+        return (self.content_type_id, object_id)
+
+    def test_flushes_once_max_pending_objects_changed(self):
+        buffer = LikeCounterBuffer(flush_interval=60, max_pending=3)
+        self.addCleanup(buffer.flush)
+        buffer.add(self.content_type_id, 1, 1)
+        buffer.add(self.content_type_id, 1, 1)
+        buffer.add(self.content_type_id, 2, -1)
+        self.assertEqual(counts(), {})
+        self.assertIsNotNone(buffer.timer)
+
+        # one UPDATE per distinct delta, after the INSERT of missing counters
+        with self.assertNumQueries(6):
+            buffer.add(self.content_type_id, 3, 1)
+        self.assertEqual(counts(), {self.key(1): 2, self.key(2): -1, self.key(3): 1})
+        self.assertEqual(self.flushed, [{self.key(1): 2, self.key(2): -1, self.key(3): 1}])
+        self.assertEqual(buffer.pending, {})
+        self.assertIsNone(buffer.timer)
+
+    def test_without_interval_every_change_is_written(self):
+        buffer = LikeCounterBuffer(flush_interval=0)
+        buffer.add(self.content_type_id, 1, 1)
+        buffer.add(self.content_type_id, 1, 1)
+        self.assertEqual(counts(), {self.key(1): 2})
+        self.assertEqual(len(self.flushed), 2)
+        self.assertIsNone(buffer.timer)
+
+    def test_pending_changes_are_read_with_the_counters(self):
+        user = User.objects.create_user('liked', 'liked@example.com', 'password')
+        buffer = LikeCounterBuffer(flush_interval=60)
+        self.addCleanup(buffer.flush)
+        buffer.add(self.content_type_id, user.pk, 2)
+        buffer.add(self.content_type_id, user.pk + 1, 1)
+        self.assertEqual(buffer.pending_for_many([(User, [user.pk])]), {(User, user.pk): 2})
+
+    def test_failed_flush_keeps_the_changes(self):
+        buffer = LikeCounterBuffer(flush_interval=60)
+        self.addCleanup(buffer.flush)
+        buffer.add(self.content_type_id, 1, 1)
+        with mock.patch.object(LikeCounter.objects, 'apply', side_effect=RuntimeError):
+            with self.assertRaises(RuntimeError):
+                buffer.flush()
+        buffer.add(self.content_type_id, 1, 1)
+        self.assertEqual(buffer.pending, {self.key(1): 2})
+        self.assertEqual(self.flushed, [])
+
+    def test_likes_are_counted_once_committed(self):
+        user = User.objects.create_user('liker', 'liker@example.com', 'password')
+        buffer = LikeCounterBuffer(flush_interval=0)
+        with mock.patch('likes.signals.handlers.get_like_counter_buffer', return_value=buffer):
+            with self.captureOnCommitCallbacks(execute=True):
+                like = LikedItem.objects.create(
+                    user=user, content_type_id=self.content_type_id, object_id=user.pk)
+                self.assertEqual(counts(), {})
+            self.assertEqual(counts(), {self.key(user.pk): 1})
+            with self.captureOnCommitCallbacks(execute=True):
+                like.delete()
+        self.assertEqual(counts(), {self.key(user.pk): 0})
+
+
+class LikeCounterTimerTest(TransactionTestCase):
+    def test_flushes_after_the_interval(self):
+        content_type_id = ContentType.objects.get_for_model(User).id
+        buffer = LikeCounterBuffer(flush_interval=0.05)
+        buffer.add(content_type_id, 1, 1)
+        timer = buffer.timer
+        buffer.add(content_type_id, 1, 1)
+        # one timer for every change pending
+        self.assertIs(buffer.timer, timer)
+        self.assertEqual(counts(), {})
+
+        timer.join(5)
+        self.assertFalse(timer.is_alive())
+        self.assertEqual(counts(), {(content_type_id, 1): 2})
+        self.assertIsNone(buffer.timer)
+
+
+class ReconcileTest(TestCase):
+    def test_drifted_and_missing_counters_are_fixed(self):
+        content_type_id = ContentType.objects.get_for_model(User).id
+        users = [User.objects.create_user(f'user{i}', f'user{i}@example.com', 'password')
+                 for i in range(3)]
+        # likes committed nowhere, so the counters only move as set here
+        for user in users:
+            LikedItem.objects.create(user=user, content_type_id=content_type_id, object_id=users[0].pk)
+        LikedItem.objects.create(user=users[0], content_type_id=content_type_id, object_id=users[1].pk)
+        LikeCounter.objects.apply({
+            (content_type_id, users[0].pk): 3,
+            (content_type_id, users[2].pk): 4,
+        })
+        LikeCounter.objects.filter(object_id=users[0].pk).update(count=5)
+
+        self.assertEqual(LikeCounter.objects.reconcile(), 3)
+        self.assertEqual(counts(), {
+            (content_type_id, users[0].pk): 3,
+            (content_type_id, users[1].pk): 1,
+            (content_type_id, users[2].pk): 0,
+        })
+        self.assertEqual(LikeCounter.objects.reconcile(), 0)
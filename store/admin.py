@@ -1,9 +1,18 @@
+import io
+
+from django import forms
+from django.core.exceptions import PermissionDenied
 from django.contrib import admin, messages
 from django.db.models.aggregates import Count
 from django.db.models.query import QuerySet
+from django.http import StreamingHttpResponse
+from django.shortcuts import redirect
+from django.template.response import TemplateResponse
 from django.utils.html import format_html, urlencode
-from django.urls import reverse
+from django.urls import path, reverse
 from . import models
+from .fastadmin import FastAdminMixin
+from .importexport import ProductImporter, export_rows, read_rows, render_rows
 
 
 class InventoryFilter(admin.SimpleListFilter):
@@ -20,19 +29,28 @@ class InventoryFilter(admin.SimpleListFilter):
             return queryset.filter(inventory__lt=10)
 
 
+class ProductImportForm(forms.Form):
+    file = forms.FileField()
+    format = forms.ChoiceField(choices=[('csv', 'CSV'), ('jsonl', 'JSON Lines')])
+
+
 @admin.register(models.Product)
-class ProductAdmin(admin.ModelAdmin):
+class ProductAdmin(FastAdminMixin, admin.ModelAdmin):
     autocomplete_fields = ['collection']
     prepopulated_fields = {
         'slug': ['title']
     }
-    actions = ['clear_inventory']
+    actions = ['clear_inventory', 'export_products']
+    change_list_template = 'admin/store/product/change_list.html'
     list_display = ['title', 'unit_price',
                     'inventory_status', 'collection_title']
     list_editable = ['unit_price']
+    list_display_fields = {
+        'inventory_status': ['inventory'],
+        'collection_title': ['collection__title'],
+    }
     list_filter = ['collection', 'last_update', InventoryFilter]
     list_per_page = 10
-    list_select_related = ['collection']
     search_fields = ['title']
 
     def collection_title(self, product):
@@ -53,6 +71,42 @@ class ProductAdmin(admin.ModelAdmin):
             messages.ERROR
         )
 
+    @admin.action(description='Export as CSV')
+    def export_products(self, request, queryset):
+        response = StreamingHttpResponse(
+            render_rows(export_rows(queryset), 'csv'), content_type='text/csv')
+        response['Content-Disposition'] = 'attachment; filename="products.csv"'
+        return response
+
+    def get_urls(self):
+        return [
+            path('import/', self.admin_site.admin_view(self.import_products),
+                 name='store_product_import'),
+        ] + super().get_urls()
+
+    def import_products(self, request):
+        if not self.has_add_permission(request) or not self.has_change_permission(request):
+            raise PermissionDenied
+        form = ProductImportForm(request.POST or None, request.FILES or None)
+        if request.method == 'POST' and form.is_valid():
+            stream = io.TextIOWrapper(
+                form.cleaned_data['file'].file, encoding='utf-8', newline='')
+            importer = ProductImporter()
+            stats = importer.run(read_rows(stream, form.cleaned_data['format']))
+            self.message_user(
+                request,
+                f'{stats["created"]} products created, {stats["updated"]} updated.',
+                messages.SUCCESS)
+            for row, errors in importer.errors[:10]:
+                self.message_user(request, f'Row {row}: {errors}', messages.ERROR)
+            return redirect('admin:store_product_changelist')
+        return TemplateResponse(request, 'admin/store/product/import.html', {
+            **self.admin_site.each_context(request),
+            'opts': self.model._meta,
+            'form': form,
+            'title': 'Import products',
+        })
+
 
 @admin.register(models.Collection)
 class CollectionAdmin(admin.ModelAdmin):
@@ -70,19 +124,20 @@ class CollectionAdmin(admin.ModelAdmin):
             }))
         return format_html('<a href="{}">{} Products</a>', url, collection.products_count)
 
-    def get_queryset(self, request):
-        return super().get_queryset(request).annotate(
-            products_count=Count('products')
-        )
-
 
 @admin.register(models.Customer)
-class CustomerAdmin(admin.ModelAdmin):
+class CustomerAdmin(FastAdminMixin, admin.ModelAdmin):
     # autocomplete_fields = ['user']
     list_display = ['first_name', 'last_name',  'membership', 'orders']
+    list_display_fields = {
+        'first_name': ['user__first_name'],
+        'last_name': ['user__last_name'],
+        'orders': [],
+    }
     list_editable = ['membership']
     list_per_page = 10
-    list_select_related = ['user']
+    # counted for the customers of the page
+    page_annotations = {'orders_count': Count('order')}
     search_fields = ['user__first_name__istartswith',
                      'user__last_name__istartswith']
 
@@ -104,11 +159,6 @@ class CustomerAdmin(admin.ModelAdmin):
             }))
         return format_html('<a href="{}">{} Orders</a>', url, customer.orders_count)
 
-    def get_queryset(self, request):
-        return super().get_queryset(request).annotate(
-            orders_count=Count('order')
-        )
-
 
 class OrderItemInline(admin.TabularInline):
     autocomplete_fields = ['product']
@@ -119,7 +169,9 @@ class OrderItemInline(admin.TabularInline):
 
 
 @admin.register(models.Order)
-class OrderAdmin(admin.ModelAdmin):
+class OrderAdmin(FastAdminMixin, admin.ModelAdmin):
     autocomplete_fields = ['customer']
     inlines = [OrderItemInline]
     list_display = ['id', 'placed_at', 'customer']
+    # what Customer.__str__ reads
+    list_display_fields = {'customer': ['customer__user__first_name', 'customer__user__last_name']}
@@ -0,0 +1,181 @@
+from datetime import datetime, time, timedelta
+from itertools import islice
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, Max, Min, Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from store.models import (
+    CollectionSales, MembershipSales, Order, OrderItem, ProductSales, RollupWatermark, line_total)
+
+SALES_WATERMARK = 'sales'
+
+# each rollup model, the order item lookup it groups by and the field
+# the group is stored in
+ROLLUPS = [
+    (ProductSales, 'product_id', 'product_id'),
+    (CollectionSales, 'product__collection_id', 'collection_id'),
+    (MembershipSales, 'order__customer__membership', 'membership'),
+]
+
+
+def day_start(day):
+    return timezone.make_aware(datetime.combine(day, time.min))
+
+
+def day_ranges(days, max_days=7):
+    """Splits sorted days into (first, last) runs of consecutive days."""
+    ranges = []
+    for day in days:
+        if ranges and day - ranges[-1][1] == timedelta(days=1) \
+                and (day - ranges[-1][0]).days < max_days:
+            ranges[-1][1] = day
+        else:
+            ranges.append([day, day])
+    return [tuple(run) for run in ranges]
+
+
+def rollup_days(first_day, last_day, batch_size=5000):
+    """
+    Recomputes the sales rollups of the days from `first_day` to
+    `last_day` included from their completed orders, and returns the
+    number of rows written. Days are those of the current time zone.
+    """
+    items = OrderItem.objects \
+        .filter(order__payment_status=Order.PAYMENT_STATUS_COMPLETE,
+                order__placed_at__gte=day_start(first_day),
+                order__placed_at__lt=day_start(last_day + timedelta(days=1))) \
+        .annotate(day=TruncDate('order__placed_at')) \
+        .order_by()
+    written = 0
+    with transaction.atomic():
+        for model, lookup, field in ROLLUPS:
+            model.objects.filter(day__range=(first_day, last_day)).delete()
+            groups = items.values('day', lookup).annotate(
+                orders_count=Count('order_id', distinct=True),
+                items_count=Sum('quantity'),
+                revenue=Sum(line_total()))
+            rows = (
+                model(day=group['day'], orders_count=group['orders_count'],
+                      items_count=group['items_count'], revenue=group['revenue'],
+                      **{field: group[lookup]})
+                for group in groups.iterator()
+            )
+            while batch := list(islice(rows, batch_size)):
+                model.objects.bulk_create(batch)
+                written += len(batch)
+    return written
+
+
+def lock_watermark(name=SALES_WATERMARK):
+    # rollup runs wait on each other here, call in a transaction
+    watermark, _ = RollupWatermark.objects.select_for_update().get_or_create(name=name)
+    return watermark
+
+
+def settled_until():
+    # orders changed more recently may belong to transactions that
+    # haven't committed yet, they are left to the next run
+    return timezone.now() - timedelta(
+        seconds=getattr(settings, 'STORE_ANALYTICS_SETTLE_SECONDS', 60))
+
+
+def update_sales_rollups():
+    """
+    Brings the sales rollups up to date with the orders changed since the
+    last run, the watermark, and returns the days recomputed.
+
+    Every order saved since then, whatever its status, has the day it was
+    placed at recomputed from scratch, so an order completing, failing or
+    having its items edited is counted once. Runs are meant to be
+    frequent, e.g. every few minutes with the update_sales_rollups
+    command, and only read the orders and days that changed.
+    """
+    until = settled_until()
+    with transaction.atomic():
+        watermark = lock_watermark()
+        orders = Order.objects.filter(last_update__lte=until)
+        if watermark.value is not None:
+            if watermark.value >= until:
+                return []
+            orders = orders.filter(last_update__gt=watermark.value)
+        days = sorted(orders
+                      .annotate(day=TruncDate('placed_at'))
+                      .order_by()
+                      .values_list('day', flat=True)
+                      .distinct())
+        for first_day, last_day in day_ranges(days):
+            rollup_days(first_day, last_day)
+        watermark.value = until
+        watermark.save()
+    return days
+
+
+def backfill_sales_rollups(first_day=None, last_day=None, batch_days=7, progress=None):
+    """
+    Recomputes the sales rollups of every day from `first_day` to
+    `last_day`, the first and last days with orders by default, one
+    transaction per `batch_days` days. Calls `progress(first, last,
+    rows)` after each batch and returns the number of rows written.
+
+    A full backfill also moves the watermark to when it started, so the
+    following update only looks at orders changed since.
+    """
+    until = settled_until()
+    full = first_day is None and last_day is None
+    if first_day is None or last_day is None:
+        first, last = Order.objects.aggregate(Min('placed_at'), Max('placed_at')).values()
+        if first is None:
+            return 0
+        first_day = first_day or timezone.localdate(first)
+        last_day = last_day or timezone.localdate(last)
+
+    written = 0
+    day = first_day
+    while day <= last_day:
+        batch_last = min(day + timedelta(days=batch_days - 1), last_day)
+        with transaction.atomic():
+            lock_watermark()
+            rows = rollup_days(day, batch_last)
+        written += rows
+        if progress:
+            progress(day, batch_last, rows)
+        day = batch_last + timedelta(days=1)
+
+    if full:
+        with transaction.atomic():
+            watermark = lock_watermark()
+            if watermark.value is None or watermark.value < until:
+                watermark.value = until
+                watermark.save()
+    return written
+
+
+def rollup_days_on_commit(days):
+    """
+    Recomputes the rollups of `days` once the current transaction
+    commits, for changes that leave no order for update_sales_rollups to
+    find, i.e. deleted orders. Right away outside of a transaction.
+    """
+    def rollup():
+        with transaction.atomic():
+            lock_watermark()
+            for first_day, last_day in day_ranges(sorted(set(days))):
+                rollup_days(first_day, last_day)
+    transaction.on_commit(rollup)
+
+
+def touch_orders(orders):
+    # marks orders as changed for the next update_sales_rollups, for
+    # changes the rollups depend on that don't save the order itself
+    orders.update(last_update=timezone.now())
+
+
+def summarize(rollups, *group_by):
+    """Sums rollup rows over days, grouped by `group_by`."""
+    return rollups.values(*group_by).annotate(
+        orders_count=Sum('orders_count'),
+        items_count=Sum('items_count'),
+        revenue=Sum('revenue')).order_by()
@@ -0,0 +1,27 @@
+# Awaitable versions of the queryset methods the async views need. Django
+# 4.1+ ships them on QuerySet (aget, acount, async for), on older versions
+# the sync methods run in a worker thread, like Django does for sync views
+# under ASGI.
+from asgiref.sync import sync_to_async
+from django.db.models import QuerySet
+
+NATIVE = hasattr(QuerySet, 'aget')
+
+
+async def aget(queryset, *args, **kwargs):
+    if NATIVE:
+        return await queryset.aget(*args, **kwargs)
+    return await sync_to_async(queryset.get)(*args, **kwargs)
+
+
+async def acount(queryset):
+    if NATIVE:
+        return await queryset.acount()
+    return await sync_to_async(queryset.count)()
+
+
+async def alist(queryset):
+    # async iteration doesn't support prefetch_related before Django 5.0
+    if NATIVE and not queryset._prefetch_related_lookups:
+        return [obj async for obj in queryset]
+    return await sync_to_async(list)(queryset)
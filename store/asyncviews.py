@@ -0,0 +1,142 @@
+from asgiref.sync import sync_to_async
+from django.core.exceptions import ObjectDoesNotExist
+from django.urls import URLPattern
+from rest_framework.exceptions import NotFound
+from rest_framework.renderers import JSONRenderer
+from rest_framework.response import Response
+
+from store.asyncorm import aget, alist
+from store.caching import CachedResponseMixin
+from store.pagination import KeysetPagination
+
+
+class AsyncReadMixin:
+    """
+    Async counterparts of list and retrieve, named alist and aretrieve,
+    for viewsets mounted with async_urlpatterns. They use the viewset's
+    own filters, pagination and serializer. Building the queryset (filters
+    may look up related rows) and serializing run in worker threads, the
+    page and object reads are awaited.
+    """
+
+    async def alist(self, request, *args, **kwargs):
+        if isinstance(self, CachedResponseMixin):
+            return await self.acached(self._alist, request, *args, **kwargs)
+        return await self._alist(request, *args, **kwargs)
+
+    async def _alist(self, request, *args, **kwargs):
+        queryset = await sync_to_async(self.get_filtered_queryset)()
+        if self.paginator is None:
+            objects = await alist(queryset)
+        else:
+            objects = await self.paginator.apaginate_queryset(queryset, request, view=self)
+        data = await sync_to_async(self.serialize)(objects, many=True)
+        if self.paginator is None:
+            return Response(data)
+        return self.paginator.get_paginated_response(data)
+
+    async def aretrieve(self, request, *args, **kwargs):
+        if isinstance(self, CachedResponseMixin):
+            return await self.acached(self._aretrieve, request, *args, **kwargs)
+        return await self._aretrieve(request, *args, **kwargs)
+
+    async def _aretrieve(self, request, *args, **kwargs):
+        obj = await self.aget_object()
+        return Response(await sync_to_async(self.serialize)(obj))
+
+    async def aget_object(self):
+        # GenericAPIView.get_object with the lookup awaited
+        queryset = await sync_to_async(self.get_filtered_queryset)()
+        lookup_url_kwarg = self.lookup_url_kwarg or self.lookup_field
+        try:
+            obj = await aget(queryset, **{self.lookup_field: self.kwargs[lookup_url_kwarg]})
+        except (ObjectDoesNotExist, TypeError, ValueError):
+            raise NotFound()
+        self.check_object_permissions(self.request, obj)
+        return obj
+
+    def get_filtered_queryset(self):
+        return self.filter_queryset(self.get_queryset())
+
+    def serialize(self, objects, many=False):
+        if hasattr(self, 'prefetch_objects'):
+            self.prefetch_objects(objects if many else [objects])
+        return self.get_serializer(objects, many=many).data
+
+    def serves_async(self, request):
+        # the browsable API, ?page= and streamed lists keep the sync path
+        if not isinstance(request.accepted_renderer, JSONRenderer):
+            return False
+        paginator = self.paginator
+        if paginator is not None and not hasattr(paginator, 'apaginate_queryset'):
+            return False
+        if isinstance(paginator, KeysetPagination) and \
+                paginator.fallback_class.page_query_param in request.query_params:
+            return False
+        stream_query_param = getattr(self, 'stream_query_param', None)
+        return stream_query_param is None or stream_query_param not in request.query_params
+
+
+def as_async_view(callback):
+    """
+    Wraps a router generated viewset view so GET requests whose action has
+    an async handler (`a<action>`) run on the event loop. Other requests
+    are passed to the sync view unchanged.
+    """
+    viewset, actions, initkwargs = callback.cls, callback.actions, callback.initkwargs
+    sync_view = sync_to_async(callback)
+
+    async def view(request, *args, **kwargs):
+        action = actions.get(request.method.lower())
+        handler_name = f'a{action}'
+        if request.method != 'GET' or not hasattr(viewset, handler_name):
+            return await sync_view(request, *args, **kwargs)
+
+        # what ViewSetMixin.as_view and APIView.dispatch set up
+        self = viewset(**initkwargs)
+        self.action_map = actions
+        for method, name in actions.items():
+            setattr(self, method, getattr(self, name))
+        self.args, self.kwargs = args, kwargs
+        drf_request = self.initialize_request(request, *args, **kwargs)
+        self.request = drf_request
+        self.headers = self.default_response_headers
+        try:
+            # authentication may query the database
+            await sync_to_async(self.initial)(drf_request, *args, **kwargs)
+            serves_async = getattr(self, 'serves_async', None)
+            if serves_async is not None and not serves_async(drf_request):
+                return await sync_view(request, *args, **kwargs)
+            response = await getattr(self, handler_name)(drf_request, *args, **kwargs)
+        except Exception as exc:
+            response = self.handle_exception(exc)
+
+        # finalizing renders the response and may write it to the cache
+        def finalize():
+            finalized = self.finalize_response(drf_request, response, *args, **kwargs)
+            if hasattr(finalized, 'render') and not finalized.is_rendered:
+                finalized.render()
+            return finalized
+        return await sync_to_async(finalize)()
+
+    view.cls, view.actions, view.initkwargs = viewset, actions, initkwargs
+    view.csrf_exempt = True
+    return view
+
+
+def async_urlpatterns(urlpatterns, viewsets):
+    """
+    Async views for the GET routes of `viewsets` among router generated
+    `urlpatterns`, with the same patterns and names. Put them in front of
+    the router's patterns, format suffixed routes stay sync.
+    """
+    patterns = []
+    for pattern in urlpatterns:
+        callback = pattern.callback
+        if getattr(callback, 'cls', None) not in viewsets or \
+                'get' not in getattr(callback, 'actions', {}) or \
+                'format' in pattern.pattern.regex.groupindex:
+            continue
+        patterns.append(URLPattern(
+            pattern.pattern, as_async_view(callback), pattern.default_args, pattern.name))
+    return patterns
@@ -0,0 +1,133 @@
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS
+from django.utils.translation import gettext_lazy as _
+from rest_framework_simplejwt import authentication, serializers
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken
+from rest_framework_simplejwt.settings import api_settings
+
+from store.caching import bump_version, get_version
+from store.models import Customer
+
+PRINCIPAL_VERSION_PREFIX = 'principal-version:'
+PRINCIPAL_PREFIX = 'principal:'
+# the user fields kept in the principal cache, never the password hash
+PRINCIPAL_EXCLUDED_FIELDS = {'password'}
+
+
+def get_principal_version(user_id):
+    """
+    Returns the version of what a user's tokens and cached principal may
+    claim. Like response versions it starts at the current time in
+    nanoseconds, so an evicted version never comes back.
+    """
+    return get_version(cache, PRINCIPAL_VERSION_PREFIX + str(user_id))
+
+
+def bump_principal_version(user_id):
+    bump_version(cache, PRINCIPAL_VERSION_PREFIX + str(user_id))
+
+
+def get_customer_id(user):
+    """The id of the user's customer, set without a query by JWTAuthentication."""
+    if not hasattr(user, 'customer_id'):
+        user.customer_id = Customer.objects \
+            .filter(user_id=user.pk) \
+            .values_list('id', flat=True) \
+            .first()
+    return user.customer_id
+
+
+def build_user(fields, customer_id):
+    # a user instance as if loaded from the database, the fields not
+    # given are deferred and read on access
+    User = get_user_model()
+    user = User.from_db(DEFAULT_DB_ALIAS, list(fields), [
+        fields[field.attname] for field in User._meta.concrete_fields
+        if field.attname in fields
+    ])
+    user.customer_id = customer_id
+    return user
+
+
+class TokenObtainPairSerializer(serializers.TokenObtainPairSerializer):
+    """
+    Adds the claims JWTAuthentication builds the user from: customer_id,
+    is_staff, is_superuser and the principal version they were read at.
+    """
+
+    @classmethod
+    def get_token(cls, user):
+        token = super().get_token(user)
+        token['customer_id'] = get_customer_id(user)
+        token['is_staff'] = user.is_staff
+        token['is_superuser'] = user.is_superuser
+        token['principal_version'] = get_principal_version(user.pk)
+        return token
+
+
+class JWTAuthentication(authentication.JWTAuthentication):
+    """
+    Authenticates without querying the user when it can.
+
+    A token whose principal_version is still current carries everything
+    the views check, the user is built from its claims. Otherwise, e.g.
+    after a refresh or a change of the user, the user is read once and
+    cached for STORE_PRINCIPAL_CACHE_TIMEOUT seconds under the current
+    version. Saving the user or their customer, or changing their groups
+    or permissions, bumps the version, see store.signals.handlers.
+
+    request.user is a real User instance either way, with the customer's
+    id as `customer_id`. Fields the token doesn't carry are deferred.
+    """
+    cache_timeout = getattr(settings, 'STORE_PRINCIPAL_CACHE_TIMEOUT', 60)
+
+    def get_user(self, validated_token):
+        try:
+            user_id = validated_token[api_settings.USER_ID_CLAIM]
+        except KeyError:
+            raise InvalidToken(_('Token contained no recognizable user identification'))
+
+        version_key = PRINCIPAL_VERSION_PREFIX + str(user_id)
+        principal_key = PRINCIPAL_PREFIX + str(user_id)
+        cached = cache.get_many([version_key, principal_key])
+        version = cached.get(version_key)
+        principal = cached.get(principal_key)
+
+        if version is not None:
+            if principal is not None and principal['version'] == version:
+                return build_user(principal['fields'], principal['customer_id'])
+            if validated_token.get('principal_version') == version:
+                return build_user({
+                    'id': user_id,
+                    'is_active': True,
+                    'is_staff': validated_token['is_staff'],
+                    'is_superuser': validated_token['is_superuser'],
+                }, validated_token['customer_id'])
+        return self.load_user(user_id)
+
+    def load_user(self, user_id):
+        version = get_principal_version(user_id)
+        try:
+            user = self.user_model.objects \
+                .select_related('customer') \
+                .get(**{api_settings.USER_ID_FIELD: user_id})
+        except self.user_model.DoesNotExist:
+            raise AuthenticationFailed(_('User not found'), code='user_not_found')
+        if not user.is_active:
+            raise AuthenticationFailed(_('User is inactive'), code='user_inactive')
+
+        customer = getattr(user, 'customer', None)
+        user.customer_id = customer.id if customer else None
+        fields = {
+            field.attname: getattr(user, field.attname)
+            for field in self.user_model._meta.concrete_fields
+            if field.name not in PRINCIPAL_EXCLUDED_FIELDS
+        }
+        cache.set(PRINCIPAL_PREFIX + str(user_id), {
+            'version': version,
+            'fields': fields,
+            'customer_id': user.customer_id,
+        }, self.cache_timeout)
+        return user
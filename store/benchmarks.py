@@ -0,0 +1,274 @@
+import random
+import statistics
+import time
+from datetime import timedelta
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.contrib.contenttypes.models import ContentType
+from django.core.management.base import CommandError
+from django.db.models import Max, Min
+from django.test.utils import setup_test_environment
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from likes.models import LikeCounter, LikedItem
+from store.models import Collection, Customer, Order, OrderItem, Product, Promotion, Review
+from store.pricing import reprice
+from tags.models import Tag, TaggedItem
+
+# every seeded user can log in with this password
+SEED_PASSWORD = 'benchmark'
+
+WORDS = [
+    'apple', 'banana', 'cherry', 'coffee', 'organic', 'roasted', 'bread',
+    'cheese', 'butter', 'honey', 'tea', 'green', 'black', 'spicy', 'sweet',
+    'frozen', 'fresh', 'wild', 'smoked', 'salmon', 'pasta', 'rice', 'olive',
+    'oil', 'vinegar', 'chocolate', 'vanilla', 'almond', 'walnut', 'cookie',
+]
+SYLLABLES = ['ka', 'lo', 'mi', 'ne', 'ru', 'sa', 'to', 'vi', 'ze', 'po']
+
+
+def random_words(rng, count):
+    # mostly common words plus a long tail of rare made up ones
+    return ' '.join(
+        rng.choice(WORDS) if rng.random() < 0.5
+        else ''.join(rng.choice(SYLLABLES) for _ in range(3))
+        for _ in range(count))
+
+
+def seed_products(count, collections=20, batch_size=5000, seed=0):
+    """
+    Bulk inserts `count` synthetic products spread across `collections`
+    collections. Signals are not sent, so apart from the collection
+    counters callers rebuild any derived data (e.g. the search index)
+    themselves.
+    """
+    rng = random.Random(seed)
+    collection_objs = Collection.objects.bulk_create([
+        Collection(title=f'{random_words(rng, 2)} {i}') for i in range(collections)
+    ])
+    if not collection_objs[0].pk:
+        collection_objs = list(Collection.objects.order_by('-pk')[:collections])
+
+    created = 0
+    while created < count:
+        size = min(batch_size, count - created)
+        Product.objects.bulk_create([
+            Product(
+                title=random_words(rng, 3),
+                slug='-',
+                description=random_words(rng, 12),
+                unit_price=Decimal(rng.randint(100, 99999)) / 100,
+                inventory=rng.randint(0, 100),
+                collection=rng.choice(collection_objs),
+            ) for _ in range(size)
+        ], batch_size=size)
+        created += size
+    Collection.objects.reconcile_products_count()
+    return created
+
+
+def seed_promotions(count, promoted, batch_size=5000, seed=0):
+    """
+    Creates `count` promotions and `promoted` random links to the
+    existing products, duplicates skipped, and returns the promotions.
+    """
+    rng = random.Random(seed)
+    promotions = [
+        Promotion.objects.create(
+            description=random_words(rng, 2),
+            discount=rng.choice([0.05, 0.1, 0.15, 0.2, 0.25, 0.3, 0.5]))
+        for _ in range(count)
+    ]
+    first_product, last_product = Product.objects \
+        .aggregate(Min('id'), Max('id')).values()
+    Through = Product.promotions.through
+    for size in _batches(promoted if promotions and first_product else 0, batch_size):
+        Through.objects.bulk_create([
+            Through(product_id=rng.randint(first_product, last_product),
+                    promotion_id=rng.choice(promotions).id)
+            for _ in range(size)
+        ], batch_size=size, ignore_conflicts=True)
+    return promotions
+
+
+def seed_orders(count, days=365, batch_size=5000, seed=0):
+    """
+    Creates `count` orders of random existing customers with one to five
+    items of random products, placed over the last `days` days, and
+    returns how many were created.
+    """
+    rng = random.Random(seed)
+    customer_ids = list(Customer.objects.values_list('id', flat=True))
+    first_product, last_product = Product.objects \
+        .aggregate(Min('id'), Max('id')).values()
+    if not customer_ids or first_product is None:
+        return 0
+    now = timezone.now()
+    for size in _batches(count, batch_size):
+        new_orders = Order.objects.bulk_create([
+            Order(customer_id=rng.choice(customer_ids),
+                  payment_status=rng.choice('PPCCCF'))
+            for _ in range(size)
+        ], batch_size=size)
+        if not new_orders[0].pk:
+            new_orders = list(Order.objects.order_by('-pk')[:size])
+        # placed_at is set on insert, spread the orders afterwards
+        for order in new_orders:
+            order.placed_at = now - timedelta(seconds=rng.randint(0, days * 86400))
+        Order.objects.bulk_update(new_orders, ['placed_at'], batch_size=1000)
+        OrderItem.objects.bulk_create([
+            OrderItem(order=order, product_id=rng.randint(first_product, last_product),
+                      quantity=rng.randint(1, 5),
+                      unit_price=Decimal(rng.randint(100, 99999)) / 100)
+            for order in new_orders
+            for _ in range(rng.randint(1, 5))
+        ], batch_size=batch_size)
+    return count
+
+
+def _batches(count, batch_size):
+    while count > 0:
+        yield min(batch_size, count)
+        count -= batch_size
+
+
+def seed_dataset(products=1000000, users=10000, orders=50000, reviews=100000,
+                 tags=50, tagged=200000, likes=200000, collections=20,
+                 promotions=10, promoted=100000, order_days=365, batch_size=5000, seed=0,
+                 progress=None):
+    """
+    Bulk inserts a storefront sized data set: users with their customers,
+    products (see seed_products) and their promotions, orders (see
+    seed_orders), reviews, tagged products and liked products. Calls
+    `progress(label, count)` after each table and returns the counts.
+
+    Users are named bench<n> with SEED_PASSWORD. Prices are computed and
+    like counters reconciled at the end, the search index is left to the
+    caller.
+    """
+    rng = random.Random(seed)
+    counts = {}
+
+    def done(label, count):
+        counts[label] = count
+        if progress:
+            progress(label, count)
+
+    done('products', seed_products(products, collections, batch_size, seed))
+    first_product, last_product = Product.objects \
+        .aggregate(Min('id'), Max('id')).values()
+
+    def product_id():
+        return rng.randint(first_product, last_product)
+
+    # one password hash for everyone, hashing is deliberately slow
+    User = get_user_model()
+    password = make_password(SEED_PASSWORD)
+    start = (User.objects.aggregate(Max('id'))['id__max'] or 0) + 1
+    for size in _batches(users, batch_size):
+        User.objects.bulk_create([
+            User(username=f'bench{start + i}', email=f'bench{start + i}@example.com',
+                 first_name=random_words(rng, 1), last_name=random_words(rng, 1),
+                 password=password)
+            for i in range(size)
+        ], batch_size=size)
+        start += size
+    # bulk_create doesn't send the signal creating customers
+    user_ids = list(User.objects
+                    .filter(customer__isnull=True)
+                    .values_list('id', flat=True))
+    Customer.objects.bulk_create(
+        [Customer(user_id=user_id) for user_id in user_ids], batch_size=batch_size)
+    done('users', users)
+
+    done('orders', seed_orders(orders, order_days, batch_size, seed))
+
+    for size in _batches(reviews, batch_size):
+        Review.objects.bulk_create([
+            Review(product_id=product_id(), name=random_words(rng, 2),
+                   description=random_words(rng, 20))
+            for _ in range(size)
+        ], batch_size=size)
+    done('reviews', reviews)
+
+    content_type = ContentType.objects.get_for_model(Product)
+    labels = [f'{random_words(rng, 1)}-{i}' for i in range(tags)]
+    Tag.objects.bulk_create([Tag(label=label) for label in labels])
+    tag_ids = list(Tag.objects.filter(label__in=labels).values_list('id', flat=True))
+    for size in _batches(tagged, batch_size):
+        TaggedItem.objects.bulk_create([
+            TaggedItem(tag_id=rng.choice(tag_ids), content_type=content_type,
+                       object_id=product_id())
+            for _ in range(size)
+        ], batch_size=size)
+    done('tagged items', tagged)
+
+    # likes are skewed towards a few popular products
+    popular = [product_id() for _ in range(100)]
+    user_ids = list(User.objects.values_list('id', flat=True))
+    for size in _batches(likes, batch_size):
+        LikedItem.objects.bulk_create([
+            LikedItem(user_id=rng.choice(user_ids), content_type=content_type,
+                      object_id=rng.choice(popular) if rng.random() < 0.3 else product_id())
+            for _ in range(size)
+        ], batch_size=size)
+    LikeCounter.objects.reconcile()
+    done('likes', likes)
+
+    seed_promotions(promotions, promoted, batch_size, seed)
+    done('prices', reprice(batch_size=batch_size))
+    return counts
+
+
+def percentiles(samples):
+    """p50, p95, p99 and max of a list of numbers."""
+    samples = sorted(samples)
+    return {
+        'p50': statistics.median(samples),
+        'p95': samples[min(len(samples) - 1, int(len(samples) * 0.95))],
+        'p99': samples[min(len(samples) - 1, int(len(samples) * 0.99))],
+        'max': samples[-1],
+    }
+
+
+def measure(fn, repeat=20, warmup=2):
+    """
+    Calls `fn` `repeat` times and returns latency stats in milliseconds.
+    """
+    for _ in range(warmup):
+        fn()
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - start) * 1000)
+    return percentiles(samples)
+
+
+def format_stats(label, stats):
+    return f'{label:<40} p50={stats["p50"]:8.2f}ms p95={stats["p95"]:8.2f}ms max={stats["max"]:8.2f}ms'
+
+
+def benchmark_client(client_class=APIClient):
+    """
+    A client for timing requests in process. The environment is set up
+    like the test runner does, so its 'testserver' host passes
+    ALLOWED_HOSTS and no email goes out.
+    """
+    try:
+        setup_test_environment()
+    except RuntimeError:
+        # already set up, e.g. by the test runner
+        pass
+    return client_class()
+
+
+def expect_status(response, status=200):
+    # a timing of error pages is worthless
+    if response.status_code != status:
+        raise CommandError(
+            f'{response.request["PATH_INFO"]} returned {response.status_code}, expected {status}')
+    return response
@@ -0,0 +1,138 @@
+import hashlib
+import time
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+from django.http import HttpResponse, HttpResponseNotModified
+
+from store.dbrouting import read_from_replica
+
+VERSION_PREFIX = 'response-version:'
+RESPONSE_PREFIX = 'response:'
+
+
+def get_cache():
+    return caches[getattr(settings, 'STORE_RESPONSE_CACHE', 'default')]
+
+
+def get_version(cache, key):
+    """
+    Returns the version stored under `key`. Versions start at the current
+    time in nanoseconds so a version evicted from the cache never comes
+    back with a value something was cached under before.
+    """
+    version = cache.get(key)
+    if version is None:
+        cache.add(key, time.time_ns(), None)
+        version = cache.get(key)
+    return version
+
+
+def bump_version(cache, key):
+    """
+    Moves the version stored under `key` on once the current transaction
+    commits, a request reading in between would cache the old rows under
+    the new version.
+    """
+    def bump():
+        try:
+            cache.incr(key)
+        except ValueError:
+            cache.set(key, time.time_ns(), None)
+    transaction.on_commit(bump)
+
+
+def get_versions(names):
+    """Returns the current version of each name."""
+    cache = get_cache()
+    keys = [VERSION_PREFIX + name for name in names]
+    versions = cache.get_many(keys)
+    return [versions[key] if key in versions else get_version(cache, key) for key in keys]
+
+
+def bump_versions(*names):
+    cache = get_cache()
+    for name in names:
+        bump_version(cache, VERSION_PREFIX + name)
+
+
+class CachedResponseMixin:
+    """
+    Caches the rendered list and retrieve responses of a viewset.
+
+    The cache key is built from the URL, the query parameters, the
+    negotiated format, whether the user is staff and the versions
+    returned by `get_cache_dependencies()`. Signal handlers bump those
+    versions when the underlying rows change, which makes every response
+    depending on them unreachable.
+
+    Responses carry an ETag, a matching If-None-Match gets a 304 without
+    running the view at all.
+    """
+    cache_timeout = getattr(settings, 'STORE_RESPONSE_CACHE_TIMEOUT', 300)
+
+    def get_cache_dependencies(self):
+        raise NotImplementedError
+
+    def get_cache_key(self, request):
+        scope = 'staff' if request.user and request.user.is_staff else 'public'
+        params = sorted(request.query_params.lists())
+        versions = get_versions(self.get_cache_dependencies())
+        raw = f'{request.get_host()}|{request.path}|{params}|' \
+            f'{request.accepted_renderer.format}|{scope}|{versions}'
+        return RESPONSE_PREFIX + hashlib.md5(raw.encode()).hexdigest()
+
+    def cached(self, handler, request, *args, **kwargs):
+        self.response_cache_key = self.get_cache_key(request)
+        entry = get_cache().get(self.response_cache_key)
+        if entry is None:
+            return handler(request, *args, **kwargs)
+        return self.cached_response(request, entry)
+
+    async def acached(self, handler, request, *args, **kwargs):
+        # counterpart of cached() for the async handlers of store.asyncviews
+        self.response_cache_key = await sync_to_async(self.get_cache_key)(request)
+        entry = await get_cache().aget(self.response_cache_key)
+        if entry is None:
+            return await handler(request, *args, **kwargs)
+        return self.cached_response(request, entry)
+
+    def cached_response(self, request, entry):
+        # entries are stored as (etag, content type, content)
+        etag, content_type, content = entry
+        if etag in request.headers.get('If-None-Match', ''):
+            response = HttpResponseNotModified()
+        else:
+            response = HttpResponse(content, content_type=content_type)
+        response['ETag'] = etag
+        self.response_cache_key = None
+        return response
+
+    def list(self, request, *args, **kwargs):
+        return self.cached(super().list, request, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.cached(super().retrieve, request, *args, **kwargs)
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        response = super().finalize_response(request, response, *args, **kwargs)
+        key = getattr(self, 'response_cache_key', None)
+        if key is None or response.status_code != 200:
+            return response
+
+        response.render()
+        etag = '"' + hashlib.md5(response.content).hexdigest() + '"'
+        timeout = self.cache_timeout
+        if read_from_replica():
+            # a lagging replica may have missed the write that bumped the
+            # versions, don't keep what it returned for long
+            timeout = min(timeout, getattr(settings, 'STORE_REPLICA_CACHE_TIMEOUT', 30))
+        get_cache().set(key, (etag, response['Content-Type'], response.content), timeout)
+        response['ETag'] = etag
+        if etag in request.headers.get('If-None-Match', ''):
+            not_modified = HttpResponseNotModified()
+            not_modified['ETag'] = etag
+            return not_modified
+        return response
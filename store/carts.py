@@ -0,0 +1,435 @@
+import threading
+import time
+from dataclasses import dataclass, field
+from decimal import Decimal
+from functools import lru_cache
+from typing import List, Optional
+from uuid import UUID, uuid4
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.db import IntegrityError, transaction
+from django.db.models import Prefetch, Sum
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from store.models import Cart, CartItem, Product, effective_price, line_total
+from store.pricing import get_product_price
+
+
+class CartNotFound(Exception):
+    pass
+
+
+class ProductNotFound(Exception):
+    def __init__(self, product_ids):
+        super().__init__(product_ids)
+        self.product_ids = sorted(product_ids)
+
+
+@dataclass
+class StoredCartItem:
+    id: int
+    product: Product
+    quantity: int
+
+    @property
+    def product_id(self):
+        return self.product.id
+
+    @property
+    def total_price(self):
+        return self.quantity * get_product_price(self.product).price
+
+
+@dataclass
+class StoredCart:
+    id: UUID
+    items: List[StoredCartItem] = field(default_factory=list)
+    # set when the store can sum the items in the database
+    total_price: Optional[Decimal] = None
+
+
+def parse_cart_id(cart_id):
+    if isinstance(cart_id, UUID):
+        return cart_id
+    try:
+        return UUID(str(cart_id))
+    except ValueError:
+        return None
+
+
+class BaseCartStore:
+    """
+    Where carts live until checkout. Views and CreateOrderSerializer only
+    talk to the store, so carts can be kept out of the primary database.
+
+    Item ids are whatever the store uses to address an item within a
+    cart: CartItem ids for the ORM store, product ids for key-value stores.
+    """
+    # whether writes take part in the current database transaction
+    transactional = False
+
+    def create(self):
+        raise NotImplementedError
+
+    def get(self, cart_id):
+        """Returns a StoredCart or None."""
+        raise NotImplementedError
+
+    async def aget(self, cart_id):
+        # stores with an async client can read without a worker thread
+        return await sync_to_async(self.get)(cart_id)
+
+    def get_quantities(self, cart_id):
+        """Returns {product_id: quantity}, empty for missing carts."""
+        raise NotImplementedError
+
+    def claim(self, cart_id):
+        """
+        Takes the cart for a checkout and returns its quantities, empty
+        when the cart is gone, e.g. checked out concurrently. Call in a
+        transaction.
+
+        Transactional stores lock the cart until the transaction ends and
+        it is deleted with delete(). Other stores take it out right away,
+        release() puts it back when the checkout fails.
+        """
+        raise NotImplementedError
+
+    def release(self, cart_id, quantities):
+        pass
+
+    def add_items(self, cart_id, quantities):
+        """
+        Adds {product_id: quantity} to the cart, increasing the quantity
+        of products already in it, and returns the affected items.
+        """
+        raise NotImplementedError
+
+    def set_quantity(self, cart_id, item_id, quantity):
+        """Returns the updated item or None when it doesn't exist."""
+        raise NotImplementedError
+
+    def remove_item(self, cart_id, item_id):
+        raise NotImplementedError
+
+    def delete(self, cart_id):
+        raise NotImplementedError
+
+
+class ORMCartStore(BaseCartStore):
+    """Keeps carts in the Cart and CartItem tables."""
+    transactional = True
+
+    def create(self):
+        return StoredCart(Cart.objects.create().id)
+
+    def get(self, cart_id):
+        cart_id = parse_cart_id(cart_id)
+        if cart_id is None:
+            return None
+        try:
+            items = CartItem.objects \
+                .select_related('product__pricing') \
+                .annotate(total_price=line_total('quantity', effective_price('product')))
+            cart = Cart.objects \
+                .annotate(total_price=Sum(line_total('items__quantity', effective_price('items__product')))) \
+                .prefetch_related(Prefetch('items', queryset=items)) \
+                .get(pk=cart_id)
+        except Cart.DoesNotExist:
+            return None
+        return StoredCart(cart.id, list(cart.items.all()), cart.total_price)
+
+    def get_quantities(self, cart_id):
+        return dict(
+            CartItem.objects
+            .filter(cart_id=cart_id)
+            .values_list('product_id', 'quantity'))
+
+    def claim(self, cart_id):
+        # a concurrent checkout of the cart waits here until this one
+        # commits, then finds the cart deleted
+        locked = Cart.objects.select_for_update().filter(pk=cart_id).values_list('pk', flat=True)
+        if not list(locked):
+            return {}
+        return self.get_quantities(cart_id)
+
+    def add_items(self, cart_id, quantities):
+        # a single upsert adds new items and increases existing ones, products
+        # that don't exist are skipped by it and reported here
+        cart_id = parse_cart_id(cart_id)
+        if cart_id is None:
+            raise CartNotFound()
+        try:
+            with transaction.atomic():
+                CartItem.objects.add_items(cart_id, quantities)
+                items = list(CartItem.objects.filter(
+                    cart_id=cart_id, product_id__in=quantities))
+                missing = set(quantities) - {item.product_id for item in items}
+                if missing:
+                    raise ProductNotFound(missing)
+        except IntegrityError:
+            raise CartNotFound()
+        return items
+
+    def set_quantity(self, cart_id, item_id, quantity):
+        updated = CartItem.objects \
+            .filter(cart_id=cart_id, pk=item_id) \
+            .update(quantity=quantity)
+        if not updated:
+            return None
+        return CartItem.objects.get(pk=item_id)
+
+    def remove_item(self, cart_id, item_id):
+        deleted, _ = CartItem.objects.filter(cart_id=cart_id, pk=item_id).delete()
+        return bool(deleted)
+
+    def delete(self, cart_id):
+        deleted, _ = Cart.objects.filter(pk=cart_id).delete()
+        return bool(deleted)
+
+
+class InMemoryKeyValueClient:
+    """
+    The subset of the Redis hash API used by KeyValueCartStore, kept in a
+    dict. Used in tests and single process deployments.
+
+    Expired keys are dropped when read, and at most every `sweep_interval`
+    seconds all of them are, so abandoned carts don't pile up.
+    """
+    sweep_interval = 60
+
+    def __init__(self):
+        self.data = {}
+        self.expires = {}
+        self.lock = threading.Lock()
+        self.next_sweep = time.monotonic() + self.sweep_interval
+
+    def _sweep(self):
+        now = time.monotonic()
+        if now < self.next_sweep:
+            return
+        self.next_sweep = now + self.sweep_interval
+        for key in [key for key, expires in self.expires.items() if expires <= now]:
+            self.data.pop(key, None)
+            del self.expires[key]
+
+    def _get(self, key):
+        expires = self.expires.get(key)
+        if expires is not None and expires <= time.monotonic():
+            self.data.pop(key, None)
+            self.expires.pop(key, None)
+        return self.data.get(key)
+
+    def hset(self, key, field=None, value=None, mapping=None):
+        with self.lock:
+            values = self._get(key)
+            if values is None:
+                values = self.data[key] = {}
+            if field is not None:
+                values[field] = str(value)
+            for name, value in (mapping or {}).items():
+                values[name] = str(value)
+
+    def hincrby(self, key, field, amount=1):
+        with self.lock:
+            values = self._get(key)
+            if values is None:
+                values = self.data[key] = {}
+            values[field] = str(int(values.get(field, 0)) + amount)
+            return int(values[field])
+
+    def hgetall(self, key):
+        with self.lock:
+            return dict(self._get(key) or {})
+
+    def hexists(self, key, field):
+        with self.lock:
+            return field in (self._get(key) or {})
+
+    def hdel(self, key, *fields):
+        with self.lock:
+            values = self._get(key) or {}
+            return sum(values.pop(name, None) is not None for name in fields)
+
+    def exists(self, key):
+        with self.lock:
+            return int(self._get(key) is not None)
+
+    def expire(self, key, seconds):
+        with self.lock:
+            # every write touches its cart, a good time to sweep
+            self._sweep()
+            if self._get(key) is None:
+                return False
+            self.expires[key] = time.monotonic() + seconds
+            return True
+
+    def delete(self, *keys):
+        with self.lock:
+            deleted = 0
+            for key in keys:
+                deleted += self._get(key) is not None
+                self.data.pop(key, None)
+                self.expires.pop(key, None)
+            return deleted
+
+
+class KeyValueCartStore(BaseCartStore):
+    """
+    Keeps each cart in one hash, {product_id: quantity}, that expires
+    `ttl` seconds after its last change. Carts only reach the database
+    when they are checked out. Item ids are product ids.
+    """
+    created_field = '_created'
+
+    def __init__(self, client=None, ttl=None):
+        self.client = client if client is not None else self.get_default_client()
+        self.ttl = ttl or getattr(settings, 'STORE_CART_TTL', 7 * 24 * 60 * 60)
+
+    @staticmethod
+    def get_default_client():
+        url = getattr(settings, 'STORE_CART_REDIS_URL', None)
+        if not url:
+            return InMemoryKeyValueClient()
+        try:
+            import redis
+        except ImportError:
+            raise ImproperlyConfigured(
+                'STORE_CART_REDIS_URL is set but the redis package is not installed, '
+                'install it with `pipenv install redis`.')
+        return redis.Redis.from_url(url, decode_responses=True)
+
+    def key(self, cart_id):
+        return f'cart:{cart_id}'
+
+    def touch(self, cart_id):
+        self.client.expire(self.key(cart_id), self.ttl)
+
+    def items_for(self, quantities):
+        products = Product.objects.select_related('pricing').in_bulk(list(quantities))
+        return [
+            StoredCartItem(product_id, products[product_id], quantity)
+            for product_id, quantity in sorted(quantities.items())
+            if product_id in products
+        ]
+
+    def create(self):
+        cart_id = uuid4()
+        self.client.hset(self.key(cart_id), self.created_field, int(time.time()))
+        self.touch(cart_id)
+        return StoredCart(cart_id)
+
+    def get(self, cart_id):
+        cart_id = parse_cart_id(cart_id)
+        if cart_id is None:
+            return None
+        values = self.client.hgetall(self.key(cart_id))
+        if not values:
+            return None
+        return StoredCart(cart_id, self.items_for(self.quantities_from(values)))
+
+    def quantities_from(self, values):
+        return {
+            int(name): int(quantity)
+            for name, quantity in values.items()
+            if name != self.created_field
+        }
+
+    def get_quantities(self, cart_id):
+        return self.quantities_from(self.client.hgetall(self.key(cart_id)))
+
+    def claim(self, cart_id):
+        key = self.key(cart_id)
+        values = self.client.hgetall(key)
+        # of concurrent checkouts only the one deleting the cart goes on
+        if not values or not self.client.delete(key):
+            return {}
+        return self.quantities_from(values)
+
+    def release(self, cart_id, quantities):
+        self.client.hset(self.key(cart_id), self.created_field, int(time.time()), mapping={
+            str(product_id): quantity for product_id, quantity in quantities.items()})
+        self.touch(cart_id)
+
+    def add_items(self, cart_id, quantities):
+        key = self.key(cart_id)
+        if not self.client.exists(key):
+            raise CartNotFound()
+        found = set(Product.objects
+                    .filter(pk__in=quantities)
+                    .values_list('id', flat=True))
+        missing = set(quantities) - found
+        if missing:
+            raise ProductNotFound(missing)
+        totals = {
+            product_id: self.client.hincrby(key, str(product_id), quantity)
+            for product_id, quantity in quantities.items()
+        }
+        self.touch(cart_id)
+        return self.items_for(totals)
+
+    def set_quantity(self, cart_id, item_id, quantity):
+        key = self.key(cart_id)
+        if not self.client.hexists(key, str(item_id)):
+            return None
+        self.client.hset(key, str(item_id), quantity)
+        self.touch(cart_id)
+        items = self.items_for({int(item_id): quantity})
+        return items[0] if items else None
+
+    def remove_item(self, cart_id, item_id):
+        removed = self.client.hdel(self.key(cart_id), str(item_id))
+        self.touch(cart_id)
+        return bool(removed)
+
+    def delete(self, cart_id):
+        return bool(self.client.delete(self.key(cart_id)))
+
+
+def delete_expired_carts(max_age, batch_size=1000, dry_run=False, progress=None):
+    """
+    Deletes Cart rows (and their items) created more than `max_age`
+    (a timedelta) ago, walking the carts in primary key order in batches
+    of `batch_size` so each transaction stays short. Calls
+    `progress(stats)` after every batch and returns the final stats.
+
+    Safe to run from cron or any task scheduler. Key-value carts expire
+    by themselves and are not affected.
+    """
+    cutoff = timezone.now() - max_age
+    stats = {'batches': 0, 'carts': 0, 'items': 0, 'seconds': 0.0}
+    start = time.monotonic()
+    last_id = None
+    while True:
+        batch = Cart.objects.filter(created_at__lt=cutoff).order_by('pk')
+        if last_id is not None:
+            batch = batch.filter(pk__gt=last_id)
+        ids = list(batch.values_list('pk', flat=True)[:batch_size])
+        if not ids:
+            break
+        last_id = ids[-1]
+        if dry_run:
+            items = CartItem.objects.filter(cart_id__in=ids).count()
+            carts = len(ids)
+        else:
+            with transaction.atomic():
+                _, deleted = Cart.objects.filter(pk__in=ids).delete()
+            items = deleted.get(CartItem._meta.label, 0)
+            carts = deleted.get(Cart._meta.label, 0)
+        stats['batches'] += 1
+        stats['carts'] += carts
+        stats['items'] += items
+        stats['seconds'] = time.monotonic() - start
+        if progress:
+            progress(stats)
+    stats['seconds'] = time.monotonic() - start
+    return stats
+
+
+@lru_cache(maxsize=None)
+def get_cart_store():
+    return import_string(
+        getattr(settings, 'STORE_CART_BACKEND', 'store.carts.ORMCartStore'))()
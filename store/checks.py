@@ -0,0 +1,28 @@
+from django.conf import settings
+from django.core.checks import Tags, Warning, register
+
+# caches whose entries only the process that set them sees
+PROCESS_LOCAL_CACHES = {
+    'django.core.cache.backends.locmem.LocMemCache',
+}
+
+
+@register(Tags.caches, deploy=True)
+def check_shared_cache(app_configs, **kwargs):
+    """
+    Versions of responses, principals and permission sets are bumped in
+    the process that made the change. With a process-local cache the
+    other processes keep serving what they cached until it expires.
+    """
+    aliases = {'default', getattr(settings, 'STORE_RESPONSE_CACHE', 'default')}
+    return [
+        Warning(
+            f"The '{alias}' cache is local to each process.",
+            hint='Configure a shared cache in CACHES, e.g. Redis or memcached, or '
+                 'changes to users, permissions and products show in the other '
+                 'processes only once their cached entries expire.',
+            id='store.W001',
+        )
+        for alias in sorted(aliases)
+        if settings.CACHES.get(alias, {}).get('BACKEND') in PROCESS_LOCAL_CACHES
+    ]
@@ -0,0 +1,227 @@
+import asyncio
+import random
+import time
+from contextvars import ContextVar
+from functools import lru_cache
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS, DatabaseError, connections
+from django.utils.module_loading import import_string
+
+# apps whose reads may be served by a replica
+ROUTED_APPS = {'store', 'tags', 'likes'}
+STICKY_COOKIE = 'store_primary_until'
+STICKY_USER_PREFIX = 'replica-sticky:user:'
+
+
+class RoutingState:
+    """Where the reads of the current request may go, see ReplicaRouter."""
+
+    def __init__(self, request):
+        self.request = request
+        self.replica_allowed = False
+        self.replica = None
+        self.used_replica = False
+        self.wrote = False
+        self.sticky = None
+
+    def is_sticky(self):
+        # evaluated at the first routed read, after DRF has authenticated
+        # the user
+        if self.sticky is None:
+            pinned_until = self.request.COOKIES.get(STICKY_COOKIE, '')
+            try:
+                self.sticky = float(pinned_until) > time.time()
+            except ValueError:
+                self.sticky = False
+            user = getattr(self.request, 'user', None)
+            if not self.sticky and user is not None and user.is_authenticated:
+                self.sticky = bool(cache.get(STICKY_USER_PREFIX + str(user.pk)))
+        return self.sticky
+
+
+current_routing = ContextVar('current_routing', default=None)
+
+
+def read_from_replica():
+    """Whether the current request has read rows from a replica."""
+    state = current_routing.get()
+    return state is not None and state.used_replica
+
+
+class ReplicaSelector:
+    """
+    Picks the replica a request reads from, at random among the ones
+    whose replication lag is at most `max_lag` seconds. Lag is checked
+    at most every `check_interval` seconds per replica, a replica that
+    can't report it is skipped until the next check. With no replica
+    available reads go to the primary.
+
+    Point STORE_REPLICA_SELECTOR at a subclass to read lag or health
+    from elsewhere, e.g. a load balancer or monitoring.
+    """
+
+    def __init__(self, aliases, max_lag=5, check_interval=10):
+        self.aliases = list(aliases)
+        self.max_lag = max_lag
+        self.check_interval = check_interval
+        # alias -> (checked at, available)
+        self.checks = {}
+
+    def choose(self):
+        available = [alias for alias in self.aliases if self.is_available(alias)]
+        return random.choice(available) if available else None
+
+    def is_available(self, alias):
+        now = time.monotonic()
+        checked = self.checks.get(alias)
+        if checked is not None and now - checked[0] < self.check_interval:
+            return checked[1]
+        try:
+            lag = self.get_lag(alias)
+        except DatabaseError:
+            lag = None
+        available = lag is not None and lag <= self.max_lag
+        self.checks[alias] = (now, available)
+        return available
+
+    def get_lag(self, alias):
+        """Seconds the replica is behind the primary, None when unknown."""
+        connection = connections[alias]
+        with connection.cursor() as cursor:
+            if connection.vendor == 'mysql':
+                cursor.execute('SHOW SLAVE STATUS')
+                row = cursor.fetchone()
+                if row is None:
+                    # not replicating, e.g. a local copy
+                    return 0
+                columns = [column[0] for column in cursor.description]
+                # NULL while replication is stopped
+                return dict(zip(columns, row))['Seconds_Behind_Master']
+            if connection.vendor == 'postgresql':
+                cursor.execute(
+                    'SELECT EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp())')
+                lag, = cursor.fetchone()
+                return 0 if lag is None else float(lag)
+        return 0
+
+
+@lru_cache(maxsize=None)
+def get_replica_selector():
+    return import_string(
+        getattr(settings, 'STORE_REPLICA_SELECTOR', 'store.dbrouting.ReplicaSelector'))(
+        getattr(settings, 'STORE_DB_REPLICAS', []),
+        max_lag=getattr(settings, 'STORE_REPLICA_MAX_LAG', 5),
+        check_interval=getattr(settings, 'STORE_REPLICA_CHECK_INTERVAL', 10))
+
+
+class ReplicaRouter:
+    """
+    Sends the reads of the store, tags and likes apps made by GET, HEAD
+    and OPTIONS requests to viewsets to a replica in STORE_DB_REPLICAS.
+    Everything else, writes, transactions, management commands and
+    background threads, uses the primary.
+
+    A request reads from the primary for good once it has written, and
+    so does its client for STORE_REPLICA_STICKY_SECONDS afterwards,
+    through a cookie and, for authenticated users, a cache entry, so a
+    customer sees their new cart item or order right away.
+    """
+
+    def db_for_read(self, model, **hints):
+        state = current_routing.get()
+        if state is None or not state.replica_allowed or state.wrote \
+                or model._meta.app_label not in ROUTED_APPS:
+            return None
+        instance = hints.get('instance')
+        if instance is not None and instance._state.db:
+            # related rows come from where the instance was read
+            return instance._state.db
+        if connections[DEFAULT_DB_ALIAS].in_atomic_block or state.is_sticky():
+            return None
+        if state.replica is None:
+            # one replica per request, so its reads agree with each other
+            state.replica = get_replica_selector().choose() or DEFAULT_DB_ALIAS
+        state.used_replica = state.used_replica or state.replica != DEFAULT_DB_ALIAS
+        return state.replica
+
+    def db_for_write(self, model, **hints):
+        state = current_routing.get()
+        if state is not None and model._meta.app_label in ROUTED_APPS:
+            state.wrote = True
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        databases = {DEFAULT_DB_ALIAS, *getattr(settings, 'STORE_DB_REPLICAS', [])}
+        if obj1._state.db in databases and obj2._state.db in databases:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # replicas get the schema through replication
+        if db in getattr(settings, 'STORE_DB_REPLICAS', []):
+            return False
+        return None
+
+
+class ReplicaRoutingMiddleware:
+    """
+    Sets up the ReplicaRouter state of each request and pins clients
+    that wrote to the primary for STORE_REPLICA_STICKY_SECONDS.
+
+    Runs sync or async, whichever the rest of the stack is, so async
+    views under ASGI aren't sent through a worker thread here.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.sticky_seconds = getattr(settings, 'STORE_REPLICA_STICKY_SECONDS', 10)
+        if asyncio.iscoroutinefunction(get_response):
+            # how Django's own MiddlewareMixin tells the handler to await us
+            self._is_coroutine = asyncio.coroutines._is_coroutine
+
+    def __call__(self, request):
+        if asyncio.iscoroutinefunction(self.get_response):
+            return self.__acall__(request)
+        state = RoutingState(request)
+        token = current_routing.set(state)
+        try:
+            response = self.get_response(request)
+        finally:
+            current_routing.reset(token)
+        if state.wrote:
+            self.pin_to_primary(request, response)
+        return response
+
+    async def __acall__(self, request):
+        state = RoutingState(request)
+        token = current_routing.set(state)
+        try:
+            response = await self.get_response(request)
+        finally:
+            current_routing.reset(token)
+        if state.wrote:
+            # request.user may still have to be loaded
+            await sync_to_async(self.pin_to_primary)(request, response)
+        return response
+
+    def pin_to_primary(self, request, response):
+        response.set_cookie(
+            STICKY_COOKIE, str(time.time() + self.sticky_seconds),
+            max_age=self.sticky_seconds, httponly=True, samesite='Lax')
+        # API clients authenticate with JWT and may not keep cookies
+        user = getattr(request, 'user', None)
+        if user is not None and user.is_authenticated:
+            cache.set(STICKY_USER_PREFIX + str(user.pk), True, self.sticky_seconds)
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        state = current_routing.get()
+        if state is not None:
+            # viewsets only, the admin and auth views keep the primary
+            state.replica_allowed = request.method in ('GET', 'HEAD', 'OPTIONS') \
+                and getattr(view_func, 'actions', None) is not None
+        return None
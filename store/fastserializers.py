@@ -0,0 +1,133 @@
+import decimal
+from operator import attrgetter
+
+from django.db import models
+from rest_framework import fields, relations, serializers
+from rest_framework.settings import api_settings
+
+from store import serializers as store_serializers
+
+
+class RowProxy:
+    """
+    Attribute access over a `.values()` row, related fields are read
+    from `product__title` style keys.
+    """
+    __slots__ = ('row', 'prefix')
+
+    def __init__(self, row, prefix=''):
+        self.row = row
+        self.prefix = prefix
+
+    def __getattr__(self, name):
+        key = self.prefix + name
+        try:
+            return self.row[key]
+        except KeyError:
+            if key == self.prefix + 'pk':
+                return self.row[self.prefix + 'id']
+            return RowProxy(self.row, key + '__')
+
+
+def _identity(value):
+    return value
+
+
+def _compile_field(serializer, field):
+    """Returns (getter, converter) for one readable field."""
+    if isinstance(field, serializers.SerializerMethodField):
+        # bind the method once instead of looking it up for every row
+        method = getattr(serializer, field.method_name)
+        return method, _identity
+
+    if field.source == '*':
+        getter = _identity
+    else:
+        getter = attrgetter(field.source)
+
+    if isinstance(field, serializers.ListSerializer):
+        child = compile_serializer(field.child)
+
+        def many(value):
+            if isinstance(value, models.Manager):
+                value = value.all()
+            return [child(item) for item in value]
+        return getter, many
+
+    if isinstance(field, serializers.BaseSerializer):
+        return getter, compile_serializer(field)
+
+    if isinstance(field, relations.PrimaryKeyRelatedField):
+        if len(field.source_attrs) == 1:
+            # read the foreign key column instead of loading the object
+            return attrgetter(field.source + '_id'), _identity
+        return getter, attrgetter('pk')
+
+    if isinstance(field, fields.DecimalField) and not getattr(
+            field, 'coerce_to_string', api_settings.COERCE_DECIMAL_TO_STRING):
+        exponent = -field.decimal_places
+
+        def decimal_value(value):
+            # values loaded from the column already have the right places
+            if isinstance(value, decimal.Decimal) and value.as_tuple().exponent == exponent:
+                return value
+            return field.to_representation(value)
+        return getter, decimal_value
+
+    if type(field) in (fields.IntegerField, fields.CharField, fields.BooleanField):
+        return getter, _identity
+
+    return getter, field.to_representation
+
+
+def compile_serializer(serializer):
+    """
+    Turns a serializer instance into a function producing the same
+    representation without DRF's per field dispatch.
+    """
+    compiled = [
+        (field.field_name, *_compile_field(serializer, field))
+        for field in serializer._readable_fields
+    ]
+
+    def to_representation(instance):
+        if isinstance(instance, dict):
+            instance = RowProxy(instance)
+        data = {}
+        for name, getter, converter in compiled:
+            value = getter(instance)
+            data[name] = None if value is None else converter(value)
+        return data
+    return to_representation
+
+
+class FastSerializer(serializers.BaseSerializer):
+    """
+    Read-only variant of `serializer_class` with identical output, for
+    model instances and `.values()` rows alike. The representation
+    function is compiled once per class.
+    """
+    serializer_class = None
+    _compiled = None
+
+    @classmethod
+    def compiled(cls):
+        if cls.__dict__.get('_compiled') is None:
+            cls._compiled = staticmethod(compile_serializer(cls.serializer_class(context={})))
+        return cls._compiled
+
+    def to_representation(self, instance):
+        return self.compiled()(instance)
+
+
+def fast(serializer_class):
+    return type(f'Fast{serializer_class.__name__}', (FastSerializer,), {
+        'serializer_class': serializer_class,
+        '__module__': __name__,
+    })
+
+
+FastProductSerializer = fast(store_serializers.ProductListSerializer)
+FastCartItemSerializer = fast(store_serializers.CartItemSerializer)
+FastCartSerializer = fast(store_serializers.CartSerializer)
+FastOrderSerializer = fast(store_serializers.OrderSerializer)
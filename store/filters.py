@@ -1,5 +1,7 @@
 from django_filters.rest_framework import FilterSet
+from rest_framework.filters import BaseFilterBackend
 from .models import Product
+from .search import get_search_backend
 
 class ProductFilter(FilterSet):
     class Meta:
@@ -7,4 +9,19 @@ class ProductFilter(FilterSet):
         fields={
             'collection_id':['exact'],
             'unit_price':['gt','lt']
-        }
\ No newline at end of file
+        }
+
+
+class ProductSearchFilter(BaseFilterBackend):
+    # drop-in replacement for SearchFilter that goes through the search index
+    # instead of LIKE '%term%' scans, results are ranked by relevance
+    # unless the client asks for an explicit ordering
+    search_param = 'search'
+
+    def filter_queryset(self, request, queryset, view):
+        query = request.query_params.get(self.search_param, '').strip()
+        if not query:
+            return queryset
+        queryset = get_search_backend().search(queryset, query)
+        ordering = queryset.query.order_by or queryset.model._meta.ordering
+        return queryset.order_by('-search_rank', *ordering)
@@ -0,0 +1,290 @@
+import csv
+import io
+import json
+from itertools import islice
+
+from django.contrib.contenttypes.models import ContentType
+from django.db import connections, router, transaction
+from django.db.models import Max
+from rest_framework import serializers
+
+from store.caching import bump_versions
+from store.models import Collection, Product, Promotion
+from store.pricing import reprice
+from store.search import get_search_backend
+from store.serializers import ProductSerializer
+from tags.models import Tag, TaggedItem
+
+FIELDS = ['id', 'title', 'slug', 'description', 'unit_price',
+          'inventory', 'collection', 'promotions', 'tags']
+# separator of the promotion ids and tag labels inside one CSV cell
+LIST_SEPARATOR = '|'
+
+
+class ProductImportSerializer(ProductSerializer):
+    """
+    ProductSerializer's validation rules plus the columns only imports
+    set. Collections are resolved from a map passed in the context
+    instead of one query per row.
+    """
+    price = None
+    price_with_tax = None
+
+    class Meta(ProductSerializer.Meta):
+        fields = ['title', 'slug', 'unit_price', 'description', 'inventory']
+
+    def to_internal_value(self, data):
+        value = super().to_internal_value(data)
+        collection = self.context['collections'].get(_int(data.get('collection')))
+        if collection is None:
+            raise serializers.ValidationError(
+                {'collection': f'Unknown collection {data.get("collection")!r}.'})
+        value['collection'] = collection
+        return value
+
+
+def _int(value):
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def _split(value):
+    if value in (None, ''):
+        return []
+    if isinstance(value, list):
+        return value
+    return [part.strip() for part in str(value).split(LIST_SEPARATOR) if part.strip()]
+
+
+class InvalidRow:
+    """A row that couldn't be read, reported by ProductImporter."""
+
+    def __init__(self, detail):
+        self.detail = detail
+
+
+def read_rows(stream, format):
+    """
+    Yields one dict per product from a CSV or JSON Lines text stream, or
+    an InvalidRow for a line that isn't valid JSON.
+    """
+    if format == 'csv':
+        yield from csv.DictReader(stream)
+    elif format == 'jsonl':
+        for line in stream:
+            if not line.strip():
+                continue
+            try:
+                yield json.loads(line)
+            except json.JSONDecodeError as error:
+                yield InvalidRow(f'Invalid JSON: {error}.')
+    else:
+        raise ValueError(f'Unknown format {format!r}.')
+
+
+def chunked(iterable, size):
+    iterator = iter(iterable)
+    while True:
+        chunk = list(islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+class ProductImporter:
+    """
+    Streams product rows into the database in chunks of `batch_size`.
+
+    Rows with an existing `id` update that product, the others create
+    new ones. `promotions` (ids) and `tags` (labels, created when
+    missing) replace the product's current ones. Invalid rows are
+    skipped and reported in `errors`.
+
+    Signals are bypassed, so the search index, prices, collection
+    counters and cached responses are refreshed by the importer itself.
+    """
+
+    def __init__(self, batch_size=1000):
+        self.batch_size = batch_size
+        self.collections = Collection.objects.in_bulk()
+        self.promotions = set(Promotion.objects.values_list('id', flat=True))
+        self.tags = {tag.label: tag for tag in Tag.objects.all()}
+        self.content_type = ContentType.objects.get_for_model(Product)
+        connection = connections[router.db_for_write(Product)]
+        self.returns_ids = connection.features.can_return_rows_from_bulk_insert
+        self.stats = {'rows': 0, 'created': 0, 'updated': 0, 'errors': 0, 'unindexed': 0}
+        self.errors = []
+
+    def run(self, rows, progress=None):
+        for chunk in chunked(rows, self.batch_size):
+            self.import_chunk(chunk)
+            if progress:
+                progress(self.stats)
+        Collection.objects.reconcile_products_count()
+        bump_versions('product', 'collection')
+        return self.stats
+
+    def import_chunk(self, rows):
+        products, relations = [], []
+        # building a serializer's fields is the expensive part, so one
+        # instance validates every row like ListSerializer does
+        serializer = ProductImportSerializer(context={'collections': self.collections})
+        for row in rows:
+            self.stats['rows'] += 1
+            try:
+                if isinstance(row, InvalidRow):
+                    raise serializers.ValidationError(row.detail)
+                validated_data = serializer.run_validation(row)
+            except serializers.ValidationError as error:
+                self.stats['errors'] += 1
+                self.errors.append((self.stats['rows'], error.detail))
+                continue
+            product = Product(id=_int(row.get('id')), **validated_data)
+            products.append(product)
+            relations.append((
+                [_int(id) for id in _split(row.get('promotions')) if _int(id) in self.promotions],
+                _split(row.get('tags')),
+            ))
+
+        existing = Product.objects.in_bulk(
+            [product.id for product in products if product.id])
+        to_create = [(product, relation) for product, relation in zip(products, relations)
+                     if product.id not in existing]
+        to_update = [product for product in products if product.id in existing]
+
+        with transaction.atomic():
+            new = [product for product, _ in to_create]
+            if self.returns_ids:
+                Product.objects.bulk_create(new, batch_size=self.batch_size)
+            else:
+                last_id = Product.objects.aggregate(last_id=Max('id'))['last_id'] or 0
+                Product.objects.bulk_create(new, batch_size=self.batch_size)
+                self.fetch_ids(new, last_id)
+            Product.objects.bulk_update(
+                to_update,
+                ['title', 'slug', 'unit_price', 'description', 'inventory', 'collection'],
+                batch_size=self.batch_size)
+            self.save_relations(products, relations, [p.id for p in to_update])
+
+        saved = [product for product in products if product.pk]
+        get_search_backend().index(saved)
+        reprice(Product.objects.filter(pk__in=[product.pk for product in saved]))
+        # new rows fetch_ids couldn't tell apart can only be indexed by
+        # rebuild_search_index and priced by reprice_products
+        self.stats['unindexed'] += len(products) - len(saved)
+        self.stats['created'] += len(to_create)
+        self.stats['updated'] += len(to_update)
+
+    def fetch_ids(self, products, last_id):
+        """
+        Sets the ids of products bulk inserted without RETURNING (MySQL).
+        The new rows are read back with one query, among the ids above
+        the highest one before the insert, and matched by their fields
+        in insertion order.
+        """
+        pending, given_ids = {}, []
+        for product in products:
+            if product.pk is None:
+                key = (product.title, product.slug, product.collection_id)
+                pending.setdefault(key, []).append(product)
+            else:
+                given_ids.append(product.pk)
+        if not pending:
+            return
+        rows = Product.objects \
+            .filter(pk__gt=last_id, slug__in={slug for _, slug, _ in pending}) \
+            .exclude(pk__in=given_ids) \
+            .order_by('pk') \
+            .values_list('pk', 'title', 'slug', 'collection_id')
+        for pk, *key in rows:
+            waiting = pending.get(tuple(key))
+            if waiting:
+                waiting.pop(0).pk = pk
+
+    def save_relations(self, products, relations, updated_ids):
+        Through = Product.promotions.through
+        if updated_ids:
+            Through.objects.filter(product_id__in=updated_ids).delete()
+            TaggedItem.objects.filter(
+                content_type=self.content_type, object_id__in=updated_ids).delete()
+
+        missing_labels = {
+            label for _, labels in relations for label in labels
+            if label not in self.tags}
+        if missing_labels:
+            Tag.objects.bulk_create([Tag(label=label) for label in missing_labels])
+            for tag in Tag.objects.filter(label__in=missing_labels):
+                self.tags[tag.label] = tag
+
+        links, tagged = [], []
+        for product, (promotion_ids, labels) in zip(products, relations):
+            if product.pk is None:
+                continue
+            links += [Through(product_id=product.pk, promotion_id=promotion_id)
+                      for promotion_id in set(promotion_ids)]
+            tagged += [TaggedItem(tag=self.tags[label], content_type=self.content_type,
+                                  object_id=product.pk)
+                       for label in set(labels)]
+        Through.objects.bulk_create(links, batch_size=self.batch_size)
+        TaggedItem.objects.bulk_create(tagged, batch_size=self.batch_size)
+
+
+def export_rows(queryset=None, batch_size=1000):
+    """
+    Yields product dicts in primary key order, reading `batch_size`
+    products and their promotions and tags at a time.
+    """
+    queryset = (queryset if queryset is not None else Product.objects.all()).order_by('pk')
+    content_type = ContentType.objects.get_for_model(Product)
+    Through = Product.promotions.through
+    last_id = 0
+    while True:
+        products = list(queryset.filter(pk__gt=last_id).values(
+            'id', 'title', 'slug', 'description', 'unit_price',
+            'inventory', 'collection_id')[:batch_size])
+        if not products:
+            return
+        last_id = products[-1]['id']
+        ids = [product['id'] for product in products]
+
+        promotions, tags = {}, {}
+        for product_id, promotion_id in Through.objects \
+                .filter(product_id__in=ids) \
+                .values_list('product_id', 'promotion_id'):
+            promotions.setdefault(product_id, []).append(promotion_id)
+        for object_id, label in TaggedItem.objects \
+                .filter(content_type=content_type, object_id__in=ids) \
+                .values_list('object_id', 'tag__label'):
+            tags.setdefault(object_id, []).append(label)
+
+        for product in products:
+            product['collection'] = product.pop('collection_id')
+            product['promotions'] = sorted(promotions.get(product['id'], []))
+            product['tags'] = sorted(tags.get(product['id'], []))
+            yield product
+
+
+def render_rows(rows, format):
+    """Turns product dicts into CSV or JSON Lines text, one chunk per row."""
+    if format == 'jsonl':
+        for row in rows:
+            row['unit_price'] = str(row['unit_price'])
+            yield json.dumps(row) + '\n'
+        return
+    if format != 'csv':
+        raise ValueError(f'Unknown format {format!r}.')
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=FIELDS)
+    writer.writeheader()
+    yield buffer.getvalue()
+    buffer.seek(0)
+    buffer.truncate()
+    for row in rows:
+        row['promotions'] = LIST_SEPARATOR.join(map(str, row['promotions']))
+        row['tags'] = LIST_SEPARATOR.join(row['tags'])
+        writer.writerow(row)
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
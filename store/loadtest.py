@@ -0,0 +1,246 @@
+import json
+import random
+import time
+from contextlib import ExitStack
+from concurrent.futures import ThreadPoolExecutor
+import urllib.error
+import urllib.parse
+import urllib.request
+
+from django.db import connections
+from django.db.models import Max, Min
+
+from store.benchmarks import WORDS, benchmark_client, percentiles
+from store.models import Collection, Product
+
+
+class TestClient:
+    """Calls the API in process through the test client, counting queries."""
+
+    def __init__(self, user=None):
+        self.client = benchmark_client()
+        if user is not None:
+            self.client.force_authenticate(user)
+
+    def request(self, method, path, data=None):
+        queries = [0]
+
+        def count(execute, sql, params, many, context):
+            queries[0] += 1
+            return execute(sql, params, many, context)
+
+        with ExitStack() as stack:
+            # replicas included
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(count))
+            response = getattr(self.client, method.lower())(path, data, format='json')
+        content = b''.join(response.streaming_content) if response.streaming else response.content
+        return response.status_code, _json(content), queries[0]
+
+
+class ServerClient:
+    """Calls a running server over HTTP. Query counts are not available."""
+
+    def __init__(self, base_url, username=None, password=None):
+        self.base_url = base_url.rstrip('/')
+        self.token = None
+        if username:
+            status, data, _ = self.request(
+                'POST', '/auth/jwt/create/', {'username': username, 'password': password})
+            if status != 200:
+                raise ValueError(f'Login as {username} failed: {data}')
+            self.token = data['access']
+
+    def request(self, method, path, data=None):
+        # links returned by the API are absolute already
+        url = path if path.startswith('http') else self.base_url + path
+        body = None
+        if data is not None and method == 'GET':
+            url += '?' + urllib.parse.urlencode(data)
+        elif data is not None:
+            body = json.dumps(data).encode()
+        request = urllib.request.Request(url, data=body, method=method)
+        request.add_header('Content-Type', 'application/json')
+        if self.token:
+            request.add_header('Authorization', f'JWT {self.token}')
+        try:
+            with urllib.request.urlopen(request) as response:
+                return response.status, _json(response.read()), None
+        except urllib.error.HTTPError as error:
+            return error.code, _json(error.read()), None
+
+
+def _json(content):
+    try:
+        return json.loads(content)
+    except ValueError:
+        return None
+
+
+class Session:
+    """One simulated shopper: a client, a random source and the records."""
+
+    def __init__(self, client, rng, catalog):
+        self.client = client
+        self.rng = rng
+        self.catalog = catalog
+        self.records = []
+
+    def call(self, endpoint, method, path, data=None):
+        start = time.perf_counter()
+        status, body, queries = self.client.request(method, path, data)
+        self.records.append({
+            'endpoint': endpoint,
+            'ms': (time.perf_counter() - start) * 1000,
+            'queries': queries,
+            'error': not 200 <= status < 300,
+        })
+        return status, body
+
+    def product_id(self):
+        return self.rng.randint(*self.catalog['product_ids'])
+
+
+def load_catalog():
+    """The ids scenarios pick from, read once before the run."""
+    first, last = Product.objects.aggregate(Min('id'), Max('id')).values()
+    if first is None:
+        raise ValueError('There are no products, seed some first.')
+    return {
+        'product_ids': (first, last),
+        'collection_ids': list(Collection.objects.values_list('id', flat=True)),
+    }
+
+
+def browse(session):
+    status, page = session.call('products list', 'GET', '/store/products/')
+    if status == 200 and page['next']:
+        session.call('products next page', 'GET', page['next'])
+    session.call('products by collection', 'GET', '/store/products/', {
+        'collection_id': session.rng.choice(session.catalog['collection_ids'])})
+    session.call('products by price', 'GET', '/store/products/', {
+        'ordering': 'unit_price', 'unit_price__gt': session.rng.randint(0, 500)})
+    product_id = session.product_id()
+    session.call('product detail', 'GET', f'/store/products/{product_id}/')
+    session.call('product reviews', 'GET', f'/store/products/{product_id}/reviews/')
+
+
+def search(session):
+    words = session.rng.sample(WORDS, 2)
+    session.call('search', 'GET', '/store/products/', {'search': ' '.join(words)})
+    session.call('search prefix', 'GET', '/store/products/', {'search': words[0][:3]})
+
+
+def add_to_cart(session):
+    status, cart = session.call('create cart', 'POST', '/store/carts/')
+    if status != 201:
+        return None
+    for _ in range(session.rng.randint(1, 4)):
+        session.call('add to cart', 'POST', f'/store/carts/{cart["id"]}/items/', {
+            'product_id': session.product_id(), 'quantity': session.rng.randint(1, 3)})
+    session.call('view cart', 'GET', f'/store/carts/{cart["id"]}/')
+    return cart['id']
+
+
+def checkout(session):
+    cart_id = add_to_cart(session)
+    if cart_id is not None:
+        session.call('checkout', 'POST', '/store/orders/', {'cart_id': cart_id})
+
+
+def order_history(session):
+    session.call('order history', 'GET', '/store/orders/')
+    session.call('order totals', 'GET', '/store/orders/totals/')
+
+
+SCENARIOS = {
+    'browse': browse,
+    'search': search,
+    'add_to_cart': add_to_cart,
+    'checkout': checkout,
+    'order_history': order_history,
+}
+
+
+def run(client, scenarios, iterations, seed=0):
+    """
+    Runs each scenario `iterations` times in turn with one client and
+    returns {'endpoints': {...}, 'scenarios': {...}} with latency
+    percentiles in milliseconds, error and query counts per endpoint and
+    throughput per scenario.
+    """
+    rng = random.Random(seed)
+    catalog = load_catalog()
+    endpoints, totals = {}, {}
+    for name in scenarios:
+        session = Session(client, rng, catalog)
+        start = time.perf_counter()
+        for _ in range(iterations):
+            SCENARIOS[name](session)
+        elapsed = time.perf_counter() - start
+        totals[name] = {
+            'iterations_per_second': iterations / elapsed,
+            'requests_per_second': len(session.records) / elapsed,
+        }
+        for record in session.records:
+            endpoints.setdefault(record['endpoint'], []).append(record)
+
+    results = {}
+    for endpoint, records in sorted(endpoints.items()):
+        stats = percentiles([record['ms'] for record in records])
+        stats['requests'] = len(records)
+        stats['errors'] = sum(record['error'] for record in records)
+        queries = [record['queries'] for record in records if record['queries'] is not None]
+        stats['queries_mean'] = sum(queries) / len(queries) if queries else None
+        stats['queries_max'] = max(queries) if queries else None
+        results[endpoint] = stats
+    return {'endpoints': results, 'scenarios': totals}
+
+
+def run_concurrent(client, paths, requests, concurrency):
+    """
+    Sends `requests` GETs, cycling through `paths`, from `concurrency`
+    threads at once and returns latency percentiles in milliseconds,
+    errors and requests per second.
+    """
+    def get(i):
+        start = time.perf_counter()
+        try:
+            status, _, _ = client.request('GET', paths[i % len(paths)])
+        except OSError:
+            status = None
+        return (time.perf_counter() - start) * 1000, status is None or not 200 <= status < 300
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(concurrency) as executor:
+        records = list(executor.map(get, range(requests)))
+    elapsed = time.perf_counter() - start
+    stats = percentiles([ms for ms, _ in records])
+    stats['errors'] = sum(error for _, error in records)
+    stats['requests_per_second'] = requests / elapsed
+    return stats
+
+
+def compare(results, baseline, tolerance=0.25, slack_ms=2.0):
+    """
+    Returns the regressions of `results` against a saved `baseline`: an
+    endpoint's p95 more than `tolerance` (a fraction) and `slack_ms`
+    slower, more queries than before, or new errors.
+    """
+    regressions = []
+    for endpoint, before in baseline['endpoints'].items():
+        after = results['endpoints'].get(endpoint)
+        if after is None:
+            continue
+        limit = max(before['p95'] * (1 + tolerance), before['p95'] + slack_ms)
+        if after['p95'] > limit:
+            regressions.append(
+                f'{endpoint}: p95 {after["p95"]:.2f}ms, baseline {before["p95"]:.2f}ms')
+        if None not in (after['queries_max'], before['queries_max']) \
+                and after['queries_max'] > before['queries_max']:
+            regressions.append(
+                f'{endpoint}: {after["queries_max"]} queries, baseline {before["queries_max"]}')
+        if after['errors'] > before['errors']:
+            regressions.append(
+                f'{endpoint}: {after["errors"]} errors, baseline {before["errors"]}')
+    return regressions
@@ -0,0 +1,27 @@
+import time
+from datetime import date
+
+from django.core.management.base import BaseCommand
+
+from store.analytics import backfill_sales_rollups
+
+
+class Command(BaseCommand):
+    help = 'Recomputes the daily sales tables of every day with orders, or of --start to --end.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--start', type=date.fromisoformat, help='First day, YYYY-MM-DD.')
+        parser.add_argument('--end', type=date.fromisoformat, help='Last day, YYYY-MM-DD.')
+        parser.add_argument('--batch-days', type=int, default=7,
+                            help='Days recomputed per transaction.')
+
+    def handle(self, *args, **options):
+        start = time.monotonic()
+
+        def progress(first_day, last_day, rows):
+            self.stdout.write(
+                f'{first_day} to {last_day}: {rows} rows in {time.monotonic() - start:.1f}s')
+
+        written = backfill_sales_rollups(
+            options['start'], options['end'], options['batch_days'], progress)
+        self.stdout.write(self.style.SUCCESS(f'Wrote {written} rollup rows.'))
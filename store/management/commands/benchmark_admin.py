@@ -0,0 +1,47 @@
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+
+from store.benchmarks import benchmark_client, expect_status, format_stats, measure, seed_orders
+from store.models import Order
+
+PATHS = [
+    '/admin/store/product/',
+    '/admin/store/product/?p=1000',
+    '/admin/store/product/?q=pasta',
+    '/admin/store/customer/',
+    '/admin/store/customer/?o=-4',
+    '/admin/store/order/',
+    '/admin/store/order/?p=1000',
+    '/admin/core/user/',
+]
+
+
+class Command(BaseCommand):
+    help = 'Measures admin changelist rendering, to check it stays flat as orders grow.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--seed', type=int, default=0,
+                            help='Number of synthetic orders to insert first.')
+        parser.add_argument('--path', action='append',
+                            help='Changelist to measure, repeatable. Defaults to the main ones.')
+        parser.add_argument('--repeat', type=int, default=10)
+
+    def handle(self, *args, **options):
+        if options['seed']:
+            seed_orders(options['seed'])
+        user = get_user_model().objects.filter(is_superuser=True).first()
+        if user is None:
+            raise CommandError('There is no superuser, create one first.')
+        client = benchmark_client(Client)
+        client.force_login(user)
+        self.stdout.write(f'{Order.objects.count()} orders')
+
+        for path in options['path'] or PATHS:
+            with CaptureQueriesContext(connection) as context:
+                expect_status(client.get(path))
+            self.stdout.write(format_stats(
+                f'{path} ({len(context.captured_queries)} queries)',
+                measure(lambda: client.get(path), options['repeat'])))
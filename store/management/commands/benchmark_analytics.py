@@ -0,0 +1,68 @@
+import time
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.db.models import Count, Sum
+from django.test.utils import override_settings
+from django.utils import timezone
+
+from store.analytics import (
+    ROLLUPS, backfill_sales_rollups, summarize, touch_orders, update_sales_rollups)
+from store.benchmarks import format_stats, measure, seed_orders
+from store.models import Order, OrderItem, line_total
+
+
+class Command(BaseCommand):
+    help = 'Compares sales reports computed from the order items with the daily rollups.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--seed', type=int, default=0,
+                            help='Number of synthetic orders to insert first.')
+        parser.add_argument('--days', type=int, default=365,
+                            help='Days the seeded orders are spread over.')
+        parser.add_argument('--range', type=int, default=30,
+                            help='Days covered by the reports.')
+        parser.add_argument('--changed', type=int, default=1000,
+                            help='Latest orders changed before the incremental update.')
+        parser.add_argument('--repeat', type=int, default=10)
+
+    @override_settings(STORE_ANALYTICS_SETTLE_SECONDS=0)
+    def handle(self, *args, **options):
+        if options['seed']:
+            seed_orders(options['seed'], options['days'])
+        self.stdout.write(
+            f'{Order.objects.count()} orders, {OrderItem.objects.count()} order items')
+
+        start = time.perf_counter()
+        rows = backfill_sales_rollups()
+        self.stdout.write(f'backfill {time.perf_counter() - start:8.2f}s {rows} rollup rows')
+
+        last_day = timezone.localdate()
+        first_day = last_day - timedelta(days=options['range'] - 1)
+        items = OrderItem.objects.filter(
+            order__payment_status=Order.PAYMENT_STATUS_COMPLETE,
+            order__placed_at__date__range=(first_day, last_day))
+        totals = dict(orders_count=Count('order_id', distinct=True),
+                      items_count=Sum('quantity'), revenue=Sum(line_total()))
+        for model, lookup, field in ROLLUPS:
+            label = f'top 100 by {field}'
+            self.stdout.write(format_stats(f'{label}, order items', measure(
+                lambda: list(items.values(lookup).annotate(**totals)
+                             .order_by('-revenue')[:100]), options['repeat'], 1)))
+            rollups = model.objects.filter(day__range=(first_day, last_day))
+            self.stdout.write(format_stats(f'{label}, rollups', measure(
+                lambda: list(summarize(rollups, field).order_by('-revenue')[:100]),
+                options['repeat'], 1)))
+
+        # what the periodic job does after the latest orders were paid or
+        # edited, changes to older orders cost a recompute of their day each
+        changed = Order.objects.order_by('-placed_at').values_list('pk', flat=True)[:options['changed']]
+        touch_orders(Order.objects.filter(pk__in=list(changed)))
+        start = time.perf_counter()
+        days = update_sales_rollups()
+        self.stdout.write(
+            f'update after {options["changed"]} changed orders '
+            f'{time.perf_counter() - start:8.2f}s {len(days)} days')
+        start = time.perf_counter()
+        update_sales_rollups()
+        self.stdout.write(f'update with no changes {(time.perf_counter() - start) * 1000:8.2f}ms')
@@ -0,0 +1,55 @@
+import io
+import json
+import random
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from store.benchmarks import random_words
+from store.importexport import ProductImporter, export_rows, read_rows, render_rows
+from store.models import Collection
+
+
+class Command(BaseCommand):
+    help = 'Measures product import and export throughput in rows per second.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=10000)
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument('--format', choices=['csv', 'jsonl'], default='jsonl')
+
+    def handle(self, *args, **options):
+        collection_ids = list(Collection.objects.values_list('id', flat=True))
+        if not collection_ids:
+            raise CommandError('Needs at least one collection.')
+        rng = random.Random(0)
+        rows = [{
+            'title': random_words(rng, 3),
+            'slug': 'imported',
+            'description': random_words(rng, 12),
+            'unit_price': f'{rng.randint(100, 99999) / 100:.2f}',
+            'inventory': rng.randint(0, 100),
+            'collection': rng.choice(collection_ids),
+            'promotions': [],
+            'tags': [rng.choice(['new', 'sale', 'organic'])],
+        } for _ in range(options['rows'])]
+        if options['format'] == 'jsonl':
+            source = ''.join(json.dumps(row) + '\n' for row in rows)
+        else:
+            source = ''.join(render_rows(iter(rows), 'csv'))
+
+        importer = ProductImporter(batch_size=options['batch_size'])
+        start = time.perf_counter()
+        stats = importer.run(read_rows(io.StringIO(source), options['format']))
+        elapsed = time.perf_counter() - start
+        self.stdout.write(
+            f'import: {stats["rows"]} rows in {elapsed:.2f}s, '
+            f'{stats["rows"] / elapsed:.0f} rows/s')
+
+        exported = 0
+        start = time.perf_counter()
+        for _ in render_rows(export_rows(batch_size=options['batch_size']), options['format']):
+            exported += 1
+        elapsed = time.perf_counter() - start
+        self.stdout.write(
+            f'export: {exported} rows in {elapsed:.2f}s, {exported / elapsed:.0f} rows/s')
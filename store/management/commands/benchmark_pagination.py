@@ -0,0 +1,45 @@
+from django.core.management.base import BaseCommand
+
+from store.benchmarks import benchmark_client, expect_status, format_stats, measure, seed_products
+from store.models import Product
+from store.pagination import CustomPagination, KeysetPagination
+
+
+class Command(BaseCommand):
+    help = 'Compares deep page latency of /store/products/ with page numbers and cursors.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--seed', type=int, default=0,
+                            help='Number of synthetic products to insert first.')
+        parser.add_argument('--repeat', type=int, default=20)
+
+    def handle(self, *args, **options):
+        if options['seed']:
+            seed_products(options['seed'])
+        total = Product.objects.count()
+        self.stdout.write(f'{total} products')
+
+        client = benchmark_client()
+        paginator = KeysetPagination()
+        for depth in (0.0, 0.1, 0.5, 0.9, 0.99):
+            page = int(total * depth) // CustomPagination.page_size + 1
+            offset = (page - 1) * CustomPagination.page_size
+
+            # cursor pointing just before the same page, built outside the timing
+            cursor = ''
+            if offset:
+                paginator.base_url = 'http://testserver/store/products/'
+                paginator.ordering = ['title', 'pk']
+                last = Product.objects.order_by('title', 'pk')[offset - 1]
+                cursor = paginator.encode_cursor(paginator.position(last), False)
+
+            def page_number():
+                return expect_status(client.get('/store/products/', {'page': page}))
+
+            def keyset():
+                return expect_status(client.get(cursor or '/store/products/'))
+
+            self.stdout.write(format_stats(
+                f'page={page}', measure(page_number, options['repeat'])))
+            self.stdout.write(format_stats(
+                f'cursor at row {offset}', measure(keyset, options['repeat'])))
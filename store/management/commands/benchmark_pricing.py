@@ -0,0 +1,57 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from store.benchmarks import format_stats, measure, seed_products, seed_promotions
+from store.models import Product, ProductPrice
+from store.pricing import reprice
+
+
+class Command(BaseCommand):
+    help = 'Measures full catalog repricing, e.g. at 1M products, and incremental repricing.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--seed', type=int, default=0,
+                            help='Number of synthetic products to insert first, 1000000 for 1M.')
+        parser.add_argument('--promoted', type=int, default=100000,
+                            help='Product promotion links to add with --seed.')
+        parser.add_argument('--batch-size', type=int, action='append',
+                            help='Chunk size to compare, repeatable. Defaults to 5000.')
+        parser.add_argument('--repeat', type=int, default=20,
+                            help='Runs of the incremental cases.')
+
+    def handle(self, *args, **options):
+        if options['seed']:
+            seed_products(options['seed'])
+            seed_promotions(10, options['promoted'])
+        products = Product.objects.count()
+        promoted = Product.promotions.through.objects.count()
+        self.stdout.write(f'{products} products, {promoted} promotion links')
+
+        for batch_size in options['batch_size'] or [5000]:
+            start = time.perf_counter()
+            priced = reprice(batch_size=batch_size)
+            elapsed = time.perf_counter() - start
+            self.stdout.write(
+                f'full catalog, batches of {batch_size:<6} {elapsed:8.2f}s '
+                f'{priced / elapsed:10.0f} products/s')
+
+        # what the signal handlers run after a product or promotion change
+        product = Product.objects.order_by('pk').first()
+        promotion = Product.promotions.through.objects.order_by('pk').first()
+        self.stdout.write(format_stats(
+            'one product', measure(
+                lambda: reprice(Product.objects.filter(pk=product.pk)), options['repeat'])))
+        if promotion:
+            promotion_products = Product.objects.filter(promotions=promotion.promotion_id)
+            self.stdout.write(format_stats(
+                f'one promotion ({promotion_products.count()} products)', measure(
+                    lambda: reprice(promotion_products), max(1, options['repeat'] // 10), 0)))
+
+        # reading a page of prices back, as the product list does
+        def page():
+            with transaction.atomic():
+                list(Product.objects.select_related('pricing').order_by('title')[:100])
+        self.stdout.write(format_stats('page of 100 with prices', measure(page, options['repeat'])))
+        self.stdout.write(f'{ProductPrice.objects.count()} prices stored')
@@ -0,0 +1,48 @@
+from django.core.management.base import BaseCommand
+from django.db.models import Q
+
+from store.benchmarks import format_stats, measure, seed_products
+from store.models import Product
+from store.search import get_search_backend
+
+QUERIES = ['coffee', 'organic tea', 'smoked sal', 'kalomi', 'zepo']
+
+
+class Command(BaseCommand):
+    help = 'Compares product search latency of the search index against LIKE scans.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--seed', type=int, default=0,
+                            help='Number of synthetic products to insert first.')
+        parser.add_argument('--repeat', type=int, default=20)
+
+    def handle(self, *args, **options):
+        backend = get_search_backend()
+        if options['seed']:
+            seed_products(options['seed'])
+            self.stdout.write('Rebuilding search index...')
+            backend.rebuild()
+        self.stdout.write(
+            f'{Product.objects.count()} products, backend {type(backend).__name__}')
+
+        for query in QUERIES:
+            # what SearchFilter generated for search_fields
+            # ['title', 'description', 'collection__title']
+            like = Q()
+            for term in query.split():
+                like &= Q(title__icontains=term) | Q(description__icontains=term) \
+                    | Q(collection__title__icontains=term)
+
+            # the list endpoint counts the matches and fetches the first page
+            def like_page():
+                queryset = Product.objects.filter(like)
+                return queryset.count(), list(queryset[:10])
+
+            def index_page():
+                queryset = backend.search(Product.objects.all(), query)
+                return queryset.count(), list(queryset.order_by('-search_rank', 'title')[:10])
+
+            self.stdout.write(format_stats(
+                f'LIKE  "{query}"', measure(like_page, options['repeat'])))
+            self.stdout.write(format_stats(
+                f'index "{query}"', measure(index_page, options['repeat'])))
@@ -0,0 +1,62 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Prefetch, Sum
+
+from store import fastserializers
+from store.carts import ORMCartStore
+from store.models import Cart, Order, OrderItem, Product, line_total
+from store.serializers import CartSerializer, OrderSerializer, ProductListSerializer
+from likes.counters import prefetch_like_counts
+from tags.models import prefetch_tags
+
+
+def objects_per_second(fn, objects, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return len(objects) * repeat / (time.perf_counter() - start)
+
+
+class Command(BaseCommand):
+    help = 'Compares objects/second of the DRF serializers and their fast variants.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=2000)
+        parser.add_argument('--repeat', type=int, default=5)
+
+    def handle(self, *args, **options):
+        rows, repeat = options['rows'], options['repeat']
+        products = list(Product.objects.all()[:rows])
+        prefetch_tags(products)
+        prefetch_like_counts(products)
+        # annotated like OrderViewSet.get_queryset
+        items = OrderItem.objects \
+            .select_related('product') \
+            .annotate(total_price=line_total('quantity', 'unit_price'))
+        orders = list(Order.objects
+                      .annotate(total_price=Sum(line_total('items__quantity', 'items__unit_price')))
+                      .prefetch_related(Prefetch('items', queryset=items))[:rows])
+        store = ORMCartStore()
+        carts = [store.get(cart_id) for cart_id in
+                 Cart.objects.filter(items__isnull=False).distinct().values_list('id', flat=True)[:rows]]
+
+        cases = [
+            ('product', ProductListSerializer, fastserializers.FastProductSerializer, products),
+            ('order', OrderSerializer, fastserializers.FastOrderSerializer, orders),
+            ('cart', CartSerializer, fastserializers.FastCartSerializer, carts),
+        ]
+        for label, slow, fast, objects in cases:
+            if not objects:
+                self.stdout.write(f'{label:<24} no rows')
+                continue
+            fast_data = fast(objects, many=True).data
+            slow_data = slow(objects, many=True).data
+            if [dict(row) for row in slow_data] != list(fast_data):
+                raise CommandError(f'{label}: fast serializer output differs.')
+            slow_rate = objects_per_second(
+                lambda: slow(objects, many=True).data, objects, repeat)
+            fast_rate = objects_per_second(
+                lambda: fast(objects, many=True).data, objects, repeat)
+            self.stdout.write(
+                f'{label:<24} drf {slow_rate:>10.0f}/s  fast {fast_rate:>10.0f}/s  ({len(objects)} objects)')
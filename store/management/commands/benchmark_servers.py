@@ -0,0 +1,51 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from store import loadtest
+from store.models import Cart, Collection, Product
+
+
+class Command(BaseCommand):
+    help = 'Compares running servers, e.g. gunicorn (WSGI) against uvicorn (ASGI) with ' \
+        'STORE_ASYNC_VIEWS, on the catalog and cart reads at increasing concurrency.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('server', nargs='+', metavar='NAME=URL',
+                            help='Base URL of a running server, e.g. asgi=http://127.0.0.1:8001.')
+        parser.add_argument('--concurrency', type=int, action='append',
+                            help='Requests in flight at once, repeatable. Defaults to 1, 10 and 50.')
+        parser.add_argument('--requests', type=int, default=500,
+                            help='Requests per server and concurrency.')
+        parser.add_argument('--path', action='append',
+                            help='Path to request, repeatable. Defaults to the catalog and cart reads.')
+
+    def get_paths(self):
+        product = Product.objects.order_by('pk').first()
+        collection = Collection.objects.order_by('pk').first()
+        cart = Cart.objects.filter(items__isnull=False).order_by('created_at').first()
+        if product is None or collection is None:
+            raise CommandError('There are no products, seed some first.')
+        paths = [
+            '/store/products/',
+            f'/store/products/?collection_id={collection.pk}',
+            f'/store/products/{product.pk}/',
+            f'/store/products/{product.pk}/reviews/',
+            '/store/collections/',
+        ]
+        if cart:
+            paths += [f'/store/carts/{cart.pk}/', f'/store/carts/{cart.pk}/items/']
+        return paths
+
+    def handle(self, *args, **options):
+        servers = []
+        for server in options['server']:
+            name, _, url = server.partition('=') if '=' in server else (server, '', server)
+            servers.append((name, loadtest.ServerClient(url)))
+        paths = options['path'] or self.get_paths()
+
+        for concurrency in options['concurrency'] or [1, 10, 50]:
+            for name, client in servers:
+                stats = loadtest.run_concurrent(client, paths, options['requests'], concurrency)
+                self.stdout.write(
+                    f'{name:<8} c={concurrency:<4} {stats["requests_per_second"]:8.1f} requests/s '
+                    f'p50={stats["p50"]:8.2f}ms p95={stats["p95"]:8.2f}ms p99={stats["p99"]:8.2f}ms '
+                    f'errors={stats["errors"]}')
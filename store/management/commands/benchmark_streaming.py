@@ -0,0 +1,44 @@
+import tracemalloc
+
+from django.core.management.base import BaseCommand
+from rest_framework.renderers import JSONRenderer
+
+from store.benchmarks import benchmark_client, expect_status
+from store.models import Product
+from store.serializers import ProductSerializer
+
+
+def peak_memory(fn):
+    tracemalloc.start()
+    try:
+        fn()
+        return tracemalloc.get_traced_memory()[1] / 1024 / 1024
+    finally:
+        tracemalloc.stop()
+
+
+class Command(BaseCommand):
+    help = 'Compares peak memory of rendering the product list in one go and streaming it.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--prices', default='10,100,1000',
+                            help='unit_price__lt thresholds used to vary the number of rows.')
+
+    def handle(self, *args, **options):
+        client = benchmark_client()
+        for price in options['prices'].split(','):
+            queryset = Product.objects.filter(unit_price__lt=price)
+            rows = queryset.count()
+
+            def render_all():
+                JSONRenderer().render(ProductSerializer(queryset, many=True).data)
+
+            def stream():
+                response = expect_status(
+                    client.get('/store/products/', {'stream': 'true', 'unit_price__lt': price}))
+                for _ in response.streaming_content:
+                    pass
+
+            self.stdout.write(
+                f'{rows:>8} rows: render all {peak_memory(render_all):8.1f} MiB, '
+                f'stream {peak_memory(stream):8.1f} MiB')
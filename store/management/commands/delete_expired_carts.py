@@ -0,0 +1,36 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from store.carts import delete_expired_carts
+
+
+class Command(BaseCommand):
+    help = 'Deletes carts older than a given age in small batches.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--max-age', type=int,
+            default=getattr(settings, 'STORE_CART_TTL', 7 * 24 * 60 * 60),
+            help='Age in seconds after which a cart is abandoned, defaults to STORE_CART_TTL.')
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument('--dry-run', action='store_true',
+                            help='Only report what would be deleted.')
+
+    def handle(self, *args, **options):
+        verb = 'Would delete' if options['dry_run'] else 'Deleted'
+
+        def progress(stats):
+            self.stdout.write(
+                f'batch {stats["batches"]}: {verb.lower()} {stats["carts"]} carts, '
+                f'{stats["items"]} items in {stats["seconds"]:.1f}s')
+
+        stats = delete_expired_carts(
+            timedelta(seconds=options['max_age']),
+            batch_size=options['batch_size'],
+            dry_run=options['dry_run'],
+            progress=progress if options['verbosity'] > 1 else None)
+        self.stdout.write(self.style.SUCCESS(
+            f'{verb} {stats["carts"]} carts and {stats["items"]} items '
+            f'in {stats["batches"]} batches ({stats["seconds"]:.1f}s).'))
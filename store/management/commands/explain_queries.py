@@ -0,0 +1,202 @@
+import re
+from contextlib import ExitStack
+from uuid import uuid4
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from django.urls import reverse
+
+from store.benchmarks import benchmark_client, expect_status
+from store.models import Cart, CartItem, Collection, Customer, Order, Product, Review
+from store.search import tokenize
+from store.urls import carts_router, products_router, router
+
+# the routers of store.urls, every GET route of theirs is checked
+ROUTERS = [router, products_router, carts_router]
+# tables each route is expected to read in full, by route name
+ALLOWED_SCANS = {
+    # collections aren't paginated, the list reads them all
+    'collections-list': ('store_collection',),
+    # staff totals aggregate every order item
+    'orders-totals': ('store_orderitem',),
+}
+
+# a bare SCAN reads the whole table, SCAN ... USING INDEX walks an index
+SQLITE_SCAN = re.compile(r'^SCAN (?:TABLE )?(\w+)$')
+POSTGRES_SCAN = re.compile(r'Seq Scan on (\w+)')
+
+
+def explain(alias, sql, params):
+    """Returns [(table, problem)] for the plan of one query."""
+    problems = []
+    connection = connections[alias]
+    with connection.cursor() as cursor:
+        if connection.vendor == 'sqlite':
+            cursor.execute('EXPLAIN QUERY PLAN ' + sql, params)
+            for *_, detail in cursor.fetchall():
+                match = SQLITE_SCAN.match(detail)
+                if match:
+                    problems.append((match.group(1), 'full scan'))
+        elif connection.vendor == 'mysql':
+            cursor.execute('EXPLAIN ' + sql, params)
+            columns = [column[0] for column in cursor.description]
+            for row in cursor.fetchall():
+                row = dict(zip(columns, row))
+                if row['type'] == 'ALL':
+                    problems.append((row['table'], 'full scan'))
+        elif connection.vendor == 'postgresql':
+            cursor.execute('EXPLAIN ' + sql, params)
+            for line, in cursor.fetchall():
+                for table in POSTGRES_SCAN.findall(line):
+                    problems.append((table, 'full scan'))
+        else:
+            raise CommandError(f'EXPLAIN is not supported for {connection.vendor}.')
+    return problems
+
+
+class Command(BaseCommand):
+    help = 'Runs EXPLAIN on the queries behind the store endpoints and flags full table scans.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--allow', action='append', default=[], metavar='TABLE',
+                            help='Table whose full scans are acceptable, e.g. a lookup table.')
+        parser.add_argument('--url', action='append', default=[],
+                            help='Extra URL to check, with its query string.')
+        parser.add_argument('--verbose-sql', action='store_true',
+                            help='Print every query, not only the flagged ones.')
+
+    def get_samples(self, user):
+        """An object per basename for the detail routes, nested ones with their parent."""
+        review = Review.objects.select_related('product').order_by('pk').first()
+        item = CartItem.objects.select_related('cart').order_by('pk').first()
+        orders = Order.objects.order_by('pk')
+        if not user.is_staff:
+            orders = orders.filter(customer__user=user)
+        return {
+            'products': review.product if review else Product.objects.order_by('pk').first(),
+            'product-reviews': review,
+            'collections': Collection.objects.order_by('pk').first(),
+            'carts': item.cart if item else Cart.objects.order_by('pk').first(),
+            'cart-items': item,
+            'customer': Customer.objects.filter(user=user).first(),
+            'orders': orders.first(),
+        }
+
+    def get_queries(self, samples):
+        """Query strings checked on top of the bare URL, by route name."""
+        product, collection = samples['products'], samples['collections']
+        sales = ['?membership=B']
+        products = [
+            '?ordering=unit_price',
+            '?ordering=-last_update',
+            '?unit_price__gt=10&unit_price__lt=50',
+        ]
+        if collection:
+            products.append(f'?collection_id={collection.pk}')
+            sales.append(f'?collection_id={collection.pk}')
+        if product:
+            term = (tokenize(product.title) or ['a'])[0]
+            products += [f'?search={term}', f'?search={term[:2]}&ordering=unit_price']
+            sales.append(f'?product_id={product.pk}')
+        return {'products-list': products, 'sales-daily': sales}
+
+    def get_urls(self, user):
+        """(url, tables expected to be read in full) of every GET route of store.urls."""
+        samples = self.get_samples(user)
+        queries = self.get_queries(samples)
+        urls = []
+        for url_router in ROUTERS:
+            parent_kwargs = {}
+            if hasattr(url_router, 'parent_regex'):
+                parent = samples.get(next(
+                    basename for prefix, _, basename in url_router.parent_router.registry
+                    if prefix == url_router.parent_prefix))
+                if parent is None:
+                    continue
+                parent_kwargs[url_router.nest_prefix + 'pk'] = parent.pk
+            for _, viewset, basename in url_router.registry:
+                for route in url_router.get_routes(viewset):
+                    if 'get' not in url_router.get_method_map(viewset, route.mapping):
+                        continue
+                    kwargs = dict(parent_kwargs)
+                    if route.detail:
+                        sample = samples.get(basename)
+                        if sample is None:
+                            continue
+                        kwargs['pk'] = sample.pk
+                    name = route.name.format(basename=basename)
+                    url = reverse(name, kwargs=kwargs)
+                    allowed = ALLOWED_SCANS.get(name, ())
+                    urls += [(url + query, allowed) for query in ['', *queries.get(name, [])]]
+        return urls
+
+    def handle(self, *args, **options):
+        User = get_user_model()
+        staff = User.objects.filter(is_staff=True).order_by('pk').first()
+        if staff is None:
+            raise CommandError('A staff user is needed to reach every endpoint.')
+        # customers read their own orders, through other indexes than staff
+        customer = User.objects \
+            .filter(is_staff=False, customer__order__isnull=False) \
+            .order_by('pk') \
+            .first()
+        users = [staff]
+        if customer is None:
+            self.stdout.write(self.style.WARNING(
+                'No customer with orders, the customer queries are not checked.'))
+        else:
+            users.append(customer)
+
+        flagged = 0
+        for user in users:
+            self.stdout.write(f'As {user.get_username()}{" (staff)" if user.is_staff else ""}:')
+            urls = self.get_urls(user) + [(url, ()) for url in options['url']]
+            flagged += self.check_urls(user, urls, options)
+
+        if flagged:
+            raise CommandError(f'{flagged} full table scans.')
+        self.stdout.write(self.style.SUCCESS('No full table scans.'))
+
+    def check_urls(self, user, urls, options):
+        """Requests each URL as `user` and returns how many full scans were flagged."""
+        client = benchmark_client()
+        client.force_authenticate(user)
+        queries = []
+
+        def capture(execute, sql, params, many, context):
+            # reads may have been routed to a replica
+            queries.append((context['connection'].alias, sql, params))
+            return execute(sql, params, many, context)
+
+        flagged = 0
+        for url, allowed in urls:
+            queries.clear()
+            # a parameter nothing reads keeps cached responses from hiding
+            # the queries
+            separator = '&' if '?' in url else '?'
+            with ExitStack() as stack:
+                for connection in connections.all():
+                    stack.enter_context(connection.execute_wrapper(capture))
+                response = client.get(f'{url}{separator}_explain={uuid4().hex}')
+            if response.status_code == 403:
+                # staff only endpoints, on the customer pass
+                self.stdout.write(f'{url} {response.status_code} skipped')
+                continue
+            # the queries of an error page say nothing about the endpoint
+            expect_status(response)
+            self.stdout.write(f'{url} {response.status_code} {len(queries)} queries')
+
+            for alias, sql, params in queries:
+                if not sql.lstrip().upper().startswith('SELECT'):
+                    continue
+                problems = [
+                    (table, problem) for table, problem in explain(alias, sql, params)
+                    if table not in options['allow'] and table not in allowed
+                ]
+                if options['verbose_sql'] or problems:
+                    self.stdout.write(f'  {sql}')
+                for table, problem in problems:
+                    flagged += 1
+                    self.stdout.write(self.style.WARNING(f'    {problem} of {table}'))
+        return flagged
@@ -0,0 +1,23 @@
+import sys
+
+from django.core.management.base import BaseCommand
+
+from store.importexport import export_rows, render_rows
+
+
+class Command(BaseCommand):
+    help = 'Streams all products to a CSV or JSON Lines file.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help="File to write, '-' for stdout.")
+        parser.add_argument('--format', choices=['csv', 'jsonl'], default='csv')
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        chunks = render_rows(
+            export_rows(batch_size=options['batch_size']), options['format'])
+        if options['path'] == '-':
+            sys.stdout.writelines(chunks)
+            return
+        with open(options['path'], 'w', newline='', encoding='utf-8') as stream:
+            stream.writelines(chunks)
@@ -0,0 +1,36 @@
+import sys
+
+from django.core.management.base import BaseCommand
+
+from store.importexport import ProductImporter, read_rows
+
+
+class Command(BaseCommand):
+    help = 'Creates or updates products from a CSV or JSON Lines file.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help="File to read, '-' for stdin.")
+        parser.add_argument('--format', choices=['csv', 'jsonl'], default='csv')
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        importer = ProductImporter(batch_size=options['batch_size'])
+
+        def progress(stats):
+            self.stdout.write(
+                f'{stats["rows"]} rows: {stats["created"]} created, '
+                f'{stats["updated"]} updated, {stats["errors"]} invalid')
+
+        if options['path'] == '-':
+            stats = importer.run(read_rows(sys.stdin, options['format']), progress)
+        else:
+            with open(options['path'], newline='', encoding='utf-8') as stream:
+                stats = importer.run(read_rows(stream, options['format']), progress)
+
+        for row, errors in importer.errors[:20]:
+            self.stderr.write(f'row {row}: {errors}')
+        if stats['unindexed']:
+            self.stdout.write(
+                f'{stats["unindexed"]} new products need rebuild_search_index to be searchable.')
+        self.stdout.write(self.style.SUCCESS(
+            f'Imported {stats["created"] + stats["updated"]} of {stats["rows"]} rows.'))
@@ -0,0 +1,80 @@
+import json
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+
+from store import loadtest
+from store.benchmarks import SEED_PASSWORD
+
+
+class Command(BaseCommand):
+    help = 'Runs shopper scenarios against the API and reports latency, throughput ' \
+        'and query counts per endpoint, optionally against a saved baseline.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--scenario', action='append', choices=list(loadtest.SCENARIOS),
+                            help='Scenario to run, repeatable. Defaults to all of them.')
+        parser.add_argument('--iterations', type=int, default=50,
+                            help='Runs of each scenario.')
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--url',
+                            help='Base URL of a running server, instead of the test client.')
+        parser.add_argument('--username',
+                            help='Shopper to log in as, defaults to the first non staff user.')
+        parser.add_argument('--password', default=SEED_PASSWORD)
+        parser.add_argument('--save-baseline', metavar='PATH',
+                            help='Write the results to PATH as the new baseline.')
+        parser.add_argument('--baseline', metavar='PATH',
+                            help='Fail when the results regress against this baseline.')
+        parser.add_argument('--tolerance', type=float, default=0.25,
+                            help='Allowed p95 slowdown against the baseline, as a fraction.')
+
+    def get_user(self, username):
+        users = get_user_model().objects.filter(customer__isnull=False)
+        if username:
+            users = users.filter(username=username)
+        else:
+            users = users.filter(is_staff=False).order_by('pk')
+        user = users.first()
+        if user is None:
+            raise CommandError('No shopper to log in as, seed_benchmark_data creates some.')
+        return user
+
+    def handle(self, *args, **options):
+        user = self.get_user(options['username'])
+        scenarios = options['scenario'] or list(loadtest.SCENARIOS)
+        try:
+            if options['url']:
+                client = loadtest.ServerClient(options['url'], user.username, options['password'])
+            else:
+                client = loadtest.TestClient(user)
+            results = loadtest.run(client, scenarios, options['iterations'], options['seed'])
+        except ValueError as error:
+            raise CommandError(error)
+
+        for endpoint, stats in results['endpoints'].items():
+            queries = '' if stats['queries_max'] is None else \
+                f' queries={stats["queries_mean"]:.1f}/{stats["queries_max"]}'
+            self.stdout.write(
+                f'{endpoint:<24} n={stats["requests"]:<5} p50={stats["p50"]:8.2f}ms '
+                f'p95={stats["p95"]:8.2f}ms p99={stats["p99"]:8.2f}ms '
+                f'errors={stats["errors"]}{queries}')
+        for scenario, stats in results['scenarios'].items():
+            self.stdout.write(
+                f'{scenario:<24} {stats["iterations_per_second"]:8.1f} runs/s '
+                f'{stats["requests_per_second"]:8.1f} requests/s')
+
+        if options['save_baseline']:
+            with open(options['save_baseline'], 'w') as file:
+                json.dump(results, file, indent=2, sort_keys=True)
+            self.stdout.write(f'Baseline saved to {options["save_baseline"]}.')
+
+        if options['baseline']:
+            with open(options['baseline']) as file:
+                baseline = json.load(file)
+            regressions = loadtest.compare(results, baseline, options['tolerance'])
+            for regression in regressions:
+                self.stdout.write(self.style.ERROR(regression))
+            if regressions:
+                raise CommandError(f'{len(regressions)} regressions against the baseline.')
+            self.stdout.write(self.style.SUCCESS('No regressions against the baseline.'))
@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+
+from store.models import Product
+from store.search import get_search_backend
+
+
+class Command(BaseCommand):
+    help = 'Rebuilds the product search index from scratch.'
+
+    def handle(self, *args, **options):
+        backend = get_search_backend()
+        self.stdout.write(
+            f'Rebuilding search index with {type(backend).__name__}...')
+        backend.rebuild()
+        self.stdout.write(self.style.SUCCESS(
+            f'Indexed {Product.objects.count()} products.'))
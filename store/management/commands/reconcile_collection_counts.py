@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+
+from store.models import Collection
+
+
+class Command(BaseCommand):
+    help = 'Recounts products per collection and fixes drifted products_count values.'
+
+    def handle(self, *args, **options):
+        drifted = Collection.objects.reconcile_products_count()
+        for collection in drifted:
+            self.stdout.write(
+                f'Collection {collection.id}: products_count set to {collection.products_count}')
+        self.stdout.write(self.style.SUCCESS(
+            f'{len(drifted)} collections updated.'))
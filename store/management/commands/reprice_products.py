@@ -0,0 +1,24 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from store.pricing import invalidate_prices, reprice
+
+
+class Command(BaseCommand):
+    help = 'Recomputes the effective price of every product into the price table.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=5000)
+
+    def handle(self, *args, **options):
+        start = time.monotonic()
+        priced = [0]
+
+        def on_chunk(ids):
+            invalidate_prices(ids)
+            priced[0] += len(ids)
+            self.stdout.write(f'{priced[0]} products priced in {time.monotonic() - start:.1f}s')
+
+        reprice(batch_size=options['batch_size'], on_chunk=on_chunk)
+        self.stdout.write(self.style.SUCCESS(f'Priced {priced[0]} products.'))
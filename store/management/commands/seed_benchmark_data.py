@@ -0,0 +1,43 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from store.benchmarks import seed_dataset
+from store.models import Product
+from store.search import get_search_backend
+
+
+class Command(BaseCommand):
+    help = 'Bulk inserts a benchmark data set: users, products, orders, reviews, tags and likes.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--products', type=int, default=1000000)
+        parser.add_argument('--users', type=int, default=10000)
+        parser.add_argument('--orders', type=int, default=50000)
+        parser.add_argument('--reviews', type=int, default=100000)
+        parser.add_argument('--tagged', type=int, default=200000)
+        parser.add_argument('--likes', type=int, default=200000)
+        parser.add_argument('--promoted', type=int, default=100000,
+                            help='Links between products and the 10 promotions.')
+        parser.add_argument('--batch-size', type=int, default=5000)
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--index', action='store_true',
+                            help='Rebuild the search index afterwards.')
+
+    def handle(self, *args, **options):
+        start = time.monotonic()
+
+        def progress(label, count):
+            self.stdout.write(f'{count} {label} in {time.monotonic() - start:.1f}s')
+
+        seed_dataset(
+            products=options['products'], users=options['users'],
+            orders=options['orders'], reviews=options['reviews'],
+            tagged=options['tagged'], likes=options['likes'],
+            promoted=options['promoted'],
+            batch_size=options['batch_size'], seed=options['seed'],
+            progress=progress)
+        if options['index']:
+            get_search_backend().rebuild()
+            progress('products indexed', Product.objects.count())
+        self.stdout.write(self.style.SUCCESS('Done.'))
@@ -0,0 +1,63 @@
+import threading
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from store.carts import get_cart_store
+from store.models import Product
+from store.serializers import AddCartItemSerializer
+
+
+class Command(BaseCommand):
+    help = 'Adds the same product to one cart from many threads and checks no increment is lost.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--threads', type=int, default=8)
+        parser.add_argument('--adds', type=int, default=50,
+                            help='Number of adds per thread.')
+
+    def handle(self, *args, **options):
+        product = Product.objects.first()
+        if product is None:
+            raise CommandError('Needs at least one product.')
+        store = get_cart_store()
+        cart = store.create()
+        # the cart is the only row created, deleted whatever the outcome
+        try:
+            self.stress(store, cart, product, options)
+        finally:
+            store.delete(cart.id)
+
+    def stress(self, store, cart, product, options):
+        errors = []
+
+        def worker():
+            try:
+                for _ in range(options['adds']):
+                    serializer = AddCartItemSerializer(
+                        data={'product_id': product.id, 'quantity': 1},
+                        context={'cart_id': cart.id})
+                    try:
+                        serializer.is_valid(raise_exception=True)
+                        serializer.save()
+                    except Exception as error:
+                        errors.append(repr(error))
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=worker)
+                   for _ in range(options['threads'])]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        quantity = store.get_quantities(cart.id).get(product.id, 0)
+        expected = options['threads'] * options['adds'] - len(errors)
+        self.stdout.write(
+            f'quantity {quantity}, expected {expected}, {len(errors)} failed adds')
+        for error in errors[:5]:
+            self.stdout.write(error)
+        if quantity != expected:
+            raise CommandError('Increments were lost.')
+        self.stdout.write(self.style.SUCCESS('No increments lost.'))
@@ -0,0 +1,107 @@
+import threading
+import uuid
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from rest_framework.exceptions import ValidationError
+
+from core.models import User
+from store.carts import get_cart_store
+from store.models import Collection, Order, OrderItem, Product
+from store.serializers import CreateOrderSerializer
+
+
+class Command(BaseCommand):
+    help = ('Checks out many carts holding the same product concurrently and verifies inventory. '
+            'The users, products and orders it creates are deleted when it ends.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--threads', type=int, default=8)
+        parser.add_argument('--carts', type=int, default=64)
+        parser.add_argument('--inventory', type=int, default=40)
+
+    def handle(self, *args, **options):
+        run = uuid.uuid4().hex[:8]
+        store = get_cart_store()
+        cart_ids = []
+        # everything is created for this run and deleted when it ends,
+        # whatever the outcome
+        try:
+            self.stress(run, store, cart_ids, options)
+        finally:
+            self.clean_up(run, store, cart_ids)
+
+    def stress(self, run, store, cart_ids, options):
+        collection = Collection.objects.create(title=f'stress {run}')
+        hot = Product.objects.create(
+            title=f'hot {run}', slug='hot', unit_price=10,
+            inventory=options['inventory'], collection=collection)
+        other = Product.objects.create(
+            title=f'other {run}', slug='other', unit_price=5,
+            inventory=options['carts'], collection=collection)
+
+        checkouts = []
+        for i in range(options['carts']):
+            user = User.objects.create_user(
+                f'stress-{run}-{i}', f'stress-{run}-{i}@example.com')
+            cart = store.create()
+            cart_ids.append(cart.id)
+            # half the carts list the products in the opposite order
+            products = [hot, other] if i % 2 else [other, hot]
+            store.add_items(cart.id, {product.id: 1 for product in products})
+            checkouts.append((user.customer.id, cart.id))
+
+        results = {'ok': 0, 'rejected': 0, 'errors': []}
+        lock = threading.Lock()
+
+        def worker(jobs):
+            try:
+                for customer_id, cart_id in jobs:
+                    serializer = CreateOrderSerializer(
+                        data={'cart_id': cart_id}, context={'customer_id': customer_id})
+                    try:
+                        serializer.is_valid(raise_exception=True)
+                        serializer.save()
+                        outcome = 'ok'
+                    except ValidationError:
+                        outcome = 'rejected'
+                    except Exception as error:
+                        with lock:
+                            results['errors'].append(repr(error))
+                        continue
+                    with lock:
+                        results[outcome] += 1
+            finally:
+                connection.close()
+
+        threads = [
+            threading.Thread(target=worker, args=(checkouts[i::options['threads']],))
+            for i in range(options['threads'])
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        hot.refresh_from_db()
+        sold = OrderItem.objects.filter(product=hot).count()
+        self.stdout.write(
+            f'{results["ok"]} orders, {results["rejected"]} rejected, '
+            f'{len(results["errors"])} errors, {sold} sold, {hot.inventory} left')
+        for error in results['errors'][:5]:
+            self.stdout.write(error)
+        if hot.inventory < 0 or sold + hot.inventory != options['inventory']:
+            raise CommandError('Inventory is inconsistent with the orders placed.')
+        self.stdout.write(self.style.SUCCESS('Inventory is consistent.'))
+
+    def clean_up(self, run, store, cart_ids):
+        # orders and their items protect the customers and products
+        orders = Order.objects.filter(customer__user__username__startswith=f'stress-{run}-')
+        OrderItem.objects.filter(order__in=orders).delete()
+        orders.delete()
+        for cart_id in cart_ids:
+            store.delete(cart_id)
+        User.objects.filter(username__startswith=f'stress-{run}-').delete()
+        collections = Collection.objects.filter(title=f'stress {run}')
+        Product.objects.filter(collection__in=collections).delete()
+        collections.delete()
@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+
+from store.analytics import update_sales_rollups
+
+
+class Command(BaseCommand):
+    help = 'Rolls up the orders changed since the last run into the daily sales tables, run it often.'
+
+    def handle(self, *args, **options):
+        days = update_sales_rollups()
+        for day in days:
+            self.stdout.write(f'{day} recomputed')
+        self.stdout.write(self.style.SUCCESS(f'{len(days)} days updated.'))
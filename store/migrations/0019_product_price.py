@@ -0,0 +1,23 @@
+# Generated by Django 4.0.3 on 2026-10-18 04:08
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('store', '0018_hot_path_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProductPrice',
+            fields=[
+                ('product', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='pricing', serialize=False, to='store.product')),
+                ('price', models.DecimalField(decimal_places=2, max_digits=6)),
+                ('price_with_tax', models.DecimalField(decimal_places=2, max_digits=7)),
+                ('promotion', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='store.promotion')),
+            ],
+        ),
+    ]
@@ -0,0 +1,26 @@
+from django.db import migrations
+
+
+def index_products(apps, schema_editor):
+    from store.search import InvertedIndexBackend, MySQLFullTextBackend, get_search_backend
+
+    backend = get_search_backend()
+    if not isinstance(backend, (InvertedIndexBackend, MySQLFullTextBackend)):
+        # other backends keep their index elsewhere, run rebuild_search_index
+        return
+    backend = type(backend)()
+    backend.product_model = apps.get_model('store', 'Product')
+    backend.term_model = apps.get_model('store', 'ProductSearchTerm')
+    backend.document_model = apps.get_model('store', 'ProductSearchDocument')
+    backend.rebuild()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('store', '0020_sales_rollups'),
+    ]
+
+    operations = [
+        migrations.RunPython(index_products, migrations.RunPython.noop),
+    ]
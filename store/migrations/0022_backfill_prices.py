@@ -0,0 +1,44 @@
+from django.db import migrations
+
+BATCH_SIZE = 5000
+
+
+def backfill_prices(apps, schema_editor):
+    # store.pricing.reprice with the historical models, a chunk of the
+    # catalog at a time
+    from store.pricing import best_promotions, compute_price
+
+    Product = apps.get_model('store', 'Product')
+    ProductPrice = apps.get_model('store', 'ProductPrice')
+    Through = Product.promotions.through
+    last_id = 0
+    while True:
+        rows = list(Product.objects
+                    .filter(pk__gt=last_id)
+                    .order_by('pk')
+                    .values_list('id', 'unit_price')[:BATCH_SIZE])
+        if not rows:
+            return
+        first_id, last_id = last_id, rows[-1][0]
+        best = best_promotions(Through.objects.filter(product_id__gt=first_id, product_id__lte=last_id))
+
+        prices = []
+        for product_id, unit_price in rows:
+            promotion_id, discount = best.get(product_id, (None, None))
+            price, price_with_tax = compute_price(unit_price, discount)
+            prices.append(ProductPrice(
+                product_id=product_id, promotion_id=promotion_id,
+                price=price, price_with_tax=price_with_tax))
+        ProductPrice.objects.filter(product_id__gt=first_id, product_id__lte=last_id).delete()
+        ProductPrice.objects.bulk_create(prices)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('store', '0021_backfill_search_index'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_prices, migrations.RunPython.noop),
+    ]
@@ -1,20 +1,42 @@
 from django.conf import settings
 from django.core.validators import MinValueValidator
-from django.db import models
+from django.db import connections, models, router
+from django.db.models.functions import Coalesce
 from uuid import uuid4
 
-from store import permissions
-
 
 class Promotion(models.Model):
     description = models.CharField(max_length=255)
+    # fraction of the price taken off, 0.2 for 20%
     discount = models.FloatField()
 
 
+class CollectionManager(models.Manager):
+    def reconcile_products_count(self):
+        # recounts products per collection with one GROUP BY and fixes the
+        # collections whose maintained counter drifted, returns those
+        counts = dict(
+            Product.objects
+            .order_by()
+            .values_list('collection_id')
+            .annotate(count=models.Count('id')))
+        drifted = []
+        for collection in self.only('id', 'products_count').iterator():
+            count = counts.get(collection.id, 0)
+            if collection.products_count != count:
+                collection.products_count = count
+                drifted.append(collection)
+        self.bulk_update(drifted, ['products_count'], batch_size=1000)
+        return drifted
+
+
 class Collection(models.Model):
+    objects = CollectionManager()
     title = models.CharField(max_length=255)
     featured_product = models.ForeignKey(
         'Product', on_delete=models.SET_NULL, null=True, related_name='+', blank=True)
+    # maintained by the signal handlers in store.signals.handlers
+    products_count = models.PositiveIntegerField(default=0, editable=False)
 
     def __str__(self) -> str:
         return self.title
@@ -42,6 +64,52 @@ class Product(models.Model):
 
     class Meta:
         ordering = ['title']
+        # the default ordering, the sortable fields and the collection
+        # filter, each with the primary key the keyset pagination adds
+        indexes = [
+            models.Index(fields=['title', 'id'], name='store_product_title_idx'),
+            models.Index(fields=['unit_price', 'id'], name='store_product_price_idx'),
+            models.Index(fields=['last_update', 'id'], name='store_product_updated_idx'),
+            models.Index(fields=['collection', 'title', 'id'],
+                         name='store_product_coll_title_idx'),
+        ]
+
+
+class ProductPriceManager(models.Manager):
+    def upsert(self, rows):
+        """
+        Inserts or replaces (product_id, promotion_id, price,
+        price_with_tax) rows, one statement executed for all of them.
+        """
+        if not rows:
+            return
+        connection = connections[router.db_for_write(self.model)]
+        table = connection.ops.quote_name(self.model._meta.db_table)
+        sql = (
+            f'INSERT INTO {table} (product_id, promotion_id, price, price_with_tax) '
+            f'VALUES (%s, %s, %s, %s) '
+        )
+        if connection.vendor == 'mysql':
+            sql += (
+                'ON DUPLICATE KEY UPDATE promotion_id = VALUES(promotion_id), '
+                'price = VALUES(price), price_with_tax = VALUES(price_with_tax)')
+        else:
+            sql += (
+                'ON CONFLICT (product_id) DO UPDATE SET promotion_id = excluded.promotion_id, '
+                'price = excluded.price, price_with_tax = excluded.price_with_tax')
+        with connection.cursor() as cursor:
+            cursor.executemany(sql, rows)
+
+
+class ProductPrice(models.Model):
+    # the effective price of each product, maintained by store.pricing
+    objects = ProductPriceManager()
+    product = models.OneToOneField(
+        Product, on_delete=models.CASCADE, primary_key=True, related_name='pricing')
+    promotion = models.ForeignKey(
+        Promotion, on_delete=models.SET_NULL, null=True, blank=True, related_name='+')
+    price = models.DecimalField(max_digits=6, decimal_places=2)
+    price_with_tax = models.DecimalField(max_digits=7, decimal_places=2)
 
 
 class Customer(models.Model):
@@ -80,6 +148,8 @@ class Order(models.Model):
     ]
 
     placed_at = models.DateTimeField(auto_now_add=True)
+    # the watermark of the sales rollups, see store.analytics
+    last_update = models.DateTimeField(auto_now=True)
     payment_status = models.CharField(
         max_length=1, choices=PAYMENT_STATUS_CHOICES, default=PAYMENT_STATUS_PENDING)
     customer = models.ForeignKey(Customer, on_delete=models.PROTECT)
@@ -91,6 +161,30 @@ class Order(models.Model):
         permissions = [
             ('cancel_order', 'Can cancel order')
         ]
+        # a customer's orders newest first, and every order for staff
+        indexes = [
+            models.Index(fields=['customer', 'placed_at', 'id'],
+                         name='store_order_customer_idx'),
+            models.Index(fields=['placed_at', 'id'], name='store_order_placed_at_idx'),
+            models.Index(fields=['last_update'], name='store_order_updated_idx'),
+        ]
+
+
+def line_total(quantity='quantity', unit_price='unit_price'):
+    # quantity * unit_price computed by the database, unit_price may be
+    # an expression like effective_price()
+    if isinstance(unit_price, str):
+        unit_price = models.F(unit_price)
+    return models.ExpressionWrapper(
+        models.F(quantity) * unit_price,
+        output_field=models.DecimalField(max_digits=12, decimal_places=2))
+
+
+def effective_price(product='product'):
+    # the price table's price of a related product, its unit price while
+    # it hasn't been priced
+    return Coalesce(
+        models.F(f'{product}__pricing__price'), models.F(f'{product}__unit_price'))
 
 
 class OrderItem(models.Model):
@@ -104,6 +198,60 @@ class OrderItem(models.Model):
     unit_price = models.DecimalField(max_digits=6, decimal_places=2)
 
 
+class Sales(models.Model):
+    # a day of completed orders, rolled up by store.analytics
+    day = models.DateField()
+    orders_count = models.PositiveIntegerField()
+    items_count = models.PositiveIntegerField()
+    revenue = models.DecimalField(max_digits=14, decimal_places=2)
+
+    class Meta:
+        abstract = True
+
+
+class ProductSales(Sales):
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='+')
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['day', 'product'], name='store_productsales_day_uniq'),
+        ]
+        # a product's days, the unique index serves the days' products
+        indexes = [
+            models.Index(fields=['product', 'day'], name='store_productsales_product_idx'),
+        ]
+
+
+class CollectionSales(Sales):
+    collection = models.ForeignKey(Collection, on_delete=models.CASCADE, related_name='+')
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['day', 'collection'], name='store_collectionsales_day_uniq'),
+        ]
+        indexes = [
+            models.Index(fields=['collection', 'day'], name='store_collsales_coll_idx'),
+        ]
+
+
+class MembershipSales(Sales):
+    membership = models.CharField(max_length=1, choices=Customer.MEMBERSHIP_CHOICES)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['day', 'membership'], name='store_membershipsales_day_uniq'),
+        ]
+
+
+class RollupWatermark(models.Model):
+    # the last change a rollup has been brought up to, None before its
+    # first run
+    name = models.CharField(max_length=50, primary_key=True)
+    value = models.DateTimeField(null=True)
+
+
 class Address(models.Model):
     street = models.CharField(max_length=255)
     city = models.CharField(max_length=255)
@@ -115,8 +263,57 @@ class Cart(models.Model):
     id = models.UUIDField(primary_key=True, default=uuid4)
     created_at = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        # expired carts are looked up by age
+        indexes = [
+            models.Index(fields=['created_at'], name='store_cart_created_at_idx'),
+        ]
+
+
+class CartItemManager(models.Manager):
+    def add_items(self, cart_id, quantities):
+        """
+        Adds {product_id: quantity} to a cart in a single statement,
+        increasing the quantity of items already in the cart. Relies on
+        the (cart, product) unique constraint so concurrent adds of the
+        same product never lose an increment. Product ids that don't
+        exist are skipped.
+        """
+        if not quantities:
+            return
+        db = router.db_for_write(self.model)
+        connection = connections[db]
+        meta = self.model._meta
+        cart_id = meta.get_field('cart').target_field.get_db_prep_value(
+            cart_id, connection)
+        table = connection.ops.quote_name(meta.db_table)
+        product_table = connection.ops.quote_name(Product._meta.db_table)
+
+        cases = ' '.join('WHEN %s THEN %s' for _ in quantities)
+        ids = ', '.join('%s' for _ in quantities)
+        params = [cart_id]
+        for product_id, quantity in quantities.items():
+            params += [product_id, quantity]
+        params += list(quantities)
+
+        sql = (
+            f'INSERT INTO {table} (cart_id, product_id, quantity) '
+            f'SELECT %s, id, CASE id {cases} END '
+            f'FROM {product_table} WHERE id IN ({ids}) '
+        )
+        if connection.vendor == 'mysql':
+            sql += 'ON DUPLICATE KEY UPDATE quantity = quantity + VALUES(quantity)'
+        else:
+            sql += (
+                'ON CONFLICT (cart_id, product_id) '
+                f'DO UPDATE SET quantity = {table}.quantity + excluded.quantity')
+
+        with connection.cursor() as cursor:
+            cursor.execute(sql, params)
+
 
 class CartItem(models.Model):
+    objects = CartItemManager()
     cart = models.ForeignKey(
         Cart, on_delete=models.CASCADE, related_name='items')
     product = models.ForeignKey(Product, on_delete=models.CASCADE)
@@ -132,3 +329,23 @@ class Review(models.Model):
     name = models.CharField(max_length=255)
     description = models.TextField()
     date = models.DateField(auto_now_add=True)
+
+
+class ProductSearchTerm(models.Model):
+    # inverted index used by store.search.InvertedIndexBackend:
+    # one row per (term, product) with the summed field weights
+    term = models.CharField(max_length=64)
+    product = models.ForeignKey(
+        Product, on_delete=models.CASCADE, related_name='search_terms')
+    weight = models.PositiveSmallIntegerField()
+
+    class Meta:
+        unique_together = [['term', 'product']]
+
+
+class ProductSearchDocument(models.Model):
+    # flattened search text used by store.search.MySQLFullTextBackend,
+    # a FULLTEXT index is added on MySQL by migration 0016
+    product = models.OneToOneField(
+        Product, on_delete=models.CASCADE, primary_key=True, related_name='search_document')
+    document = models.TextField()
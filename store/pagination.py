@@ -1,4 +1,209 @@
-from rest_framework.pagination import PageNumberPagination
+import base64
+import datetime
+import hashlib
+import json
+from collections import OrderedDict
+from decimal import Decimal
+
+from django.core.cache import cache
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination, PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+from store.asyncorm import acount, alist
+
 
 class CustomPagination(PageNumberPagination):
-    page_size=10
\ No newline at end of file
+    page_size=10
+
+
+class KeysetPagination(BasePagination):
+    """
+    Seeks to the next page with WHERE (ordering, pk) > (last row) instead
+    of OFFSET, so deep pages cost the same as the first one.
+
+    The ordering comes from the filter backends (e.g. OrderingFilter), then
+    the view's `ordering`, then the model's Meta.ordering, and the primary
+    key is always appended as a tie breaker. Ordering fields must be
+    non-null columns or annotations on the model itself.
+
+    Clients still sending `?page=` are served by CustomPagination. The total
+    is only computed for `?count=true` and is cached for a short while.
+    """
+    page_size = 10
+    cursor_query_param = 'cursor'
+    count_query_param = 'count'
+    count_cache_timeout = 60
+    fallback_class = CustomPagination
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.fallback = None
+        if self.fallback_class.page_query_param in request.query_params:
+            self.fallback = self.fallback_class()
+            return self.fallback.paginate_queryset(queryset, request, view)
+
+        page_queryset = self.get_page_queryset(queryset, request, view)
+        if request.query_params.get(self.count_query_param) in ('1', 'true'):
+            self.count = self.get_count(queryset)
+        return self.set_page(list(page_queryset))
+
+    async def apaginate_queryset(self, queryset, request, view=None):
+        # the ?page= fallback is only served by paginate_queryset
+        self.fallback = None
+        page_queryset = self.get_page_queryset(queryset, request, view)
+        if request.query_params.get(self.count_query_param) in ('1', 'true'):
+            self.count = await self.aget_count(queryset)
+        return self.set_page(await alist(page_queryset))
+
+    def get_page_queryset(self, queryset, request, view):
+        # the rows of the requested page plus one telling whether there
+        # is another page, nothing is queried yet
+        self.request = request
+        self.base_url = request.build_absolute_uri()
+        self.ordering = self.get_ordering(request, queryset, view)
+        self.count = None
+
+        self.values, self.reverse = self.decode_cursor(request, queryset)
+        ordering = self.ordering
+        if self.reverse:
+            ordering = [self.invert(field) for field in ordering]
+        queryset = queryset.order_by(*ordering)
+        if self.values is not None:
+            queryset = queryset.filter(self.seek(ordering, self.values))
+        return queryset[:self.page_size + 1]
+
+    def set_page(self, results):
+        has_more = len(results) > self.page_size
+        results = results[:self.page_size]
+        if self.reverse:
+            results.reverse()
+            self.has_next, self.has_previous = self.values is not None, has_more
+        else:
+            self.has_next, self.has_previous = has_more, self.values is not None
+        self.page = results
+        return results
+
+    def get_paginated_response(self, data):
+        if self.fallback:
+            return self.fallback.get_paginated_response(data)
+        response = OrderedDict()
+        if self.count is not None:
+            response['count'] = self.count
+        response['next'] = self.get_next_link()
+        response['previous'] = self.get_previous_link()
+        response['results'] = data
+        return Response(response)
+
+    def get_ordering(self, request, queryset, view):
+        # filter backends (OrderingFilter, ProductSearchFilter) have
+        # already applied their ordering to the queryset
+        ordering = [field for field in queryset.query.order_by if isinstance(field, str)]
+        if not ordering:
+            ordering = getattr(view, 'ordering', None) \
+                or queryset.model._meta.ordering or ['-pk']
+        if isinstance(ordering, str):
+            ordering = [ordering]
+        ordering = list(ordering)
+        if not any(field.lstrip('-') in ('pk', 'id') for field in ordering):
+            descending = ordering[-1].startswith('-')
+            ordering.append('-pk' if descending else 'pk')
+        return ordering
+
+    def get_count_key(self, queryset):
+        return 'keyset-count:' + hashlib.md5(str(queryset.query).encode()).hexdigest()
+
+    def get_count(self, queryset):
+        key = self.get_count_key(queryset)
+        count = cache.get(key)
+        if count is None:
+            count = queryset.count()
+            cache.set(key, count, self.count_cache_timeout)
+        return count
+
+    async def aget_count(self, queryset):
+        key = self.get_count_key(queryset)
+        count = await cache.aget(key)
+        if count is None:
+            count = await acount(queryset)
+            await cache.aset(key, count, self.count_cache_timeout)
+        return count
+
+    @staticmethod
+    def invert(field):
+        return field[1:] if field.startswith('-') else '-' + field
+
+    @staticmethod
+    def seek(ordering, values):
+        # (a, b, c) > (x, y, z) expanded to
+        # a > x OR (a = x AND b > y) OR (a = x AND b = y AND c > z)
+        condition = Q()
+        equal = Q()
+        for field, value in zip(ordering, values):
+            name = field.lstrip('-')
+            lookup = 'lt' if field.startswith('-') else 'gt'
+            condition |= equal & Q(**{f'{name}__{lookup}': value})
+            equal &= Q(**{name: value})
+        return condition
+
+    def position(self, instance):
+        values = []
+        for field in self.ordering:
+            value = getattr(instance, field.lstrip('-'))
+            if isinstance(value, (datetime.date, datetime.time)):
+                value = value.isoformat()
+            elif isinstance(value, Decimal) or not isinstance(value, (int, float, str)):
+                value = str(value)
+            values.append(value)
+        return values
+
+    def encode_cursor(self, values, reverse):
+        payload = json.dumps({'v': values, 'r': reverse}, separators=(',', ':'))
+        cursor = base64.urlsafe_b64encode(payload.encode()).decode()
+        return replace_query_param(self.base_url, self.cursor_query_param, cursor)
+
+    @staticmethod
+    def get_ordering_field(queryset, name):
+        if name in queryset.query.annotations:
+            return queryset.query.annotations[name].output_field
+        opts = queryset.model._meta
+        return opts.pk if name == 'pk' else opts.get_field(name)
+
+    def decode_cursor(self, request, queryset):
+        cursor = request.query_params.get(self.cursor_query_param)
+        if not cursor:
+            return None, False
+        try:
+            payload = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+            values, reverse = payload['v'], bool(payload['r'])
+        except (TypeError, ValueError, KeyError):
+            raise NotFound('Invalid cursor')
+        if not isinstance(values, list) or len(values) != len(self.ordering):
+            raise NotFound('Invalid cursor')
+        # the values come back as the strings position() made of them, and
+        # anything else a client puts there must not reach the database
+        try:
+            values = [
+                self.get_ordering_field(queryset, field.lstrip('-')).to_python(value)
+                for field, value in zip(self.ordering, values)
+            ]
+        except (TypeError, ValidationError):
+            raise NotFound('Invalid cursor')
+        if None in values:
+            raise NotFound('Invalid cursor')
+        return values, reverse
+
+    def get_next_link(self):
+        if not self.has_next or not self.page:
+            return None
+        return self.encode_cursor(self.position(self.page[-1]), False)
+
+    def get_previous_link(self):
+        if not self.has_previous or not self.page:
+            return None
+        return self.encode_cursor(self.position(self.page[0]), True)
+
+    def get_results(self, data):
+        return data['results']
@@ -1,5 +1,62 @@
+from django.conf import settings
+from django.core.cache import cache
 from rest_framework import permissions
 
+from store.authentication import PRINCIPAL_VERSION_PREFIX, get_principal_version
+from store.caching import bump_version, get_version
+
+PERMISSIONS_PREFIX = 'permissions:'
+PERMISSIONS_VERSION_KEY = 'permissions-version'
+
+
+def get_permissions_version():
+    return get_version(cache, PERMISSIONS_VERSION_KEY)
+
+
+def bump_permissions_version():
+    # group permissions changed, every user's set may have
+    bump_version(cache, PERMISSIONS_VERSION_KEY)
+
+
+def get_user_permissions(user):
+    """
+    Returns the set of 'app_label.codename' permissions the user has
+    through every auth backend.
+
+    Sets are cached per user under the user's principal version, bumped
+    when their groups or permissions change, and a global version bumped
+    when a group's permissions change. The set is also kept on the user
+    for the rest of the request.
+    """
+    permissions = getattr(user, '_store_permissions', None)
+    if permissions is not None:
+        return permissions
+
+    keys = [PRINCIPAL_VERSION_PREFIX + str(user.pk), PERMISSIONS_VERSION_KEY,
+            PERMISSIONS_PREFIX + str(user.pk)]
+    cached = cache.get_many(keys)
+    version = [cached.get(keys[0]), cached.get(keys[1])]
+    entry = cached.get(keys[2])
+    if None in version:
+        version = [get_principal_version(user.pk), get_permissions_version()]
+    elif entry is not None and entry['version'] == version:
+        permissions = entry['permissions']
+    if permissions is None:
+        permissions = frozenset(user.get_all_permissions())
+        cache.set(keys[2], {'version': version, 'permissions': permissions},
+                  getattr(settings, 'STORE_PERMISSIONS_CACHE_TIMEOUT', 60))
+    user._store_permissions = permissions
+    return permissions
+
+
+def has_perm(user, perm):
+    """User.has_perm through the cached permission sets."""
+    if not user or not user.is_authenticated or not user.is_active:
+        return False
+    if user.is_superuser:
+        return True
+    return perm in get_user_permissions(user)
+
 
 class IsAdminOrReadOnly(permissions.BasePermission):
     def has_permission(self, request, view):
@@ -7,6 +64,13 @@ class IsAdminOrReadOnly(permissions.BasePermission):
             return True
         return bool(request.user and request.user.is_staff)
 
-class ViewCustomerHistoryPermission(permissions.BasePermission):
+
+class CachedModelPermission(permissions.BasePermission):
+    perm = None
+
     def has_permission(self, request, view):
-        return request.user.has_perm('store.view_history')
\ No newline at end of file
+        return has_perm(request.user, self.perm)
+
+
+class ViewCustomerHistoryPermission(CachedModelPermission):
+    perm = 'store.view_history'
@@ -0,0 +1,106 @@
+from decimal import ROUND_HALF_UP, Decimal
+
+from django.db import transaction
+
+from store.caching import bump_versions
+from store.models import Product, ProductPrice
+
+# built once, Decimal(1.1) is not cheap to construct for every product
+TAX_RATE = Decimal(1.1)
+CENT = Decimal('0.01')
+
+
+def compute_price(unit_price, discount=None):
+    """Returns (price, price with tax) of a unit price less a discount."""
+    price = unit_price
+    if discount:
+        # repr gives the float's shortest decimal, 0.15 rather than
+        # 0.1499999999999999944488848768742172978818416595458984375
+        price = (unit_price * (1 - Decimal(repr(discount)))).quantize(CENT, ROUND_HALF_UP)
+    return price, round(price * TAX_RATE, 2)
+
+
+def best_promotions(links):
+    """
+    Returns {product_id: (promotion_id, discount)} of the biggest valid
+    discount among `links`, a queryset of Product.promotions.through.
+    """
+    best = {}
+    for product_id, promotion_id, discount in links \
+            .filter(promotion__discount__gt=0, promotion__discount__lt=1) \
+            .values_list('product_id', 'promotion_id', 'promotion__discount'):
+        if product_id not in best or discount > best[product_id][1]:
+            best[product_id] = (promotion_id, discount)
+    return best
+
+
+def reprice(products=None, batch_size=5000, on_chunk=None):
+    """
+    Recomputes the ProductPrice rows of `products`, a queryset, the whole
+    catalog by default, and returns how many were priced.
+
+    Products are read in primary key chunks of `batch_size`, each chunk
+    costs three queries whatever its size: the unit prices, the best
+    promotions and an upsert of its rows. `on_chunk` is called with the
+    ids of each chunk once it is written.
+    """
+    queryset = (Product.objects.all() if products is None else products).order_by('pk')
+    Through = Product.promotions.through
+    last_id, priced = 0, 0
+    while True:
+        rows = list(queryset.filter(pk__gt=last_id).values_list('id', 'unit_price')[:batch_size])
+        if not rows:
+            return priced
+        ids = [product_id for product_id, _ in rows]
+        if products is None:
+            # a chunk of the whole catalog is a primary key range, cheaper
+            # to look up than a list of ids
+            links = Through.objects.filter(product_id__gt=last_id, product_id__lte=ids[-1])
+        else:
+            links = Through.objects.filter(product_id__in=ids)
+        best = best_promotions(links)
+        last_id = ids[-1]
+
+        prices = []
+        for product_id, unit_price in rows:
+            promotion_id, discount = best.get(product_id, (None, None))
+            prices.append((product_id, promotion_id, *compute_price(unit_price, discount)))
+        with transaction.atomic():
+            ProductPrice.objects.upsert(prices)
+
+        priced += len(rows)
+        if on_chunk:
+            on_chunk(ids)
+
+
+def invalidate_prices(product_ids):
+    # responses built before the new prices were written
+    bump_versions('product', *[f'product:{pk}' for pk in product_ids])
+
+
+def reprice_on_commit(products):
+    # the signal handlers reprice once the change is committed, right away
+    # outside of a transaction
+    transaction.on_commit(lambda: reprice(products, on_chunk=invalidate_prices))
+
+
+def get_product_price(product):
+    """
+    The ProductPrice of a product, loaded with select_related('pricing')
+    to avoid a query, or an unsaved one at the unit price while the
+    product hasn't been priced yet.
+    """
+    try:
+        return product.pricing
+    except ProductPrice.DoesNotExist:
+        price, price_with_tax = compute_price(product.unit_price)
+        return ProductPrice(product_id=product.pk, price=price, price_with_tax=price_with_tax)
+
+
+def get_prices(products):
+    """Returns {product_id: price} of loaded products with one query."""
+    prices = dict(
+        ProductPrice.objects
+        .filter(product_id__in=[product.pk for product in products])
+        .values_list('product_id', 'price'))
+    return {product.pk: prices.get(product.pk, product.unit_price) for product in products}
@@ -0,0 +1,236 @@
+import bisect
+import contextvars
+import random
+import threading
+import time
+from contextlib import ExitStack
+from functools import wraps
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from rest_framework.renderers import BaseRenderer
+from rest_framework.serializers import BaseSerializer
+
+INF = float('inf')
+
+# (name, help, unit, bucket upper bounds)
+METRICS = [
+    ('request_duration_seconds', 'Wall time of the request.', 'seconds',
+     [0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, INF]),
+    ('db_queries', 'Database queries run by the request.', 'queries',
+     [0, 1, 2, 3, 5, 10, 20, 50, 100, INF]),
+    ('db_duration_seconds', 'Time spent in database queries.', 'seconds',
+     [0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 5, INF]),
+    ('serializer_duration_seconds', 'Time spent building serializer data.', 'seconds',
+     [0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 5, INF]),
+    ('response_bytes', 'Size of the response body.', 'bytes',
+     [256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304, INF]),
+]
+
+
+class Histogram:
+    """Counts observations into fixed buckets, like a Prometheus histogram."""
+
+    def __init__(self, bounds):
+        self.bounds = bounds
+        self.buckets = [0] * len(bounds)
+        self.count = 0
+        self.sum = 0.0
+        self.max = None
+
+    def observe(self, value):
+        self.buckets[bisect.bisect_left(self.bounds, value)] += 1
+        self.count += 1
+        self.sum += value
+        self.max = value if self.max is None else max(self.max, value)
+
+    def quantile(self, q):
+        # upper bound of the bucket the q-th observation falls in, capped
+        # by the largest observation
+        rank = q * self.count
+        seen = 0
+        for bound, count in zip(self.bounds, self.buckets):
+            seen += count
+            if seen >= rank and seen:
+                return min(bound, self.max)
+        return None
+
+    def summary(self):
+        return {
+            'count': self.count,
+            'mean': self.sum / self.count if self.count else None,
+            'p50': self.quantile(0.5),
+            'p95': self.quantile(0.95),
+            'p99': self.quantile(0.99),
+            'max': self.max,
+        }
+
+
+class Registry:
+    """In-process histograms per endpoint and metric."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.histograms = {}
+
+    def observe(self, endpoint, values):
+        with self.lock:
+            for name, _, _, bounds in METRICS:
+                if values.get(name) is None:
+                    continue
+                histogram = self.histograms.get((endpoint, name))
+                if histogram is None:
+                    histogram = self.histograms[(endpoint, name)] = Histogram(bounds)
+                histogram.observe(values[name])
+
+    def reset(self):
+        with self.lock:
+            self.histograms = {}
+
+    def summary(self):
+        with self.lock:
+            endpoints = {}
+            for (endpoint, name), histogram in sorted(self.histograms.items()):
+                endpoints.setdefault(endpoint, {})[name] = histogram.summary()
+            return endpoints
+
+    def prometheus(self):
+        lines = []
+        with self.lock:
+            for name, help, _, _ in METRICS:
+                histograms = sorted(
+                    (endpoint, histogram)
+                    for (endpoint, metric), histogram in self.histograms.items()
+                    if metric == name)
+                if not histograms:
+                    continue
+                metric = f'store_{name}'
+                lines.append(f'# HELP {metric} {help}')
+                lines.append(f'# TYPE {metric} histogram')
+                for endpoint, histogram in histograms:
+                    cumulative = 0
+                    for bound, count in zip(histogram.bounds, histogram.buckets):
+                        cumulative += count
+                        le = '+Inf' if bound == INF else repr(bound)
+                        lines.append(f'{metric}_bucket{{endpoint="{endpoint}",le="{le}"}} {cumulative}')
+                    lines.append(f'{metric}_sum{{endpoint="{endpoint}"}} {histogram.sum!r}')
+                    lines.append(f'{metric}_count{{endpoint="{endpoint}"}} {histogram.count}')
+        return '\n'.join(lines) + '\n'
+
+
+registry = Registry()
+
+# the Sample of the request being profiled by this thread or task
+current_sample = contextvars.ContextVar('current_sample', default=None)
+
+
+class Sample:
+    def __init__(self):
+        self.endpoint = None
+        self.queries = 0
+        self.db_time = 0.0
+        self.serializer_time = 0.0
+        self.in_serializer = False
+
+    def __call__(self, execute, sql, params, many, context):
+        # connection.execute_wrapper hook
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.queries += 1
+            self.db_time += time.perf_counter() - start
+
+
+def endpoint_name(view_func, method):
+    # views are named after their class, viewsets after their action too,
+    # e.g. ProductViewSet.list
+    cls = getattr(view_func, 'cls', None) or getattr(view_func, 'view_class', None)
+    if cls is None:
+        return f'{view_func.__module__}.{view_func.__name__}'
+    action = (getattr(view_func, 'actions', None) or {}).get(method.lower())
+    return f'{cls.__name__}.{action}' if action else cls.__name__
+
+
+def timed_data(data):
+    @wraps(data.fget)
+    def wrapper(serializer):
+        sample = current_sample.get()
+        # only the outermost .data is timed, nested serializers don't use it
+        if sample is None or sample.in_serializer:
+            return data.fget(serializer)
+        sample.in_serializer = True
+        start = time.perf_counter()
+        try:
+            return data.fget(serializer)
+        finally:
+            sample.in_serializer = False
+            sample.serializer_time += time.perf_counter() - start
+    return property(wrapper)
+
+
+class ProfilingMiddleware:
+    """
+    Records wall time, query count and time, serializer time and response
+    size of a sample of the requests into `registry`, per view and
+    action. STORE_PROFILING turns it on, STORE_PROFILING_SAMPLE_RATE
+    (0 to 1) is the share of requests recorded.
+
+    When disabled Django drops the middleware at startup, so it costs
+    nothing. When enabled, serializer `.data` is timed by wrapping
+    BaseSerializer.data once per process.
+    """
+    serializer_patched = False
+
+    def __init__(self, get_response):
+        if not getattr(settings, 'STORE_PROFILING', False):
+            raise MiddlewareNotUsed()
+        self.get_response = get_response
+        self.sample_rate = getattr(settings, 'STORE_PROFILING_SAMPLE_RATE', 0.1)
+        if not ProfilingMiddleware.serializer_patched:
+            BaseSerializer.data = timed_data(BaseSerializer.data)
+            ProfilingMiddleware.serializer_patched = True
+
+    def __call__(self, request):
+        if random.random() >= self.sample_rate:
+            return self.get_response(request)
+
+        sample = Sample()
+        token = current_sample.set(sample)
+        start = time.perf_counter()
+        try:
+            with ExitStack() as stack:
+                for connection in connections.all():
+                    stack.enter_context(connection.execute_wrapper(sample))
+                response = self.get_response(request)
+        finally:
+            current_sample.reset(token)
+        wall_time = time.perf_counter() - start
+
+        if sample.endpoint is not None:
+            registry.observe(sample.endpoint, {
+                'request_duration_seconds': wall_time,
+                'db_queries': sample.queries,
+                'db_duration_seconds': sample.db_time,
+                'serializer_duration_seconds': sample.serializer_time,
+                # streamed bodies are produced after the middleware returns
+                'response_bytes': None if response.streaming else len(response.content),
+            })
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        sample = current_sample.get()
+        if sample is None:
+            return None
+        sample.endpoint = endpoint_name(view_func, request.method)
+        return None
+
+
+class PrometheusRenderer(BaseRenderer):
+    media_type = 'text/plain'
+    format = 'prometheus'
+    charset = 'utf-8'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        return registry.prometheus().encode(self.charset)
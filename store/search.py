@@ -0,0 +1,188 @@
+import re
+from collections import Counter
+from functools import lru_cache
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import Case, IntegerField, Max, OuterRef, Q, Subquery, Sum, When
+from django.db.models.expressions import RawSQL
+from django.utils.module_loading import import_string
+
+from store.models import Product, ProductSearchDocument, ProductSearchTerm
+
+TOKEN_RE = re.compile(r'\w+', re.UNICODE)
+MAX_TERM_LENGTH = 64
+MAX_QUERY_TERMS = 8
+
+# how much a hit in each field counts towards the relevance rank
+FIELD_WEIGHTS = {
+    'title': 3,
+    'collection': 2,
+    'description': 1,
+}
+
+
+def tokenize(text):
+    if not text:
+        return []
+    return [token[:MAX_TERM_LENGTH] for token in TOKEN_RE.findall(text.lower())]
+
+
+def product_fields(product):
+    return {
+        'title': product.title,
+        'collection': product.collection.title,
+        'description': product.description,
+    }
+
+
+class BaseSearchBackend:
+    """
+    A search backend keeps its own index of products up to date and
+    narrows a product queryset down to the products matching a query.
+
+    Matching products are annotated with `search_rank`, higher is better.
+    """
+    batch_size = 1000
+    product_model = Product
+
+    def index(self, products):
+        raise NotImplementedError
+
+    def remove(self, product_ids):
+        raise NotImplementedError
+
+    def search(self, queryset, query):
+        raise NotImplementedError
+
+    def clear(self):
+        raise NotImplementedError
+
+    def index_queryset(self, queryset):
+        queryset = queryset.select_related('collection').order_by('pk')
+        batch = []
+        for product in queryset.iterator(chunk_size=self.batch_size):
+            batch.append(product)
+            if len(batch) == self.batch_size:
+                self.index(batch)
+                batch = []
+        if batch:
+            self.index(batch)
+
+    def rebuild(self):
+        self.clear()
+        self.index_queryset(self.product_model.objects.all())
+
+
+class InvertedIndexBackend(BaseSearchBackend):
+    """
+    Portable backend that stores one ProductSearchTerm row per
+    (term, product). Every query term must match, the last one as a
+    prefix so results show up while the user is still typing.
+    """
+    term_model = ProductSearchTerm
+
+    def index(self, products):
+        terms = []
+        for product in products:
+            weights = Counter()
+            for field, text in product_fields(product).items():
+                for token in tokenize(text):
+                    weights[token] += FIELD_WEIGHTS[field]
+            terms += [
+                self.term_model(
+                    term=term, product_id=product.id, weight=min(weight, 32767))
+                for term, weight in weights.items()
+            ]
+        with transaction.atomic():
+            self.remove([product.id for product in products])
+            self.term_model.objects.bulk_create(
+                terms, batch_size=self.batch_size)
+
+    def remove(self, product_ids):
+        self.term_model.objects.filter(product_id__in=product_ids).delete()
+
+    def clear(self):
+        self.term_model.objects.all().delete()
+
+    def search(self, queryset, query):
+        tokens = tokenize(query)[:MAX_QUERY_TERMS]
+        if not tokens:
+            return queryset
+
+        lookups = [Q(term=token) for token in tokens[:-1]]
+        # a range instead of startswith so the (term, product) index is used
+        # on every backend, LIKE 'x%' can't use it on SQLite
+        lookups.append(Q(term__gte=tokens[-1], term__lt=tokens[-1] + '\U0010ffff'))
+
+        # one flag per query term so we only keep products matching all of them
+        flags = {
+            f'match_{i}': Max(Case(When(lookup, then=1), default=0, output_field=IntegerField()))
+            for i, lookup in enumerate(lookups)
+        }
+        matches = self.term_model.objects \
+            .filter(Q(*lookups, _connector=Q.OR)) \
+            .values('product_id') \
+            .annotate(rank=Sum('weight'), **flags) \
+            .filter(**{name: 1 for name in flags})
+
+        return queryset \
+            .filter(pk__in=matches.values('product_id')) \
+            .annotate(search_rank=Subquery(
+                matches.filter(product_id=OuterRef('pk')).values('rank')[:1]))
+
+
+class MySQLFullTextBackend(BaseSearchBackend):
+    """
+    Backend for MySQL that keeps a flattened ProductSearchDocument per
+    product and queries it with MATCH ... AGAINST in boolean mode.
+    """
+    document_model = ProductSearchDocument
+
+    def index(self, products):
+        documents = []
+        for product in products:
+            words = []
+            for field, text in product_fields(product).items():
+                # repeat fields to give them more weight in the FULLTEXT ranking
+                words += tokenize(text) * FIELD_WEIGHTS[field]
+            documents.append(self.document_model(
+                product_id=product.id, document=' '.join(words)))
+        with transaction.atomic():
+            self.remove([product.id for product in products])
+            self.document_model.objects.bulk_create(
+                documents, batch_size=self.batch_size)
+
+    def remove(self, product_ids):
+        self.document_model.objects.filter(
+            product_id__in=product_ids).delete()
+
+    def clear(self):
+        self.document_model.objects.all().delete()
+
+    def search(self, queryset, query):
+        tokens = tokenize(query)[:MAX_QUERY_TERMS]
+        if not tokens:
+            return queryset
+
+        expression = ' '.join(f'+{token}' for token in tokens[:-1])
+        expression += f' +{tokens[-1]}*'
+        matches = self.document_model.objects \
+            .annotate(rank=RawSQL(
+                'MATCH (document) AGAINST (%s IN BOOLEAN MODE)', (expression.strip(),))) \
+            .filter(rank__gt=0)
+
+        return queryset \
+            .filter(pk__in=matches.values('product_id')) \
+            .annotate(search_rank=Subquery(
+                matches.filter(product_id=OuterRef('pk')).values('rank')[:1]))
+
+
+@lru_cache(maxsize=None)
+def get_search_backend():
+    path = getattr(settings, 'STORE_SEARCH_BACKEND', None)
+    if path:
+        return import_string(path)()
+    if connection.vendor == 'mysql':
+        return MySQLFullTextBackend()
+    return InvertedIndexBackend()
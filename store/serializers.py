@@ -1,14 +1,21 @@
-from decimal import Decimal
+from datetime import timedelta
+
 from django.db import transaction
+from django.db.models import Case, F, IntegerField, Value, When
+from django.utils import timezone
 from rest_framework import serializers
+from .carts import CartNotFound, ProductNotFound, get_cart_store
 from .models import Cart, CartItem, Collection, Customer, Order, OrderItem, Product, Review
+from .pricing import get_prices, get_product_price
 
 
 class ProductSerializer(serializers.ModelSerializer):
     class Meta:
-        fields = ['id', 'title', 'unit_price',
+        fields = ['id', 'title', 'unit_price', 'price',
                   'description', 'price_with_tax', 'collection']
         model = Product
+    # effective prices, read from the price table, see store.pricing
+    price = serializers.SerializerMethodField()
     price_with_tax = serializers.SerializerMethodField(
         method_name='calc_tax_price')
     # collection=serializers.HyperlinkedRelatedField(
@@ -16,15 +23,28 @@ class ProductSerializer(serializers.ModelSerializer):
     #     view_name='collections-detail'
     # )
 
+    def get_price(self, product):
+        return get_product_price(product).price
+
     def calc_tax_price(self, product):
-        return round(product.unit_price*Decimal(1.1), 2)
+        return get_product_price(product).price_with_tax
+
+
+class ProductListSerializer(ProductSerializer):
+    # read from attributes set by prefetch_tags and prefetch_like_counts,
+    # see ProductViewSet.prefetch_objects
+    tags = serializers.SlugRelatedField(slug_field='label', many=True, read_only=True)
+    likes_count = serializers.IntegerField(read_only=True)
+
+    class Meta(ProductSerializer.Meta):
+        fields = ProductSerializer.Meta.fields + ['tags', 'likes_count']
 
 
 class CollectionSerializer(serializers.ModelSerializer):
     class Meta:
         fields = ['id', 'title', 'products_count']
         model = Collection
-    products_count = serializers.IntegerField()
+    products_count = serializers.IntegerField(read_only=True)
 
 
 class ReviewSerializer(serializers.ModelSerializer):
@@ -39,9 +59,14 @@ class ReviewSerializer(serializers.ModelSerializer):
 
 
 class SimpleProductSerializer(serializers.ModelSerializer):
+    price = serializers.SerializerMethodField()
+
     class Meta:
         model = Product
-        fields = ['id', 'title', 'unit_price']
+        fields = ['id', 'title', 'unit_price', 'price']
+
+    def get_price(self, product):
+        return get_product_price(product).price
 
 
 class CartItemSerializer(serializers.ModelSerializer):
@@ -53,7 +78,11 @@ class CartItemSerializer(serializers.ModelSerializer):
         fields = ['id', 'product', 'quantity', 'total_price']
 
     def get_total_price(self, item):
-        return item.quantity*item.product.unit_price
+        # annotated by the cart store when it can compute it in SQL
+        total_price = getattr(item, 'total_price', None)
+        if total_price is None:
+            return item.quantity*get_product_price(item.product).price
+        return total_price
 
 
 class CartSerializer(serializers.ModelSerializer):
@@ -62,45 +91,55 @@ class CartSerializer(serializers.ModelSerializer):
     total_price = serializers.SerializerMethodField()
 
     def get_total_price(self, cart):
-        return sum(c.quantity*c.product.unit_price for c in cart.items.all())
+        # summed by the cart store when it can do it in SQL, empty carts
+        # and key-value carts are summed here
+        if cart.total_price is None:
+            return sum(c.quantity*get_product_price(c.product).price for c in cart.items)
+        return cart.total_price
 
     class Meta:
         model = Cart
         fields = ['id', 'items', 'total_price']
 
 
+class AddCartItemListSerializer(serializers.ListSerializer):
+    def save(self, **kwargs):
+        quantities = {}
+        for item in self.validated_data:
+            quantities[item['product_id']] = \
+                quantities.get(item['product_id'], 0) + item['quantity']
+        self.instance = add_cart_items(self.context['cart_id'], quantities)
+        return self.instance
+
+
 class AddCartItemSerializer(serializers.ModelSerializer):
     class Meta:
         model = CartItem
         fields = ['id', 'product_id', 'quantity']
+        list_serializer_class = AddCartItemListSerializer
 
     product_id = serializers.IntegerField()
 
-    def validate_product_id(self, value):
-        # if not Product.objects.filter(product_id=self.request['product_id']).exists():
-        if not Product.objects.filter(id=value).exists():
-            raise serializers.ValidationError('No product found for given id.')
-        return value
-
     def save(self, **kwargs):
         # from request
         product_id = self.validated_data['product_id']
         quantity = self.validated_data['quantity']
         # from URL
         cart_id = self.context['cart_id']
-        try:
-            # if product in cart exists then increase quantity
-            cart_item = CartItem.objects.get(
-                cart_id=cart_id, product_id=product_id)
-            cart_item.quantity += quantity
-            self.instance = cart_item.save()
-        except CartItem.DoesNotExist:
-            # else create new cart item
-            self.instance = CartItem.objects.create(
-                cart_id=cart_id, **self.validated_data)
+        self.instance = add_cart_items(cart_id, {product_id: quantity})[0]
         return self.instance
 
 
+def add_cart_items(cart_id, quantities):
+    try:
+        return get_cart_store().add_items(cart_id, quantities)
+    except CartNotFound:
+        raise serializers.ValidationError({'cart_id': 'No cart found.'})
+    except ProductNotFound as error:
+        raise serializers.ValidationError(
+            {'product_id': f'No product found for ids {error.product_ids}.'})
+
+
 class UpdateCartItemSerializer(serializers.ModelSerializer):
     class Meta:
         model = CartItem
@@ -117,50 +156,98 @@ class CustomerSerializer(serializers.ModelSerializer):
 
 class OrderItemSerializer(serializers.ModelSerializer):
     product = SimpleProductSerializer()
+    # annotated on the queryset, see OrderViewSet.get_queryset
+    total_price = serializers.DecimalField(
+        max_digits=12, decimal_places=2, read_only=True)
 
     class Meta:
         model = OrderItem
-        fields = ['id', 'product', 'unit_price', 'quantity']
+        fields = ['id', 'product', 'unit_price', 'quantity', 'total_price']
 
 
 class OrderSerializer(serializers.ModelSerializer):
     items = OrderItemSerializer(many=True)
+    # annotated on the queryset, see OrderViewSet.get_queryset
+    total_price = serializers.DecimalField(
+        max_digits=12, decimal_places=2, read_only=True)
 
     class Meta:
         model = Order
-        fields = ['id', 'customer', 'items', 'payment_status', 'placed_at']
+        fields = ['id', 'customer', 'items', 'total_price', 'payment_status', 'placed_at']
+
+
+class OrderTotalsSerializer(serializers.Serializer):
+    orders_count = serializers.IntegerField()
+    items_count = serializers.IntegerField()
+    total_price = serializers.DecimalField(max_digits=14, decimal_places=2)
 
 
 class CreateOrderSerializer(serializers.Serializer):
     cart_id = serializers.UUIDField()
 
     def validate_cart_id(self, cart_id):
-        if not Cart.objects.filter(pk=cart_id).exists():
-            raise serializers.ValidationError('No cart found.')
-        if CartItem.objects.filter(cart_id=cart_id).count() == 0:
+        store = get_cart_store()
+        if not store.get_quantities(cart_id):
+            if store.get(cart_id) is None:
+                raise serializers.ValidationError('No cart found.')
             raise serializers.ValidationError('Cart is empty.')
+        return cart_id
 
     def save(self, **kwargs):
         cart_id = self.validated_data['cart_id']
-        customer = Customer.objects\
-            .get(user_id=self.context['user_id'])
-        # to create an order we only require customer
-        order = Order.objects.create(customer=customer)
-        cart_items = CartItem.objects.filter(cart_id=cart_id)
-        # print('cart items: ', cart_items)
-        # ṭo create order items we need order object of the customer and
-        # the cart from which items need to be transferred from cart to order table
-        order_items = [
-            OrderItem(
-                order=order,
-                product=item.product,
-                quantity=item.quantity,
-                unit_price=item.product.unit_price
-            ) for item in cart_items
-        ]
-        # print('order items: ', order_items)
-        OrderItem.objects.bulk_create(order_items)
-        # Cart.objects.filter(pk=cart_id).delete()
+        store = get_cart_store()
+        quantities = {}
+        try:
+            # the whole checkout is one transaction running a fixed number of
+            # queries whatever the number of items in the cart
+            with transaction.atomic():
+                # the cart only turns into rows of the database here, once
+                quantities = store.claim(cart_id)
+                if not quantities:
+                    raise serializers.ValidationError(
+                        {'cart_id': 'No cart found.'})
+                # lock the products in primary key order so concurrent checkouts
+                # of overlapping carts wait on each other instead of deadlocking
+                products = Product.objects\
+                    .select_for_update()\
+                    .filter(pk__in=quantities)\
+                    .order_by('pk')\
+                    .only('id', 'unit_price', 'inventory')
+                products = list(products)
+                if not products:
+                    raise serializers.ValidationError(
+                        {'cart_id': 'Cart is empty.'})
+                out_of_stock = [
+                    product.id for product in products
+                    if product.inventory < quantities[product.id]]
+                if out_of_stock:
+                    raise serializers.ValidationError(
+                        {'cart_id': f'Not enough inventory for products {out_of_stock}.'})
+
+                # items are charged the effective price, promotions applied
+                prices = get_prices(products)
+                # to create an order we only require customer
+                order = Order.objects.create(customer_id=self.context['customer_id'])
+                OrderItem.objects.bulk_create([
+                    OrderItem(
+                        order=order,
+                        product_id=product.id,
+                        quantity=quantities[product.id],
+                        unit_price=prices[product.id]
+                    ) for product in products
+                ])
+                Product.objects\
+                    .filter(pk__in=quantities)\
+                    .update(inventory=F('inventory') - Case(
+                        *[When(pk=product_id, then=Value(quantity))
+                          for product_id, quantity in quantities.items()],
+                        output_field=IntegerField()))
+                if store.transactional:
+                    store.delete(cart_id)
+        except Exception:
+            if quantities and not store.transactional:
+                store.release(cart_id, quantities)
+            raise
         return order
 
 
@@ -168,3 +255,48 @@ class UpdateOrderSerializer(serializers.ModelSerializer):
     class Meta:
         model = Order
         fields = ['payment_status']
+
+
+class SalesQuerySerializer(serializers.Serializer):
+    # the days a sales dashboard covers, the last 30 by default
+    start = serializers.DateField(required=False)
+    end = serializers.DateField(required=False)
+    limit = serializers.IntegerField(min_value=1, max_value=1000, default=100)
+    ordering = serializers.ChoiceField(
+        choices=['revenue', '-revenue', 'items_count', '-items_count',
+                 'orders_count', '-orders_count'],
+        default='-revenue')
+    product_id = serializers.IntegerField(required=False)
+    collection_id = serializers.IntegerField(required=False)
+    membership = serializers.ChoiceField(choices=Customer.MEMBERSHIP_CHOICES, required=False)
+
+    def validate(self, data):
+        data['end'] = data.get('end') or timezone.localdate()
+        data['start'] = data.get('start') or data['end'] - timedelta(days=29)
+        if data['start'] > data['end']:
+            raise serializers.ValidationError({'start': 'Must not be after end.'})
+        return data
+
+
+class SalesSerializer(serializers.Serializer):
+    orders_count = serializers.IntegerField()
+    items_count = serializers.IntegerField()
+    revenue = serializers.DecimalField(max_digits=14, decimal_places=2)
+
+
+class DailySalesSerializer(SalesSerializer):
+    day = serializers.DateField()
+
+
+class ProductSalesSerializer(SalesSerializer):
+    product_id = serializers.IntegerField()
+    title = serializers.CharField()
+
+
+class CollectionSalesSerializer(SalesSerializer):
+    collection_id = serializers.IntegerField()
+    title = serializers.CharField()
+
+
+class MembershipSalesSerializer(SalesSerializer):
+    membership = serializers.CharField()
@@ -1,10 +1,270 @@
 from django.conf import settings
-from django.db.models.signals import post_save
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import Group, Permission
+from django.contrib.contenttypes.models import ContentType
+from django.db.models import F
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_delete, pre_save
 from django.dispatch import receiver
-from store.models import Customer
+from django.utils import timezone
+from store.analytics import rollup_days_on_commit, touch_orders
+from store.authentication import bump_principal_version
+from store.caching import bump_versions
+from store.permissions import bump_permissions_version
+from store.models import Collection, Customer, Order, OrderItem, Product, Promotion, Review
+from store.pricing import reprice_on_commit
+from store.search import get_search_backend
+from likes.counters import like_counts_flushed
+from tags.models import Tag, TaggedItem
+
+
+User = get_user_model()
 
 
 @receiver(post_save, sender=settings.AUTH_USER_MODEL)
 def create_customer_for_new_user(sender, **kwargs):
     if kwargs['created']:
         Customer.objects.create(user=kwargs['instance'])
+
+
+@receiver(pre_save, sender=Product)
+def remember_product_collection(sender, **kwargs):
+    # and the unit price, to reprice the product only when it changes
+    instance = kwargs['instance']
+    if instance.pk is None or kwargs['raw']:
+        instance._old_collection_id = instance._old_unit_price = None
+        return
+    update_fields = kwargs['update_fields']
+    if update_fields is not None \
+            and not {'collection', 'collection_id', 'unit_price'} & set(update_fields):
+        # neither can change, no need to read them
+        instance._old_collection_id, instance._old_unit_price = \
+            instance.collection_id, instance.unit_price
+        return
+    instance._old_collection_id, instance._old_unit_price = Product.objects \
+        .filter(pk=instance.pk) \
+        .values_list('collection_id', 'unit_price') \
+        .first() or (None, None)
+
+
+@receiver(post_save, sender=Product)
+def count_saved_product(sender, **kwargs):
+    instance = kwargs['instance']
+    old_collection_id = getattr(instance, '_old_collection_id', None)
+    if old_collection_id == instance.collection_id:
+        return
+    # concurrent moves of a product can read the same old collection, the
+    # drift is repaired by Collection.objects.reconcile_products_count()
+    if old_collection_id is not None:
+        Collection.objects.filter(pk=old_collection_id) \
+            .update(products_count=F('products_count') - 1)
+    Collection.objects.filter(pk=instance.collection_id) \
+        .update(products_count=F('products_count') + 1)
+
+
+@receiver(post_delete, sender=Product)
+def count_deleted_product(sender, **kwargs):
+    Collection.objects.filter(pk=kwargs['instance'].collection_id) \
+        .update(products_count=F('products_count') - 1)
+
+
+@receiver(post_save, sender=Product)
+def touch_moved_product_orders(sender, **kwargs):
+    # the product's sales move to its new collection in the rollups
+    instance = kwargs['instance']
+    old_collection_id = getattr(instance, '_old_collection_id', None)
+    if old_collection_id is not None and old_collection_id != instance.collection_id:
+        touch_orders(Order.objects.filter(
+            payment_status=Order.PAYMENT_STATUS_COMPLETE,
+            pk__in=OrderItem.objects.filter(product=instance).values('order_id')))
+
+
+@receiver(post_save, sender=Product)
+def index_product(sender, **kwargs):
+    get_search_backend().index([kwargs['instance']])
+
+
+@receiver(post_save, sender=Collection)
+def index_collection_products(sender, **kwargs):
+    update_fields = kwargs['update_fields']
+    if kwargs['created'] or (update_fields and 'title' not in update_fields):
+        return
+    get_search_backend().index_queryset(
+        Product.objects.filter(collection=kwargs['instance']))
+
+
+@receiver([post_save, post_delete], sender=Product)
+def invalidate_product_responses(sender, **kwargs):
+    bump_versions('product', f'product:{kwargs["instance"].pk}')
+
+
+@receiver([post_save, post_delete], sender=Collection)
+def invalidate_collection_responses(sender, **kwargs):
+    bump_versions('collection')
+
+
+@receiver([post_save, post_delete], sender=Promotion)
+def invalidate_promotion_responses(sender, **kwargs):
+    bump_versions('product')
+
+
+@receiver(m2m_changed, sender=Product.promotions.through)
+def invalidate_product_promotion_responses(sender, **kwargs):
+    if not kwargs['action'].startswith('post_'):
+        return
+    if kwargs['reverse']:
+        product_ids = kwargs['pk_set'] or []
+    else:
+        product_ids = [kwargs['instance'].pk]
+    bump_versions('product', *[f'product:{pk}' for pk in product_ids])
+
+
+@receiver(post_save, sender=Product)
+def reprice_saved_product(sender, **kwargs):
+    instance = kwargs['instance']
+    if kwargs['raw'] or getattr(instance, '_old_unit_price', None) == instance.unit_price:
+        return
+    reprice_on_commit(Product.objects.filter(pk=instance.pk))
+
+
+@receiver(post_save, sender=Promotion)
+def reprice_promotion_products(sender, **kwargs):
+    if not kwargs['created'] and not kwargs['raw']:
+        reprice_on_commit(Product.objects.filter(promotions=kwargs['instance']))
+
+
+@receiver(pre_delete, sender=Promotion)
+def reprice_deleted_promotion_products(sender, **kwargs):
+    # the links are gone after the delete, remember the products
+    product_ids = list(Product.objects
+                       .filter(promotions=kwargs['instance'])
+                       .values_list('id', flat=True))
+    if product_ids:
+        reprice_on_commit(Product.objects.filter(pk__in=product_ids))
+
+
+@receiver(m2m_changed, sender=Product.promotions.through)
+def reprice_product_promotions(sender, **kwargs):
+    action, instance = kwargs['action'], kwargs['instance']
+    if kwargs['reverse'] and action == 'pre_clear':
+        # promotion.product_set.clear()
+        product_ids = list(instance.product_set.values_list('id', flat=True))
+    elif kwargs['reverse'] and action in ('post_add', 'post_remove'):
+        product_ids = list(kwargs['pk_set'])
+    elif not kwargs['reverse'] and action in ('post_add', 'post_remove', 'post_clear'):
+        product_ids = [instance.pk]
+    else:
+        return
+    reprice_on_commit(Product.objects.filter(pk__in=product_ids))
+
+
+@receiver([post_save, post_delete], sender=OrderItem)
+def touch_item_order(sender, **kwargs):
+    touch_orders(Order.objects.filter(pk=kwargs['instance'].order_id))
+
+
+@receiver(pre_delete, sender=Order)
+def rollup_deleted_order(sender, **kwargs):
+    # a deleted order can't be found by its last_update, its day is
+    # recomputed without it
+    order = kwargs['instance']
+    if order.payment_status == Order.PAYMENT_STATUS_COMPLETE:
+        rollup_days_on_commit([timezone.localdate(order.placed_at)])
+
+
+@receiver(pre_save, sender=Customer)
+def remember_customer_membership(sender, **kwargs):
+    instance = kwargs['instance']
+    instance._old_membership = None if instance.pk is None or kwargs['raw'] else \
+        Customer.objects.filter(pk=instance.pk).values_list('membership', flat=True).first()
+
+
+@receiver(post_save, sender=Customer)
+def touch_customer_orders(sender, **kwargs):
+    # the customer's sales move to their new tier in the rollups
+    instance = kwargs['instance']
+    old_membership = getattr(instance, '_old_membership', None)
+    if old_membership is not None and old_membership != instance.membership:
+        touch_orders(Order.objects.filter(
+            customer=instance, payment_status=Order.PAYMENT_STATUS_COMPLETE))
+
+
+@receiver([post_save, post_delete], sender=Review)
+def invalidate_review_responses(sender, **kwargs):
+    bump_versions(f'reviews:{kwargs["instance"].product_id}')
+
+
+@receiver([post_save, post_delete], sender=TaggedItem)
+def invalidate_product_tag_responses(sender, **kwargs):
+    # product responses embed their tags
+    instance = kwargs['instance']
+    if instance.content_type_id == ContentType.objects.get_for_model(Product).id:
+        bump_versions('product', f'product:{instance.object_id}')
+
+
+@receiver(like_counts_flushed)
+def invalidate_product_like_responses(sender, **kwargs):
+    # and their like counts, which change when the counters are flushed
+    content_type_id = ContentType.objects.get_for_model(Product).id
+    product_ids = [
+        object_id for type_id, object_id in kwargs['changes']
+        if type_id == content_type_id
+    ]
+    if product_ids:
+        bump_versions('product', *[f'product:{pk}' for pk in product_ids])
+
+
+@receiver(post_save, sender=Tag)
+def invalidate_tag_responses(sender, **kwargs):
+    # a renamed tag changes every product tagged with it, a deleted tag
+    # deletes its tagged items first and they bump their products
+    if kwargs['created']:
+        return
+    product_ids = TaggedItem.objects \
+        .filter(tag=kwargs['instance'], content_type=ContentType.objects.get_for_model(Product)) \
+        .values_list('object_id', flat=True)
+    bump_versions('product', *[f'product:{pk}' for pk in product_ids])
+
+
+@receiver([post_save, post_delete], sender=settings.AUTH_USER_MODEL)
+def invalidate_user_principal(sender, **kwargs):
+    bump_principal_version(kwargs['instance'].pk)
+
+
+@receiver([post_save, post_delete], sender=Customer)
+def invalidate_customer_principal(sender, **kwargs):
+    # the principal only holds the customer's id
+    if kwargs.get('created', True):
+        bump_principal_version(kwargs['instance'].user_id)
+
+
+@receiver(m2m_changed, sender=User.groups.through)
+@receiver(m2m_changed, sender=User.user_permissions.through)
+def invalidate_permission_principals(sender, **kwargs):
+    action, instance = kwargs['action'], kwargs['instance']
+    if not kwargs['reverse']:
+        if action.startswith('post_'):
+            bump_principal_version(instance.pk)
+        return
+    # group.user_set or permission.user_set changed
+    if action == 'pre_clear':
+        user_ids = sender.objects \
+            .filter(**{instance._meta.model_name: instance}) \
+            .values_list('user_id', flat=True)
+    elif action in ('post_add', 'post_remove'):
+        user_ids = kwargs['pk_set'] or []
+    else:
+        return
+    for user_id in user_ids:
+        bump_principal_version(user_id)
+
+
+@receiver(m2m_changed, sender=Group.permissions.through)
+def invalidate_group_permissions(sender, **kwargs):
+    if kwargs['action'].startswith('post_'):
+        bump_permissions_version()
+
+
+@receiver(post_delete, sender=Group)
+@receiver(post_delete, sender=Permission)
+def invalidate_deleted_permissions(sender, **kwargs):
+    bump_permissions_version()
@@ -0,0 +1,90 @@
+import json
+
+from django.db.models import prefetch_related_objects
+from django.http import StreamingHttpResponse
+from rest_framework.renderers import BaseRenderer
+from rest_framework.settings import api_settings
+from rest_framework.utils import encoders
+
+from store.pagination import KeysetPagination
+
+
+def dumps(data):
+    return json.dumps(data, cls=encoders.JSONEncoder, ensure_ascii=False)
+
+
+class NDJSONRenderer(BaseRenderer):
+    media_type = 'application/x-ndjson'
+    format = 'ndjson'
+    charset = 'utf-8'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        rows = data if isinstance(data, list) else [data]
+        return ''.join(dumps(row) + '\n' for row in rows).encode(self.charset)
+
+
+class StreamingListMixin:
+    """
+    Streams the whole list, unpaginated, when the client asks for
+    `?stream=true` (a JSON array) or accepts application/x-ndjson (one
+    JSON object per line).
+
+    Rows are read in keyset chunks of `stream_chunk_size` with the
+    queryset's prefetch lookups applied per chunk, and serialized one at
+    a time, so memory use doesn't grow with the number of rows.
+    """
+    renderer_classes = [*api_settings.DEFAULT_RENDERER_CLASSES, NDJSONRenderer]
+    stream_chunk_size = 500
+    stream_query_param = 'stream'
+
+    def prefetch_objects(self, objects):
+        """Loads whatever the serializer needs for a page or chunk of objects."""
+
+    def list(self, request, *args, **kwargs):
+        ndjson = request.accepted_renderer.format == NDJSONRenderer.format
+        if not ndjson and request.query_params.get(self.stream_query_param) not in ('1', 'true'):
+            return super().list(request, *args, **kwargs)
+
+        rows = self.iter_rows(self.filter_queryset(self.get_queryset()))
+        if ndjson:
+            content = (dumps(row) + '\n' for row in rows)
+            content_type = NDJSONRenderer.media_type
+        else:
+            content = self.json_array(rows)
+            content_type = 'application/json'
+        return StreamingHttpResponse(content, content_type=content_type)
+
+    @staticmethod
+    def json_array(rows):
+        yield '['
+        for i, row in enumerate(rows):
+            yield (',' if i else '') + dumps(row)
+        yield ']'
+
+    def iter_chunks(self, queryset):
+        # walk the list with the same seek conditions as the keyset
+        # pagination, which unlike .iterator() keeps memory flat on MySQL
+        paginator = KeysetPagination()
+        paginator.ordering = paginator.get_ordering(self.request, queryset, self)
+        lookups = queryset._prefetch_related_lookups
+        queryset = queryset.prefetch_related(None).order_by(*paginator.ordering)
+        chunk_queryset = queryset
+        while True:
+            chunk = list(chunk_queryset[:self.stream_chunk_size])
+            if not chunk:
+                return
+            prefetch_related_objects(chunk, *lookups)
+            self.prefetch_objects(chunk)
+            yield chunk
+            if len(chunk) < self.stream_chunk_size:
+                return
+            values = paginator.position(chunk[-1])
+            chunk_queryset = queryset.filter(paginator.seek(paginator.ordering, values))
+
+    def iter_rows(self, queryset):
+        serializer = self.get_serializer_class()(context=self.get_serializer_context())
+        for chunk in self.iter_chunks(queryset):
+            for instance in chunk:
+                yield serializer.to_representation(instance)
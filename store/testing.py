@@ -0,0 +1,44 @@
+from contextlib import ContextDecorator
+
+from django.db import connections
+from django.test.utils import CaptureQueriesContext
+
+
+class QueryBudgetExceeded(AssertionError):
+    pass
+
+
+class query_budget(ContextDecorator):
+    """
+    Fails when the wrapped block runs more than `max_queries` queries,
+    and lists the queries that ran so N+1 patterns are easy to spot.
+
+        with query_budget(3):
+            client.get('/store/orders/')
+
+        @query_budget(2)
+        def test_list_products(self):
+            ...
+    """
+
+    def __init__(self, max_queries, using='default'):
+        self.max_queries = max_queries
+        self.using = using
+
+    def __enter__(self):
+        self.context = CaptureQueriesContext(connections[self.using])
+        self.context.__enter__()
+        return self.context
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.context.__exit__(exc_type, exc_value, traceback)
+        if exc_type is not None:
+            return False
+        executed = len(self.context)
+        if executed > self.max_queries:
+            queries = '\n'.join(
+                f'{i}. {query["sql"]}'
+                for i, query in enumerate(self.context.captured_queries, start=1))
+            raise QueryBudgetExceeded(
+                f'{executed} queries executed, budget is {self.max_queries}:\n{queries}')
+        return False
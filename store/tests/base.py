@@ -0,0 +1,42 @@
+from decimal import Decimal
+
+from django.core.cache import cache
+from django.test import TestCase
+from rest_framework.test import APIClient
+
+from core.models import User
+from store.models import Collection, Order, OrderItem, Product
+from store.pricing import reprice
+
+
+def create_products(count, collection=None):
+    collection = collection or Collection.objects.create(title='Collection')
+    products = [
+        Product.objects.create(
+            title=f'Product {i}', slug=f'product-{i}', unit_price=Decimal('10.00'),
+            inventory=100, collection=collection)
+        for i in range(count)
+    ]
+    reprice()
+    return products
+
+
+def create_user(username='customer', **kwargs):
+    # the customer is created by store.signals.handlers
+    return User.objects.create_user(username, f'{username}@example.com', 'password', **kwargs)
+
+
+def create_orders(customer, products, count):
+    for _ in range(count):
+        order = Order.objects.create(customer=customer)
+        OrderItem.objects.bulk_create([
+            OrderItem(order=order, product=product, quantity=1, unit_price=product.unit_price)
+            for product in products
+        ])
+
+
+class StoreTestCase(TestCase):
+    def setUp(self):
+        # versions and cached responses outlive each test's transaction
+        cache.clear()
+        self.client = APIClient()
@@ -0,0 +1,31 @@
+from unittest import mock
+
+from store.fastadmin import EstimatedCountPaginator
+from store.models import Collection
+from store.tests.base import StoreTestCase, create_products, create_user
+
+
+class FastAdminTest(StoreTestCase):
+    def setUp(self):
+        super().setUp()
+        self.collection = Collection.objects.create(title='Big')
+        create_products(25, self.collection)
+        self.client.force_login(create_user('admin', is_staff=True, is_superuser=True))
+
+    def get_page(self, number):
+        return self.client.get('/admin/store/product/', {
+            'collection__id__exact': self.collection.id, 'p': number})
+
+    @mock.patch.object(EstimatedCountPaginator, 'max_count', 15)
+    def test_pages_past_the_cap_are_served(self):
+        response = self.get_page(3)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.context['cl'].result_list), 5)
+        # past the last row the admin goes back to the first page
+        response = self.get_page(4)
+        self.assertEqual(response.status_code, 302)
+        self.assertIn('e=1', response.url)
+
+    def test_counted_lists_keep_their_last_page(self):
+        self.assertEqual(len(self.get_page(3).context['cl'].result_list), 5)
+        self.assertEqual(self.get_page(4).status_code, 302)
@@ -0,0 +1,21 @@
+from store.analytics import backfill_sales_rollups
+from store.models import Customer, Order, ProductSales
+from store.tests.base import StoreTestCase, create_orders, create_products, create_user
+
+
+class SalesRollupsTest(StoreTestCase):
+    def test_deleted_orders_leave_the_rollups(self):
+        customer = Customer.objects.get(user=create_user())
+        products = create_products(2)
+        create_orders(customer, products, 2)
+        Order.objects.update(payment_status=Order.PAYMENT_STATUS_COMPLETE)
+        backfill_sales_rollups()
+        self.assertEqual(
+            list(ProductSales.objects.values_list('orders_count', flat=True)), [2, 2])
+
+        order = Order.objects.first()
+        with self.captureOnCommitCallbacks(execute=True):
+            order.items.all().delete()
+            order.delete()
+        self.assertEqual(
+            list(ProductSales.objects.values_list('orders_count', flat=True)), [1, 1])
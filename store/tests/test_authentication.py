@@ -0,0 +1,107 @@
+from django.contrib.auth.models import Group, Permission
+from django.test import SimpleTestCase, override_settings
+from rest_framework.test import APIRequestFactory
+from rest_framework_simplejwt.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from core.models import User
+from store.authentication import JWTAuthentication, TokenObtainPairSerializer, get_principal_version
+from store.checks import check_shared_cache
+from store.models import Customer
+from store.permissions import get_user_permissions
+from store.tests.base import StoreTestCase, create_user
+
+
+class PermissionsCacheTest(StoreTestCase):
+    def permissions(self):
+        # a fresh user, whose permissions aren't kept on it yet
+        return get_user_permissions(User.objects.get(pk=self.user.pk))
+
+    def test_group_changes_show_once_committed(self):
+        self.user = create_user()
+        group = Group.objects.create(name='Support')
+        self.assertEqual(self.permissions(), frozenset())
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.groups.add(group)
+            group.permissions.add(Permission.objects.get(codename='view_history'))
+            self.assertEqual(self.permissions(), frozenset())
+        self.assertEqual(self.permissions(), {'store.view_history'})
+
+
+class JWTAuthenticationTest(StoreTestCase):
+    def setUp(self):
+        super().setUp()
+        self.user = create_user()
+        self.customer_id = Customer.objects.get(user=self.user).id
+
+    def token(self):
+        return str(TokenObtainPairSerializer.get_token(User.objects.get(pk=self.user.pk)).access_token)
+
+    def authenticate(self, token):
+        request = APIRequestFactory().get('/', HTTP_AUTHORIZATION=f'JWT {token}')
+        user, _ = JWTAuthentication().authenticate(request)
+        return user
+
+    def change(self, **fields):
+        with self.captureOnCommitCallbacks(execute=True):
+            user = User.objects.get(pk=self.user.pk)
+            for name, value in fields.items():
+                setattr(user, name, value)
+            user.save()
+
+    def test_current_token_is_authenticated_without_queries(self):
+        token = self.token()
+        with self.assertNumQueries(0):
+            user = self.authenticate(token)
+        self.assertEqual(user.pk, self.user.pk)
+        self.assertEqual(user.customer_id, self.customer_id)
+        self.assertFalse(user.is_staff)
+        self.assertTrue(user.is_active)
+
+    def test_principal_version_moves_on_with_the_user(self):
+        group = Group.objects.create(name='Support')
+        changes = [
+            lambda: self.change(is_staff=True),
+            lambda: self.change(is_active=False),
+            lambda: self.user.groups.add(group),
+        ]
+        for change in changes:
+            version = get_principal_version(self.user.pk)
+            with self.captureOnCommitCallbacks(execute=True):
+                change()
+            self.assertGreater(get_principal_version(self.user.pk), version)
+
+    def test_old_version_token_falls_back_to_the_user(self):
+        token = self.token()
+        self.change(is_staff=True)
+        # the user is read once, then cached under the new version
+        with self.assertNumQueries(1):
+            user = self.authenticate(token)
+        self.assertTrue(user.is_staff)
+        with self.assertNumQueries(0):
+            user = self.authenticate(token)
+        self.assertTrue(user.is_staff)
+        self.assertEqual(user.customer_id, self.customer_id)
+
+    def test_refreshed_token_of_an_inactive_user_is_rejected(self):
+        refresh = TokenObtainPairSerializer.get_token(User.objects.get(pk=self.user.pk))
+        self.change(is_active=False)
+        with self.assertRaises(AuthenticationFailed):
+            self.authenticate(str(RefreshToken(str(refresh)).access_token))
+
+    def test_token_of_a_deleted_user_is_rejected(self):
+        token = self.token()
+        with self.captureOnCommitCallbacks(execute=True):
+            User.objects.get(pk=self.user.pk).delete()
+        with self.assertRaises(AuthenticationFailed):
+            self.authenticate(token)
+
+
+class SharedCacheCheckTest(SimpleTestCase):
+    def test_process_local_cache_is_reported(self):
+        self.assertEqual([error.id for error in check_shared_cache(None)], ['store.W001'])
+
+    @override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.redis.RedisCache'}})
+    def test_shared_cache_is_not_reported(self):
+        self.assertEqual(check_shared_cache(None), [])
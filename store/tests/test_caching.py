@@ -0,0 +1,39 @@
+from django.contrib.contenttypes.models import ContentType
+
+from store.caching import get_versions
+from store.models import Product
+from store.tests.base import StoreTestCase, create_products
+from tags.models import Tag, TaggedItem
+
+
+class ResponseVersionsTest(StoreTestCase):
+    def test_versions_move_on_when_the_change_commits(self):
+        product = create_products(1)[0]
+        versions = get_versions(['product', f'product:{product.pk}'])
+        with self.captureOnCommitCallbacks(execute=True):
+            product.title = 'Renamed'
+            product.save()
+            self.assertEqual(get_versions(['product', f'product:{product.pk}']), versions)
+        for before, after in zip(versions, get_versions(['product', f'product:{product.pk}'])):
+            self.assertGreater(after, before)
+
+    def test_tag_changes_move_the_tagged_products_on(self):
+        tagged, untagged = create_products(2)
+        tag = Tag.objects.create(label='fresh')
+        TaggedItem.objects.create(
+            tag=tag, content_type=ContentType.objects.get_for_model(Product), object_id=tagged.pk)
+        keys = [f'product:{tagged.pk}', f'product:{untagged.pk}']
+
+        versions = get_versions(keys)
+        with self.captureOnCommitCallbacks(execute=True):
+            tag.label = 'stale'
+            tag.save()
+        renamed = get_versions(keys)
+        self.assertGreater(renamed[0], versions[0])
+        self.assertEqual(renamed[1], versions[1])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            tag.delete()
+        deleted = get_versions(keys)
+        self.assertGreater(deleted[0], renamed[0])
+        self.assertEqual(deleted[1], renamed[1])
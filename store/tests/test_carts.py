@@ -0,0 +1,110 @@
+import io
+import threading
+from datetime import timedelta
+
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import DatabaseError, connection
+from django.test import SimpleTestCase, TransactionTestCase
+from django.utils import timezone
+
+from store.carts import InMemoryKeyValueClient, delete_expired_carts
+from store.models import Cart, CartItem
+from store.tests.base import StoreTestCase, create_products
+
+
+class AddCartItemsTest(TransactionTestCase):
+    def setUp(self):
+        cache.clear()
+        self.products = create_products(2)
+        self.cart = Cart.objects.create()
+
+    def quantities(self):
+        return dict(CartItem.objects.filter(cart=self.cart).values_list('product_id', 'quantity'))
+
+    def test_adds_new_items_and_increases_existing_ones(self):
+        first, second = self.products
+        CartItem.objects.add_items(self.cart.id, {first.id: 2})
+        CartItem.objects.add_items(self.cart.id, {first.id: 1, second.id: 4, 0: 1})
+        self.assertEqual(self.quantities(), {first.id: 3, second.id: 4})
+
+    def test_concurrent_adds_lose_no_increment(self):
+        product = self.products[0]
+        threads_count, adds = 4, 25
+        barrier = threading.Barrier(threads_count)
+        added = []
+
+        def worker():
+            try:
+                barrier.wait()
+                for _ in range(adds):
+                    try:
+                        CartItem.objects.add_items(self.cart.id, {product.id: 1})
+                        added.append(1)
+                    except DatabaseError:
+                        # SQLite refuses a writer while another one writes
+                        pass
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=worker) for _ in range(threads_count)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertTrue(added)
+        self.assertEqual(self.quantities(), {product.id: len(added)})
+
+
+class InMemoryKeyValueClientTest(SimpleTestCase):
+    def test_expired_keys_are_swept(self):
+        client = InMemoryKeyValueClient()
+        client.hset('abandoned', 'field', 1)
+        client.expire('abandoned', 0)
+        client.next_sweep = 0
+        client.hset('active', 'field', 1)
+        client.expire('active', 60)
+        self.assertEqual(list(client.data), ['active'])
+
+
+class DeleteExpiredCartsTest(StoreTestCase):
+    def setUp(self):
+        super().setUp()
+        product = create_products(1)[0]
+        old = timezone.now() - timedelta(days=8)
+        self.expired = [Cart.objects.create() for _ in range(5)]
+        self.live = [Cart.objects.create() for _ in range(2)]
+        Cart.objects.filter(pk__in=[cart.pk for cart in self.expired]).update(created_at=old)
+        # items in three of the expired carts and in a live one
+        for cart in self.expired[:3] + self.live[:1]:
+            CartItem.objects.create(cart=cart, product=product, quantity=1)
+
+    def test_deletes_expired_carts_in_batches(self):
+        batches = []
+        stats = delete_expired_carts(
+            timedelta(days=7), batch_size=2, progress=lambda stats: batches.append(dict(stats)))
+
+        self.assertEqual((stats['batches'], stats['carts'], stats['items']), (3, 5, 3))
+        self.assertEqual([batch['carts'] for batch in batches], [2, 4, 5])
+        self.assertEqual(
+            set(Cart.objects.values_list('pk', flat=True)), {cart.pk for cart in self.live})
+        self.assertEqual(CartItem.objects.count(), 1)
+
+    def test_dry_run_deletes_nothing(self):
+        stats = delete_expired_carts(timedelta(days=7), batch_size=2, dry_run=True)
+        self.assertEqual((stats['batches'], stats['carts'], stats['items']), (3, 5, 3))
+        self.assertEqual(Cart.objects.count(), 7)
+        self.assertEqual(CartItem.objects.count(), 4)
+
+    def test_command(self):
+        out = io.StringIO()
+        call_command('delete_expired_carts', '--dry-run', '--max-age', str(7 * 24 * 60 * 60), stdout=out)
+        self.assertIn('Would delete 5 carts and 3 items in 1 batches', out.getvalue())
+        self.assertEqual(Cart.objects.count(), 7)
+
+        out = io.StringIO()
+        call_command('delete_expired_carts', '--batch-size', '2', '-v', '2', stdout=out)
+        self.assertIn('batch 3: deleted 5 carts, 3 items', out.getvalue())
+        self.assertIn('Deleted 5 carts and 3 items in 3 batches', out.getvalue())
+        self.assertEqual(Cart.objects.count(), 2)
@@ -0,0 +1,88 @@
+import threading
+from unittest import mock
+
+from django.core.cache import cache
+from django.db import DatabaseError, connection
+from django.test import TransactionTestCase
+from rest_framework.exceptions import ValidationError
+
+from store.carts import InMemoryKeyValueClient, KeyValueCartStore, get_cart_store
+from store.models import Cart, Customer, Order, Product
+from store.serializers import CreateOrderSerializer
+from store.tests.base import StoreTestCase, create_products, create_user
+
+
+def checkout(customer, cart_id):
+    serializer = CreateOrderSerializer(data={'cart_id': cart_id}, context={'customer_id': customer.id})
+    serializer.is_valid(raise_exception=True)
+    return serializer.save()
+
+
+class ConcurrentCheckoutTest(TransactionTestCase):
+    def setUp(self):
+        cache.clear()
+        self.customer = Customer.objects.get(user=create_user())
+        self.product = create_products(1)[0]
+        self.cart_id = get_cart_store().create().id
+        get_cart_store().add_items(self.cart_id, {self.product.id: 3})
+
+    def test_a_cart_is_checked_out_once(self):
+        barrier = threading.Barrier(2)
+        outcomes = []
+
+        def worker():
+            try:
+                barrier.wait()
+                checkout(self.customer, self.cart_id)
+                outcomes.append('ordered')
+            except ValidationError:
+                outcomes.append('rejected')
+            except DatabaseError:
+                # databases without row locks (SQLite) refuse the second writer
+                outcomes.append('failed')
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=worker) for _ in range(2)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(outcomes.count('ordered'), 1, outcomes)
+        self.assertEqual(Order.objects.count(), 1)
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.inventory, 97)
+        self.assertFalse(Cart.objects.filter(pk=self.cart_id).exists())
+
+    def test_a_checked_out_cart_is_gone(self):
+        checkout(self.customer, self.cart_id)
+        with self.assertRaises(ValidationError):
+            checkout(self.customer, self.cart_id)
+        self.assertEqual(Order.objects.count(), 1)
+
+
+class KeyValueCheckoutTest(StoreTestCase):
+    def setUp(self):
+        super().setUp()
+        self.customer = Customer.objects.get(user=create_user())
+        self.product = create_products(1)[0]
+        self.store = KeyValueCartStore(InMemoryKeyValueClient())
+        self.cart_id = self.store.create().id
+        self.store.add_items(self.cart_id, {self.product.id: 3})
+        patcher = mock.patch('store.serializers.get_cart_store', return_value=self.store)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_a_cart_is_checked_out_once(self):
+        checkout(self.customer, self.cart_id)
+        self.assertIsNone(self.store.get(self.cart_id))
+        with self.assertRaises(ValidationError):
+            checkout(self.customer, self.cart_id)
+        self.assertEqual(Order.objects.count(), 1)
+
+    def test_a_failed_checkout_keeps_the_cart(self):
+        Product.objects.filter(pk=self.product.pk).update(inventory=2)
+        with self.assertRaises(ValidationError):
+            checkout(self.customer, self.cart_id)
+        self.assertEqual(self.store.get_quantities(self.cart_id), {self.product.id: 3})
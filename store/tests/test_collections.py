@@ -0,0 +1,20 @@
+from store.models import Collection
+from store.tests.base import StoreTestCase, create_products
+
+
+class ProductsCountTest(StoreTestCase):
+    def test_moving_a_product_moves_its_count(self):
+        product = create_products(2)[0]
+        other = Collection.objects.create(title='Other')
+        product.collection = other
+        product.save()
+        self.assertEqual(Collection.objects.get(title='Collection').products_count, 1)
+        self.assertEqual(Collection.objects.get(title='Other').products_count, 1)
+
+    def test_saving_other_fields_doesnt_read_the_product(self):
+        product = create_products(1)[0]
+        product.title = 'Renamed'
+        # the update and the reindexing in a savepoint, no SELECT of the old row
+        with self.assertNumQueries(5):
+            product.save(update_fields=['title'])
+        self.assertEqual(Collection.objects.get(title='Collection').products_count, 1)
@@ -0,0 +1,76 @@
+import asyncio
+
+from asgiref.sync import async_to_sync
+from django.core.cache import cache
+from django.db import connections
+from django.test import AsyncClient, TransactionTestCase, override_settings
+
+from store.dbrouting import STICKY_COOKIE, ReplicaRoutingMiddleware, get_replica_selector
+from store.tests.base import create_products
+
+
+@override_settings(STORE_DB_REPLICAS=['replica'])
+class ReplicaRoutingTest(TransactionTestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        # a second connection to the test database stands in for a replica,
+        # added after the test case has guarded the databases it knows
+        connections.settings['replica'] = dict(connections['default'].settings_dict)
+
+    @classmethod
+    def tearDownClass(cls):
+        connections['replica'].close()
+        del connections['replica']
+        del connections.settings['replica']
+        super().tearDownClass()
+
+    def setUp(self):
+        cache.clear()
+        get_replica_selector.cache_clear()
+        self.addCleanup(get_replica_selector.cache_clear)
+        create_products(3)
+        self.client = AsyncClient()
+
+    def request(self, method, path, **kwargs):
+        """The response and the databases the store's tables were read from."""
+        aliases = []
+
+        def record(alias):
+            def wrapper(execute, sql, params, many, context):
+                # content types aren't routed, they always come from the primary
+                if '"store_' in sql:
+                    aliases.append(alias)
+                return execute(sql, params, many, context)
+            return wrapper
+
+        async def send():
+            return await getattr(self.client, method)(path, **kwargs)
+
+        # the sync parts of the stack run on this thread, with its connections
+        with connections['default'].execute_wrapper(record('default')), \
+                connections['replica'].execute_wrapper(record('replica')):
+            response = async_to_sync(send)()
+        return response, set(aliases)
+
+    def test_runs_async_under_an_async_handler(self):
+        async def get_response(request):
+            pass
+        self.assertTrue(asyncio.iscoroutinefunction(ReplicaRoutingMiddleware(get_response)))
+        self.assertFalse(asyncio.iscoroutinefunction(ReplicaRoutingMiddleware(lambda request: None)))
+
+    def test_async_reads_go_to_the_replica_until_the_client_writes(self):
+        response, aliases = self.request('get', '/store/products/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(aliases, {'replica'})
+
+        response, aliases = self.request('post', '/store/carts/')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(aliases, {'default'})
+        self.assertIn(STICKY_COOKIE, response.cookies)
+
+        response, aliases = self.request(
+            'get', f'/store/carts/{response.json()["id"]}/',
+            HTTP_COOKIE=f'{STICKY_COOKIE}={response.cookies[STICKY_COOKIE].value}')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(aliases, {'default'})
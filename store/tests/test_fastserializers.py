@@ -0,0 +1,77 @@
+from django.contrib.contenttypes.models import ContentType
+from django.db.models import Prefetch, Sum
+
+from likes.counters import prefetch_like_counts
+from likes.models import LikeCounter
+from store.carts import InMemoryKeyValueClient, KeyValueCartStore, ORMCartStore
+from store.fastserializers import (
+    FastCartItemSerializer, FastCartSerializer, FastOrderSerializer, FastProductSerializer)
+from store.models import Customer, Order, OrderItem, Product, Promotion, line_total
+from store.pricing import reprice
+from store.serializers import CartItemSerializer, CartSerializer, OrderSerializer, ProductListSerializer
+from store.tests.base import StoreTestCase, create_orders, create_products, create_user
+from tags.models import Tag, TaggedItem, prefetch_tags
+
+
+class FastSerializersTest(StoreTestCase):
+    def setUp(self):
+        super().setUp()
+        self.products = create_products(3)
+        promotion = Promotion.objects.create(description='Sale', discount=0.25)
+        self.products[0].promotions.add(promotion)
+        reprice()
+        # one product not priced yet, serialized at its unit price
+        self.products[2].pricing.delete()
+        content_type = ContentType.objects.get_for_model(Product)
+        for label in ('fresh', 'local'):
+            TaggedItem.objects.create(
+                tag=Tag.objects.create(label=label), content_type=content_type,
+                object_id=self.products[0].id)
+        LikeCounter.objects.apply({(content_type.id, self.products[1].id): 2})
+
+    def assert_same_output(self, fast_class, serializer_class, instances):
+        expected = serializer_class(instances, many=True).data
+        self.assertEqual(fast_class(instances, many=True).data, expected)
+        self.assertEqual(fast_class(instances[0]).data, expected[0])
+
+    def test_product(self):
+        products = list(Product.objects.select_related('pricing').filter(
+            pk__in=[p.pk for p in self.products]).order_by('pk'))
+        prefetch_tags(products)
+        prefetch_like_counts(products)
+        self.assert_same_output(FastProductSerializer, ProductListSerializer, products)
+
+    def test_product_values_rows(self):
+        products = list(Product.objects.select_related('pricing').filter(
+            pk__in=[p.pk for p in self.products[:2]]).order_by('pk'))
+        prefetch_tags(products)
+        prefetch_like_counts(products)
+        rows = list(Product.objects.filter(pk__in=[p.pk for p in products]).order_by('pk').values(
+            'id', 'title', 'unit_price', 'description', 'collection_id',
+            'pricing__price', 'pricing__price_with_tax'))
+        for row, product in zip(rows, products):
+            row.update(tags=product.tags, likes_count=product.likes_count)
+        self.assertEqual(
+            FastProductSerializer(rows, many=True).data,
+            ProductListSerializer(products, many=True).data)
+
+    def test_cart_and_items(self):
+        # the ORM store sums in SQL, the key-value store leaves it to the serializer
+        for store in (ORMCartStore(), KeyValueCartStore(InMemoryKeyValueClient())):
+            cart_id = store.create().id
+            store.add_items(cart_id, {product.id: 2 for product in self.products})
+            cart = store.get(cart_id)
+            self.assert_same_output(FastCartSerializer, CartSerializer, [cart])
+            self.assert_same_output(FastCartItemSerializer, CartItemSerializer, cart.items)
+
+    def test_order(self):
+        customer = Customer.objects.get(user=create_user())
+        create_orders(customer, self.products, 2)
+        items = OrderItem.objects \
+            .select_related('product__pricing') \
+            .annotate(total_price=line_total('quantity', 'unit_price'))
+        orders = list(Order.objects
+                      .annotate(total_price=Sum(line_total('items__quantity', 'items__unit_price')))
+                      .prefetch_related(Prefetch('items', queryset=items))
+                      .order_by('pk'))
+        self.assert_same_output(FastOrderSerializer, OrderSerializer, orders)
@@ -0,0 +1,119 @@
+import io
+import json
+from decimal import Decimal
+from unittest import mock
+
+from django.contrib.contenttypes.models import ContentType
+
+from store.importexport import InvalidRow, ProductImporter, export_rows, read_rows, render_rows
+from store.models import Collection, Product, ProductPrice, ProductSearchTerm, Promotion
+from store.tests.base import StoreTestCase, create_products
+from tags.models import TaggedItem
+
+
+class ProductImportTest(StoreTestCase):
+    def setUp(self):
+        super().setUp()
+        self.collection = Collection.objects.create(title='Imports')
+        self.promotion = Promotion.objects.create(description='Sale', discount=0.5)
+
+    def rows(self, count, **fields):
+        return [{
+            'title': f'Imported {i}', 'slug': 'imported', 'unit_price': '10.00',
+            'inventory': 5, 'collection': self.collection.id, **fields,
+        } for i in range(count)]
+
+    def assert_imported(self, products):
+        content_type = ContentType.objects.get_for_model(Product)
+        for product in products:
+            self.assertTrue(ProductSearchTerm.objects.filter(product=product, term='imported').exists())
+            self.assertTrue(ProductPrice.objects.filter(product=product).exists())
+        tagged = TaggedItem.objects.filter(content_type=content_type, tag__label='fresh')
+        return set(tagged.values_list('object_id', flat=True))
+
+    def test_new_rows_are_related_indexed_and_priced(self):
+        rows = self.rows(3, promotions=[self.promotion.id], tags=['fresh']) + self.rows(2)
+        stats = ProductImporter(batch_size=2).run(rows)
+
+        self.assertEqual(stats, {'rows': 5, 'created': 5, 'updated': 0, 'errors': 0, 'unindexed': 0})
+        products = list(Product.objects.filter(collection=self.collection).order_by('pk'))
+        self.assertEqual(self.assert_imported(products), {p.pk for p in products[:3]})
+        self.assertEqual(products[0].pricing.price, Decimal('5.00'))
+        self.assertEqual(products[4].pricing.price, Decimal('10.00'))
+        self.assertEqual(self.collection.products.count(), 5)
+
+    def test_new_ids_are_fetched_without_returning(self):
+        # as on MySQL, where bulk inserts don't return the new ids
+        rows = self.rows(3, tags=['fresh']) + self.rows(3)
+        importer = ProductImporter(batch_size=10)
+        importer.returns_ids = False
+        with mock.patch.object(Product, 'save') as save:
+            stats = importer.run(rows)
+        save.assert_not_called()
+
+        self.assertEqual(stats['created'], 6)
+        self.assertEqual(stats['unindexed'], 0)
+        products = list(Product.objects.filter(collection=self.collection).order_by('pk'))
+        self.assertEqual([p.title for p in products], [row['title'] for row in rows])
+        self.assertEqual(self.assert_imported(products), {p.pk for p in products[:3]})
+
+    def test_existing_rows_are_updated(self):
+        product = create_products(1)[0]
+        row = self.rows(1, id=product.id, title='Renamed', promotions=[self.promotion.id])[0]
+        stats = ProductImporter().run([row])
+
+        self.assertEqual(stats['updated'], 1)
+        product.refresh_from_db()
+        self.assertEqual(product.title, 'Renamed')
+        self.assertEqual(product.collection, self.collection)
+        self.assertEqual(list(product.promotions.all()), [self.promotion])
+        self.assertEqual(product.pricing.price, Decimal('5.00'))
+
+    def test_invalid_rows_are_reported(self):
+        lines = [json.dumps(row) for row in self.rows(2)]
+        lines.insert(1, '{"title": ')
+        lines.append(json.dumps({**self.rows(1)[0], 'collection': 0}))
+        importer = ProductImporter()
+        stats = importer.run(read_rows(io.StringIO('\n'.join(lines) + '\n'), 'jsonl'))
+
+        self.assertEqual(stats['created'], 2)
+        self.assertEqual(stats['errors'], 2)
+        self.assertEqual([row for row, _ in importer.errors], [2, 4])
+        self.assertIn('Invalid JSON', str(importer.errors[0][1]))
+        self.assertIn('collection', importer.errors[1][1])
+
+    def test_read_rows_reports_invalid_json(self):
+        rows = list(read_rows(io.StringIO('{"title": "a"}\n\nnot json\n'), 'jsonl'))
+        self.assertEqual(rows[0], {'title': 'a'})
+        self.assertIsInstance(rows[1], InvalidRow)
+        self.assertEqual(len(rows), 2)
+
+
+class ProductExportTest(StoreTestCase):
+    def test_exported_rows_import_back(self):
+        collection = Collection.objects.create(title='Exports')
+        promotion = Promotion.objects.create(description='Sale', discount=0.5)
+        products = create_products(3, collection)
+        products[0].promotions.add(promotion)
+        ProductImporter().run([{
+            'id': products[1].id, 'title': products[1].title, 'slug': products[1].slug,
+            'unit_price': '10.00', 'inventory': 100, 'collection': collection.id,
+            'tags': ['fresh', 'local'],
+        }])
+
+        rows = list(export_rows(Product.objects.filter(collection=collection), batch_size=2))
+        self.assertEqual([row['id'] for row in rows], [p.id for p in products])
+        self.assertEqual(rows[0]['promotions'], [promotion.id])
+        self.assertEqual(rows[1]['tags'], ['fresh', 'local'])
+
+        for format in ('csv', 'jsonl'):
+            text = ''.join(render_rows(export_rows(Product.objects.filter(collection=collection)), format))
+            importer = ProductImporter()
+            stats = importer.run(read_rows(io.StringIO(text), format))
+            self.assertEqual(stats['updated'], 3, importer.errors)
+            self.assertEqual(stats['errors'], 0)
+        self.assertEqual(list(products[0].promotions.all()), [promotion])
+        content_type = ContentType.objects.get_for_model(Product)
+        self.assertEqual(sorted(TaggedItem.objects.filter(
+            content_type=content_type, object_id=products[1].id).values_list('tag__label', flat=True)),
+            ['fresh', 'local'])
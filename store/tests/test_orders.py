@@ -0,0 +1,70 @@
+from decimal import Decimal
+
+from store.models import Customer, Order, OrderItem
+from store.tests.base import StoreTestCase, create_orders, create_products, create_user
+
+
+class OrderTotalsTest(StoreTestCase):
+    def setUp(self):
+        super().setUp()
+        self.products = create_products(2)
+        self.user = create_user()
+        customer = Customer.objects.get(user=self.user)
+        # 2 orders of 1 item each at 10.00, and 1 order of 3 items at 2.50
+        create_orders(customer, self.products[:1], 2)
+        order = Order.objects.create(customer=customer)
+        OrderItem.objects.create(order=order, product=self.products[1], quantity=3, unit_price=Decimal('2.50'))
+        other = Customer.objects.get(user=create_user('other'))
+        create_orders(other, self.products, 1)
+
+    def totals(self, user):
+        self.client.force_authenticate(user)
+        response = self.client.get('/store/orders/totals/')
+        self.assertEqual(response.status_code, 200)
+        return response.data
+
+    def test_customers_get_the_totals_of_their_orders(self):
+        self.assertEqual(self.totals(self.user), {
+            'orders_count': 3, 'items_count': 5, 'total_price': Decimal('27.50')})
+
+    def test_staff_get_the_totals_of_every_order(self):
+        self.assertEqual(self.totals(create_user('staff', is_staff=True)), {
+            'orders_count': 4, 'items_count': 7, 'total_price': Decimal('47.50')})
+
+    def test_customers_without_orders_get_zeros(self):
+        self.assertEqual(self.totals(create_user('new')), {
+            'orders_count': 0, 'items_count': 0, 'total_price': Decimal('0.00')})
+
+    def test_order_totals_match_the_items(self):
+        self.client.force_authenticate(self.user)
+        response = self.client.get('/store/orders/')
+        self.assertEqual(
+            sorted(order['total_price'] for order in response.data['results']),
+            [Decimal('7.50'), Decimal('10.00'), Decimal('10.00')])
+        for order in response.data['results']:
+            for item in order['items']:
+                self.assertEqual(item['total_price'], item['quantity'] * item['unit_price'])
+
+    def test_anonymous_users_are_refused(self):
+        self.assertEqual(self.client.get('/store/orders/totals/').status_code, 401)
+
+
+class OrderPermissionsTest(StoreTestCase):
+    def setUp(self):
+        super().setUp()
+        self.user = create_user()
+        create_orders(Customer.objects.get(user=self.user), create_products(1), 1)
+        self.order = Order.objects.get()
+
+    def test_non_staff_users_cannot_change_or_delete_orders(self):
+        self.client.force_authenticate(self.user)
+        url = f'/store/orders/{self.order.pk}/'
+        self.assertEqual(self.client.patch(url, {'payment_status': 'C'}).status_code, 403)
+        self.assertEqual(self.client.delete(url).status_code, 403)
+        self.order.refresh_from_db()
+        self.assertEqual(self.order.payment_status, Order.PAYMENT_STATUS_PENDING)
+
+    def test_customers_only_see_their_orders(self):
+        self.client.force_authenticate(create_user('other'))
+        self.assertEqual(self.client.get(f'/store/orders/{self.order.pk}/').status_code, 404)
+        self.assertEqual(self.client.get('/store/orders/').data['results'], [])
@@ -0,0 +1,30 @@
+import base64
+import json
+
+from store.tests.base import StoreTestCase, create_products
+
+
+class KeysetPaginationTest(StoreTestCase):
+    def setUp(self):
+        super().setUp()
+        create_products(12)
+
+    def cursor(self, values):
+        payload = json.dumps({'v': values, 'r': False})
+        return base64.urlsafe_b64encode(payload.encode()).decode()
+
+    def test_next_link_continues_after_the_page(self):
+        response = self.client.get('/store/products/', {'ordering': 'unit_price'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data['results']), 10)
+
+        response = self.client.get(response.data['next'])
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data['results']), 2)
+        self.assertIsNone(response.data['next'])
+
+    def test_invalid_cursor_values_are_not_found(self):
+        for values in (['ten', 1], ['10.00', 'one'], ['10.00', None], [{}, 1]):
+            response = self.client.get('/store/products/', {
+                'ordering': 'unit_price', 'cursor': self.cursor(values)})
+            self.assertEqual(response.status_code, 404, values)
@@ -0,0 +1,81 @@
+from decimal import Decimal
+from importlib import import_module
+
+from django.apps import apps
+
+from store.models import Product, ProductPrice, Promotion
+from store.pricing import best_promotions, compute_price
+from store.tests.base import StoreTestCase, create_products
+
+
+class PricingTest(StoreTestCase):
+    def setUp(self):
+        super().setUp()
+        self.product, self.other = create_products(2)
+        self.small = Promotion.objects.create(description='Small', discount=0.1)
+        self.big = Promotion.objects.create(description='Big', discount=0.3)
+
+    def price(self, product=None):
+        pricing = ProductPrice.objects.get(product=product or self.product)
+        return pricing.price, pricing.promotion_id
+
+    def test_compute_price(self):
+        self.assertEqual(compute_price(Decimal('10.00')), (Decimal('10.00'), Decimal('11.00')))
+        self.assertEqual(compute_price(Decimal('9.99'), 0.15), (Decimal('8.49'), Decimal('9.34')))
+        self.assertEqual(compute_price(Decimal('10.00'), 0), (Decimal('10.00'), Decimal('11.00')))
+
+    def test_overlapping_promotions_take_the_biggest_discount(self):
+        invalid = Promotion.objects.create(description='Free', discount=1)
+        self.product.promotions.add(self.small, self.big, invalid)
+        self.other.promotions.add(self.small)
+
+        best = best_promotions(Product.promotions.through.objects.all())
+        self.assertEqual(best, {self.product.pk: (self.big.pk, 0.3), self.other.pk: (self.small.pk, 0.1)})
+
+    def test_promotion_changes_reprice_once_committed(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.product.promotions.add(self.small, self.big)
+            self.assertEqual(self.price(), (Decimal('10.00'), None))
+        self.assertEqual(self.price(), (Decimal('7.00'), self.big.pk))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.product.promotions.remove(self.big)
+        self.assertEqual(self.price(), (Decimal('9.00'), self.small.pk))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.small.product_set.add(self.other)
+        self.assertEqual(self.price(self.other), (Decimal('9.00'), self.small.pk))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.small.product_set.clear()
+        self.assertEqual(self.price(), (Decimal('10.00'), None))
+        self.assertEqual(self.price(self.other), (Decimal('10.00'), None))
+
+    def test_ended_and_deleted_promotions_reprice(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.product.promotions.add(self.small, self.big)
+
+        # a promotion ends when its discount is set to 0 or it's deleted
+        with self.captureOnCommitCallbacks(execute=True):
+            self.big.discount = 0
+            self.big.save()
+        self.assertEqual(self.price(), (Decimal('9.00'), self.small.pk))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.small.delete()
+        self.assertEqual(self.price(), (Decimal('10.00'), None))
+
+    def test_unit_price_changes_reprice(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.product.promotions.add(self.big)
+            self.product.unit_price = Decimal('20.00')
+            self.product.save()
+        self.assertEqual(self.price(), (Decimal('14.00'), self.big.pk))
+
+    def test_migration_backfills_every_price(self):
+        self.product.promotions.add(self.big)
+        ProductPrice.objects.all().delete()
+        migration = import_module('store.migrations.0022_backfill_prices')
+        migration.backfill_prices(apps, None)
+        self.assertEqual(self.price(), (Decimal('7.00'), self.big.pk))
+        self.assertEqual(self.price(self.other), (Decimal('10.00'), None))
@@ -0,0 +1,74 @@
+from unittest import mock
+
+from django.db import connection
+from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
+
+from store.profiling import registry
+from store.tests.base import StoreTestCase, create_products, create_user
+
+
+@override_settings(STORE_PROFILING=True, STORE_PROFILING_SAMPLE_RATE=1)
+class ProfilingMiddlewareTest(StoreTestCase):
+    def setUp(self):
+        super().setUp()
+        create_products(3)
+        registry.reset()
+        self.addCleanup(registry.reset)
+
+    def test_records_the_queries_of_the_request(self):
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get('/store/products/')
+        self.assertEqual(response.status_code, 200)
+
+        metrics = registry.summary()['ProductViewSet.list']
+        self.assertEqual(metrics['db_queries']['count'], 1)
+        self.assertEqual(metrics['db_queries']['max'], len(context))
+        self.assertGreater(metrics['db_duration_seconds']['max'], 0)
+        self.assertLessEqual(
+            metrics['db_duration_seconds']['max'], metrics['request_duration_seconds']['max'])
+        self.assertGreater(metrics['serializer_duration_seconds']['max'], 0)
+        self.assertEqual(metrics['response_bytes']['max'], len(response.content))
+
+    def test_records_a_share_of_the_requests(self):
+        with override_settings(STORE_PROFILING_SAMPLE_RATE=0.5), \
+                mock.patch('store.profiling.random.random', side_effect=[0.2, 0.7, 0.4]):
+            client = self.client_class()
+            for _ in range(3):
+                client.get('/store/products/')
+        self.assertEqual(registry.summary()['ProductViewSet.list']['db_queries']['count'], 2)
+
+    def test_nothing_is_recorded_when_disabled(self):
+        for overrides in ({'STORE_PROFILING': False}, {'STORE_PROFILING_SAMPLE_RATE': 0}):
+            with override_settings(**overrides):
+                # the middleware is set up by a client's first request
+                response = self.client_class().get('/store/products/')
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(registry.summary(), {}, overrides)
+
+
+class MetricsViewTest(StoreTestCase):
+    def setUp(self):
+        super().setUp()
+        registry.reset()
+        self.addCleanup(registry.reset)
+        registry.observe('ProductViewSet.list', {'db_queries': 3, 'request_duration_seconds': 0.02})
+
+    def test_staff_only(self):
+        self.assertEqual(self.client.get('/store/metrics/').status_code, 401)
+        self.client.force_authenticate(create_user())
+        self.assertEqual(self.client.get('/store/metrics/').status_code, 403)
+
+    def test_summary_and_prometheus_formats(self):
+        self.client.force_authenticate(create_user('staff', is_staff=True))
+        response = self.client.get('/store/metrics/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['ProductViewSet.list']['db_queries']['max'], 3)
+
+        response = self.client.get('/store/metrics/', {'format': 'prometheus'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'text/plain; charset=utf-8')
+        self.assertIn(
+            'store_db_queries_bucket{endpoint="ProductViewSet.list",le="3"} 1',
+            response.content.decode())
+        self.assertIn('store_db_queries_count{endpoint="ProductViewSet.list"} 1', response.content.decode())
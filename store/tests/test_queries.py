@@ -0,0 +1,183 @@
+from decimal import Decimal
+
+from django.contrib.contenttypes.models import ContentType
+
+from core.models import User
+from likes.models import LikeCounter
+from store.models import Customer, Product, Review
+from store.testing import query_budget
+from store.tests.base import StoreTestCase, create_orders, create_products, create_user
+from tags.models import Tag, TaggedItem
+
+
+class OrderListQueriesTest(StoreTestCase):
+    def setUp(self):
+        super().setUp()
+        self.user = create_user()
+        self.customer = Customer.objects.get(user=self.user)
+        self.products = create_products(6)
+
+    def authenticate(self):
+        # a fresh user, whose customer id isn't known yet
+        self.client.force_authenticate(User.objects.get(pk=self.user.pk))
+
+    def test_query_count_does_not_grow_with_orders_and_items(self):
+        create_orders(self.customer, self.products[:1], 1)
+        self.authenticate()
+        # the customer's id, the orders and their items with products and prices
+        with self.assertNumQueries(3):
+            response = self.client.get('/store/orders/')
+        self.assertEqual(response.status_code, 200)
+
+        create_orders(self.customer, self.products, 5)
+        self.authenticate()
+        with self.assertNumQueries(3):
+            response = self.client.get('/store/orders/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data['results']), 6)
+        self.assertEqual(response.data['results'][0]['items'][0]['product']['price'], Decimal('10.00'))
+
+    def test_retrieve_query_count_does_not_grow_with_items(self):
+        create_orders(self.customer, self.products, 1)
+        order = self.customer.order_set.get()
+        self.authenticate()
+        # the customer's id, the order and its items with products and prices
+        with query_budget(3):
+            response = self.client.get(f'/store/orders/{order.id}/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data['items']), 6)
+
+    def test_create_query_count_does_not_grow_with_items(self):
+        for products in (self.products[:1], self.products):
+            cart_id = self.client.post('/store/carts/').data['id']
+            for product in products:
+                self.client.post(
+                    f'/store/carts/{cart_id}/items/', {'product_id': product.id, 'quantity': 1})
+            self.authenticate()
+            # the customer's id, the cart, its items, products and prices, the
+            # order with its items, the inventory update, the cart's deletion
+            # and the created order read back, in a savepoint
+            with query_budget(16):
+                response = self.client.post('/store/orders/', {'cart_id': cart_id})
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(len(response.data['items']), len(products))
+
+
+class ProductListQueriesTest(StoreTestCase):
+    def setUp(self):
+        super().setUp()
+        content_type = ContentType.objects.get_for_model(Product)
+        tag = Tag.objects.create(label='fresh')
+        products = create_products(12)
+        for product in products:
+            TaggedItem.objects.create(tag=tag, content_type=content_type, object_id=product.id)
+        # likes are counted on commit, which a TestCase never reaches
+        LikeCounter.objects.apply({(content_type.id, product.id): 1 for product in products})
+
+    # the products with their prices, their content type, tags and like counts
+    @query_budget(4)
+    def test_page_tags_and_likes_are_loaded_in_one_query_each(self):
+        response = self.client.get('/store/products/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data['results']), 10)
+        for product in response.data['results']:
+            self.assertEqual(product['tags'], ['fresh'])
+            self.assertEqual(product['likes_count'], 1)
+
+
+class CollectionQueriesTest(StoreTestCase):
+    def setUp(self):
+        super().setUp()
+        self.products = create_products(3)
+        self.collection = self.products[0].collection
+        for product in self.products:
+            Review.objects.create(product=product, name='Reviewer', description='Fine')
+        Review.objects.create(product=self.products[0], name='Other', description='Good')
+
+    # the collections with their stored product counts
+    @query_budget(1)
+    def test_list(self):
+        response = self.client.get('/store/collections/')
+        self.assertEqual(response.status_code, 200)
+        collection = next(c for c in response.data if c['id'] == self.collection.id)
+        self.assertEqual(collection['products_count'], 3)
+
+    @query_budget(1)
+    def test_retrieve(self):
+        response = self.client.get(f'/store/collections/{self.collection.id}/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['products_count'], 3)
+
+    @query_budget(1)
+    def test_review_list(self):
+        response = self.client.get(f'/store/products/{self.products[0].id}/reviews/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data['results']), 2)
+
+
+class CustomerQueriesTest(StoreTestCase):
+    def test_me(self):
+        user = create_user()
+        self.client.force_authenticate(User.objects.get(pk=user.pk))
+        # the customer's id, then the customer
+        with query_budget(2):
+            response = self.client.get('/store/customers/me/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['user_id'], user.id)
+
+
+class CartQueriesTest(StoreTestCase):
+    def setUp(self):
+        super().setUp()
+        self.products = create_products(5)
+        response = self.client.post('/store/carts/')
+        self.cart_url = f'/store/carts/{response.data["id"]}/'
+
+    def add_items(self, products):
+        for product in products:
+            response = self.client.post(
+                self.cart_url + 'items/', {'product_id': product.id, 'quantity': 2})
+            self.assertEqual(response.status_code, 201)
+
+    def test_invalid_item_ids_are_not_found(self):
+        self.add_items(self.products[:1])
+        for url in (self.cart_url + 'items/abc/', '/store/carts/abc/items/1/'):
+            self.assertEqual(self.client.patch(url, {'quantity': 1}).status_code, 404, url)
+            self.assertEqual(self.client.delete(url).status_code, 404, url)
+
+    def test_adding_to_an_invalid_cart_id_is_rejected(self):
+        product_id = self.products[0].id
+        for url, data in (
+                ('/store/carts/abc/items/', {'product_id': product_id, 'quantity': 1}),
+                ('/store/carts/abc/items/bulk/', [{'product_id': product_id, 'quantity': 1}])):
+            response = self.client.post(url, data, format='json')
+            self.assertEqual(response.status_code, 400, url)
+            self.assertEqual(response.data, {'cart_id': 'No cart found.'}, url)
+
+    def test_query_count_does_not_grow_with_items(self):
+        self.add_items(self.products[:1])
+        # the cart with its total, its items with their products and prices
+        with self.assertNumQueries(2):
+            response = self.client.get(self.cart_url)
+        self.assertEqual(response.status_code, 200)
+
+        self.add_items(self.products[1:])
+        with self.assertNumQueries(2):
+            response = self.client.get(self.cart_url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data['items']), 5)
+        self.assertEqual(response.data['total_price'], Decimal('100.00'))
+
+    def test_item_create_and_update_query_counts(self):
+        self.add_items(self.products[:2])
+        # the upsert and the item read back, in a savepoint
+        with query_budget(4):
+            response = self.client.post(
+                self.cart_url + 'items/', {'product_id': self.products[2].id, 'quantity': 1})
+        self.assertEqual(response.status_code, 201)
+        # the update and the item read back
+        with query_budget(2):
+            response = self.client.patch(
+                self.cart_url + f'items/{response.data["id"]}/', {'quantity': 3})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['quantity'], 3)
@@ -0,0 +1,93 @@
+from decimal import Decimal
+
+from store.models import Collection, Product, ProductSearchTerm
+from store.search import InvertedIndexBackend
+from store.tests.base import StoreTestCase
+
+
+class InvertedIndexBackendTest(StoreTestCase):
+    def setUp(self):
+        super().setUp()
+        self.collection = Collection.objects.create(title='Groceries')
+        self.backend = InvertedIndexBackend()
+
+    def create(self, title, description='', collection=None):
+        return Product.objects.create(
+            title=title, slug='product', description=description, unit_price=Decimal('10.00'),
+            inventory=10, collection=collection or self.collection)
+
+    def search(self, query):
+        return list(self.backend.search(Product.objects.all(), query)
+                    .order_by('-search_rank', 'pk').values_list('title', flat=True))
+
+    def test_every_term_must_match_and_the_last_as_a_prefix(self):
+        self.create('Red apple')
+        self.create('Green apple')
+        self.create('Red pepper')
+
+        self.assertEqual(self.search('red app'), ['Red apple'])
+        self.assertEqual(self.search('appl'), ['Red apple', 'Green apple'])
+        self.assertEqual(self.search('RED'), ['Red apple', 'Red pepper'])
+        # only the last term is a prefix
+        self.assertEqual(self.search('re apple'), [])
+        self.assertEqual(self.search('red banana'), [])
+
+    def test_rank_follows_the_field_weights(self):
+        in_description = self.create('Tea', description='with lemon')
+        in_title = self.create('Lemon')
+        in_collection = self.create('Juice', collection=Collection.objects.create(title='Lemon things'))
+        twice = self.create('Lemon', description='lemon')
+
+        ranks = dict(self.backend.search(Product.objects.all(), 'lemon').values_list('pk', 'search_rank'))
+        self.assertEqual(ranks, {in_title.pk: 3, in_collection.pk: 2, in_description.pk: 1, twice.pk: 4})
+
+        response = self.client.get('/store/products/', {'search': 'lemon'})
+        self.assertEqual(
+            [product['id'] for product in response.data['results']],
+            [twice.pk, in_title.pk, in_collection.pk, in_description.pk])
+
+    def test_saved_and_deleted_products_are_reindexed(self):
+        product = self.create('Red apple')
+        product.title = 'Green apple'
+        product.save()
+        self.assertEqual(self.search('red'), [])
+        self.assertEqual(self.search('green'), ['Green apple'])
+
+        product.delete()
+        self.assertEqual(self.search('green'), [])
+        self.assertFalse(ProductSearchTerm.objects.filter(product_id=product.pk).exists())
+
+    def test_renamed_collections_are_reindexed(self):
+        self.create('Red apple')
+        self.collection.title = 'Orchard'
+        self.collection.save()
+        self.assertEqual(self.search('orchard'), ['Red apple'])
+        self.assertEqual(self.search('groceries'), [])
+
+        # saves leaving the title alone don't reindex the products
+        ProductSearchTerm.objects.filter(term='orchard').delete()
+        self.collection.save(update_fields=['products_count'])
+        self.assertEqual(self.search('orchard'), [])
+
+    def test_search_results_are_paginated_with_cursors(self):
+        for i in range(8):
+            self.create(f'Widget {i}', description='widget')
+        for i in range(8):
+            self.create(f'Widget {i + 8}')
+        self.create('Gadget')
+
+        response = self.client.get('/store/products/', {'search': 'widget'})
+        pages = [response.data['results']]
+        while response.data['next']:
+            response = self.client.get(response.data['next'])
+            self.assertEqual(response.status_code, 200)
+            pages.append(response.data['results'])
+
+        self.assertEqual([len(page) for page in pages], [10, 6])
+        titles = [product['title'] for page in pages for product in page]
+        self.assertEqual(len(set(titles)), 16)
+        # the products matching in their description too come first
+        self.assertEqual(set(titles[:8]), {f'Widget {i}' for i in range(8)})
+
+        response = self.client.get(response.data['previous'])
+        self.assertEqual(response.data['results'], pages[0])
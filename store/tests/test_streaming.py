@@ -0,0 +1,88 @@
+import json
+from unittest import mock
+
+from django.contrib.contenttypes.models import ContentType
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+from likes.models import LikeCounter
+from store.models import Customer, Product
+from store.tests.base import StoreTestCase, create_orders, create_products, create_user
+from store.views import OrderViewSet, ProductViewSet
+from tags.models import Tag, TaggedItem
+
+
+class StreamingListTest(StoreTestCase):
+    def setUp(self):
+        super().setUp()
+        self.products = create_products(7)
+        self.collection = self.products[0].collection
+        content_type = ContentType.objects.get_for_model(Product)
+        tag = Tag.objects.create(label='fresh')
+        for product in self.products[::2]:
+            TaggedItem.objects.create(tag=tag, content_type=content_type, object_id=product.id)
+        LikeCounter.objects.apply({(content_type.id, self.products[1].id): 3})
+
+    def paged(self, url, params):
+        # every page of the non-streamed list, as rendered
+        page = json.loads(self.client.get(url, params).content)
+        results = page['results']
+        while page['next']:
+            page = json.loads(self.client.get(page['next']).content)
+            results += page['results']
+        return results
+
+    def stream(self, url, params, **headers):
+        response = self.client.get(url, params, **headers)
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        return response, b''.join(response.streaming_content).decode()
+
+    def test_json_array_equals_the_paged_list(self):
+        params = {'collection_id': self.collection.id, 'ordering': 'unit_price'}
+        expected = self.paged('/store/products/', params)
+        self.assertEqual(len(expected), 7)
+
+        response, content = self.stream('/store/products/', {**params, 'stream': 'true'})
+        self.assertEqual(response['Content-Type'], 'application/json')
+        self.assertEqual(json.loads(content), expected)
+
+    def test_ndjson_has_one_object_per_line(self):
+        params = {'collection_id': self.collection.id}
+        expected = self.paged('/store/products/', params)
+
+        response, content = self.stream(
+            '/store/products/', params, HTTP_ACCEPT='application/x-ndjson')
+        self.assertEqual(response['Content-Type'], 'application/x-ndjson')
+        self.assertTrue(content.endswith('\n'))
+        self.assertEqual([json.loads(line) for line in content.splitlines()], expected)
+
+    def test_rows_are_read_in_chunks(self):
+        params = {'collection_id': self.collection.id}
+        expected = self.paged('/store/products/', params)
+        with mock.patch.object(ProductViewSet, 'stream_chunk_size', 3), \
+                CaptureQueriesContext(connection) as context:
+            _, content = self.stream('/store/products/', {**params, 'stream': 'true'})
+        self.assertEqual(json.loads(content), expected)
+        # 3, 3 and 1 products, each chunk with its tags and like counts
+        chunks = [query for query in context.captured_queries
+                  if query['sql'].startswith('SELECT "store_product"')]
+        self.assertEqual(len(chunks), 3)
+
+    def test_empty_list(self):
+        params = {'search': 'nothing'}
+        _, content = self.stream('/store/products/', {**params, 'stream': '1'})
+        self.assertEqual(json.loads(content), [])
+        _, content = self.stream('/store/products/', params, HTTP_ACCEPT='application/x-ndjson')
+        self.assertEqual(content, '')
+
+    def test_orders_stream_the_prefetched_items(self):
+        user = create_user()
+        create_orders(Customer.objects.get(user=user), self.products, 5)
+        self.client.force_authenticate(user)
+        expected = self.paged('/store/orders/', {})
+
+        with mock.patch.object(OrderViewSet, 'stream_chunk_size', 2):
+            _, content = self.stream('/store/orders/', {'stream': 'true'})
+        self.assertEqual(json.loads(content), expected)
+        self.assertEqual(len(expected[0]['items']), 7)
@@ -1,6 +1,9 @@
+from django.conf import settings
+from django.urls import path
 from rest_framework.routers import DefaultRouter
 from rest_framework_nested import routers
 from . import views
+from .asyncviews import async_urlpatterns
 
 router = routers.DefaultRouter()
 router.register('products', views.ProductViewSet, basename='products')
@@ -8,6 +11,7 @@ router.register('collections', views.CollectionViewSet, basename='collections')
 router.register('carts', views.CartViewSet, basename='carts')
 router.register('customers', views.CustomerViewSet)
 router.register('orders', views.OrderViewSet, basename='orders')
+router.register('sales', views.SalesViewSet, basename='sales')
 
 # nested routes for product
 products_router = routers.NestedDefaultRouter(
@@ -29,4 +33,14 @@ carts_router = routers.NestedDefaultRouter(
 )
 carts_router.register('items', views.CartItemViewSet, basename='cart-items')
 
-urlpatterns = router.urls+products_router.urls+carts_router.urls
+urlpatterns = router.urls+products_router.urls+carts_router.urls+[
+    path('metrics/', views.MetricsView.as_view(), name='metrics'),
+]
+
+# under ASGI the read endpoints are served by async views, see
+# store.asyncviews, other requests still go to the viewsets
+if getattr(settings, 'STORE_ASYNC_VIEWS', False):
+    urlpatterns = async_urlpatterns(urlpatterns, [
+        views.ProductViewSet, views.CollectionViewSet, views.ReviewViewSet,
+        views.CartViewSet, views.CartItemViewSet,
+    ]) + urlpatterns
@@ -1,48 +1,100 @@
-from django.db.models import Count
+from decimal import Decimal
+
+from django.db.models import Count, DecimalField, Prefetch, Sum
+from django.db.models.functions import Coalesce
+from django.shortcuts import get_object_or_404
 from django_filters.rest_framework import DjangoFilterBackend
+from rest_framework import status
 from rest_framework.decorators import action
-from rest_framework.filters import SearchFilter, OrderingFilter
+from rest_framework.exceptions import NotFound
+from rest_framework.filters import OrderingFilter
 from rest_framework.mixins import CreateModelMixin, RetrieveModelMixin, DestroyModelMixin, UpdateModelMixin
 from rest_framework.permissions import IsAuthenticated, IsAdminUser
 from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from rest_framework.views import APIView
 from rest_framework.viewsets import ModelViewSet, GenericViewSet
+from likes.counters import prefetch_like_counts
+from tags.models import prefetch_tags
 from store import serializers
-from store.filters import ProductFilter
-from store.models import Cart, CartItem, Collection, Customer, Order, OrderItem, Product, Review
-from store.pagination import CustomPagination
+from store.analytics import summarize
+from store.asyncviews import AsyncReadMixin
+from store.authentication import get_customer_id
+from store.caching import CachedResponseMixin
+from store.carts import get_cart_store, parse_cart_id
+from store.fastserializers import FastCartItemSerializer, FastCartSerializer, FastOrderSerializer, FastProductSerializer
+from store.filters import ProductFilter, ProductSearchFilter
+from store.models import Cart, CartItem, Collection, CollectionSales, Customer, MembershipSales, Order, OrderItem, Product, ProductSales, Review, line_total
+from store.pagination import KeysetPagination
+from store.profiling import PrometheusRenderer, registry
 from store.permissions import IsAdminOrReadOnly, ViewCustomerHistoryPermission
-from store.serializers import AddCartItemSerializer, CartItemSerializer, CartSerializer, CollectionSerializer, CreateOrderSerializer, CustomerSerializer, OrderSerializer, ProductSerializer, ReviewSerializer, UpdateCartItemSerializer, UpdateOrderSerializer
+from store.streaming import StreamingListMixin
+from store.serializers import AddCartItemSerializer, CartItemSerializer, CartSerializer, CollectionSerializer, CreateOrderSerializer, CustomerSerializer, OrderSerializer, OrderTotalsSerializer, ProductSerializer, ReviewSerializer, UpdateCartItemSerializer, UpdateOrderSerializer
 
 
-class ProductViewSet(ModelViewSet):
-    filter_backends = [DjangoFilterBackend, SearchFilter, OrderingFilter]
+class ProductViewSet(AsyncReadMixin, StreamingListMixin, CachedResponseMixin, ModelViewSet):
+    filter_backends = [DjangoFilterBackend, ProductSearchFilter, OrderingFilter]
     filter_class = ProductFilter
     filterset_fields = ['collection_id']
     ordering_fields = ['unit_price', 'last_update']
-    pagination_class = CustomPagination
-    queryset = Product.objects.all()
-    search_fields = ['title', 'description', 'collection__title']
-    serializer_class = ProductSerializer
+    pagination_class = KeysetPagination
+    # the effective prices come from the price table
+    queryset = Product.objects.select_related('pricing')
+
+    def get_cache_dependencies(self):
+        if self.action == 'retrieve':
+            return [f'product:{self.kwargs["pk"]}']
+        # the search index includes collection titles
+        return ['product', 'collection']
+
+    def get_serializer_class(self):
+        if self.request.method == 'GET':
+            return FastProductSerializer
+        return ProductSerializer
 
     def get_serializer_context(self):
         return {'request': self.request}
 
+    def prefetch_objects(self, objects):
+        # tags and like counts of the whole page in one query each
+        prefetch_tags(objects)
+        prefetch_like_counts(objects)
+
+    def paginate_queryset(self, queryset):
+        page = super().paginate_queryset(queryset)
+        if page is not None:
+            self.prefetch_objects(page)
+        return page
+
+    def get_object(self):
+        product = super().get_object()
+        if self.request.method == 'GET':
+            self.prefetch_objects([product])
+        return product
+
     def destroy(self, request, *args, **kwargs):
         if OrderItem.objects.filter(product_id=kwargs['pk']).count() > 0:
             return Response({'error': 'Cannot delete product because it is associated with an Order.'})
         return super().destroy(request, *args, **kwargs)
 
 
-class CollectionViewSet(ModelViewSet):
+class CollectionViewSet(AsyncReadMixin, CachedResponseMixin, ModelViewSet):
     serializer_class = CollectionSerializer
 
-    def get_queryset(self):
-        return Collection.objects.annotate(products_count=Count('products'))
+    def get_cache_dependencies(self):
+        # products_count changes with products
+        return ['collection', 'product']
+
+    queryset = Collection.objects.all()
 
 
-class ReviewViewSet(ModelViewSet):
+class ReviewViewSet(AsyncReadMixin, CachedResponseMixin, ModelViewSet):
+    pagination_class = KeysetPagination
     serializer_class = ReviewSerializer
 
+    def get_cache_dependencies(self):
+        return [f'reviews:{self.kwargs["product_pk"]}']
+
     def get_queryset(self):
         return Review.objects.filter(product_id=self.kwargs['product_pk'])
 
@@ -59,15 +111,40 @@ class CartViewSet(
     RetrieveModelMixin,
     DestroyModelMixin
 ):
-    queryset = Cart.objects.prefetch_related('items__product').all()
+    # carts are read and written through the configured cart store
+    # (store.carts), not necessarily the Cart table
     serializer_class = CartSerializer
 
+    def create(self, request, *args, **kwargs):
+        cart = get_cart_store().create()
+        return Response(FastCartSerializer(cart).data, status=status.HTTP_201_CREATED)
+
+    def retrieve(self, request, pk):
+        cart = get_cart_store().get(pk)
+        if cart is None:
+            raise NotFound()
+        return Response(FastCartSerializer(cart).data)
+
+    async def aretrieve(self, request, pk):
+        cart = await get_cart_store().aget(pk)
+        if cart is None:
+            raise NotFound()
+        return Response(FastCartSerializer(cart).data)
+
+    def destroy(self, request, pk):
+        if not get_cart_store().delete(pk):
+            raise NotFound()
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
 
 class CartItemViewSet(ModelViewSet):
     http_method_names = ['get', 'post', 'patch', 'delete']
 
-    def get_queryset(self):
-        return CartItem.objects.filter(cart_id=self.kwargs['cart_pk']).select_related('product')
+    def get_cart(self):
+        cart = get_cart_store().get(self.kwargs['cart_pk'])
+        if cart is None:
+            raise NotFound()
+        return cart
 
     def get_serializer_class(self):
         if self.request.method == "POST":
@@ -79,6 +156,64 @@ class CartItemViewSet(ModelViewSet):
     def get_serializer_context(self):
         return {'cart_id': self.kwargs['cart_pk']}
 
+    async def aget_cart(self):
+        cart = await get_cart_store().aget(self.kwargs['cart_pk'])
+        if cart is None:
+            raise NotFound()
+        return cart
+
+    def list(self, request, cart_pk):
+        return Response(FastCartItemSerializer(self.get_cart().items, many=True).data)
+
+    async def alist(self, request, cart_pk):
+        cart = await self.aget_cart()
+        return Response(FastCartItemSerializer(cart.items, many=True).data)
+
+    def retrieve(self, request, cart_pk, pk):
+        for item in self.get_cart().items:
+            if str(item.id) == pk:
+                return Response(FastCartItemSerializer(item).data)
+        raise NotFound()
+
+    async def aretrieve(self, request, cart_pk, pk):
+        for item in (await self.aget_cart()).items:
+            if str(item.id) == pk:
+                return Response(FastCartItemSerializer(item).data)
+        raise NotFound()
+
+    def get_item_key(self):
+        # ids that can't exist are a 404 rather than an error of the store
+        cart_id = parse_cart_id(self.kwargs['cart_pk'])
+        try:
+            item_id = int(self.kwargs['pk'])
+        except ValueError:
+            raise NotFound()
+        if cart_id is None:
+            raise NotFound()
+        return cart_id, item_id
+
+    def partial_update(self, request, cart_pk, pk):
+        serializer = UpdateCartItemSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        item = get_cart_store().set_quantity(
+            *self.get_item_key(), serializer.validated_data['quantity'])
+        if item is None:
+            raise NotFound()
+        return Response(UpdateCartItemSerializer(item).data)
+
+    def destroy(self, request, cart_pk, pk):
+        if not get_cart_store().remove_item(*self.get_item_key()):
+            raise NotFound()
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
+    # /store/carts/<cart_pk>/items/bulk/ adds many items in one statement
+    @action(detail=False, methods=['POST'])
+    def bulk(self, request, cart_pk):
+        serializer = self.get_serializer(data=request.data, many=True)
+        serializer.is_valid(raise_exception=True)
+        serializer.save()
+        return Response(serializer.data, status=status.HTTP_201_CREATED)
+
 
 class CustomerViewSet(CreateModelMixin, UpdateModelMixin, RetrieveModelMixin, GenericViewSet):
     permission_classes = [IsAdminOrReadOnly]
@@ -89,8 +224,7 @@ class CustomerViewSet(CreateModelMixin, UpdateModelMixin, RetrieveModelMixin, Ge
     @action(detail=False, methods=['GET', 'PUT'], permission_classes=[IsAuthenticated])
     # detail=False specifies that it is a detail view and not a list view
     def me(self, request):
-        customer = Customer.objects.get(
-            user_id=request.user.id)
+        customer = get_object_or_404(Customer, pk=get_customer_id(request.user))
         if request.method == 'GET':
             serializer = CustomerSerializer(customer)
             return Response(serializer.data)
@@ -105,20 +239,22 @@ class CustomerViewSet(CreateModelMixin, UpdateModelMixin, RetrieveModelMixin, Ge
         return Response('ok')
 
 
-class OrderViewSet(ModelViewSet):
+class OrderViewSet(StreamingListMixin, ModelViewSet):
     http_method_names = ['get', 'patch', 'delete', 'options', 'head', 'post']
+    ordering = ['-placed_at']
+    pagination_class = KeysetPagination
 
     # overwrite method for CreateModelMixin - mixin for POST requests
     def create(self, request, *args, **kwargs):
         serializer = CreateOrderSerializer(
             data=request.data,
-            context={'user_id': self.request.user.id}
+            context={'customer_id': get_customer_id(self.request.user)}
         )
         serializer.is_valid(raise_exception=True)
         order = serializer.save()
-        print(order)
-        # change serializer for response
-        serializer = OrderSerializer(order)
+        # change serializer for response, reloading the order with the
+        # same prefetching as the list so the response is query-bounded
+        serializer = FastOrderSerializer(self.get_queryset().get(pk=order.pk))
         return Response(serializer.data)
 
     def get_permissions(self):
@@ -128,17 +264,121 @@ class OrderViewSet(ModelViewSet):
 
     def get_queryset(self):
         user = self.request.user
+        # orders, their items and the items' products with their prices are
+        # loaded in two queries however many orders are on the page, with
+        # the line and order totals computed by the database
+        items = OrderItem.objects \
+            .select_related('product__pricing') \
+            .annotate(total_price=line_total('quantity', 'unit_price'))
+        queryset = Order.objects \
+            .annotate(total_price=Sum(line_total('items__quantity', 'items__unit_price'))) \
+            .prefetch_related(Prefetch('items', queryset=items))
         # if user is a staff, he can view all orders
         if user.is_staff:
-            return Order.objects.prefetch_related('items').all()
+            return queryset.all()
         # if user is logged in he can view his orders
-        customer_id = Customer.objects.only(
-            'id').get(user_id=user.id)
-        return Order.objects.filter(customer_id=customer_id)
+        return queryset.filter(customer_id=get_customer_id(user))
+
+    @action(detail=False)
+    def totals(self, request):
+        # a single aggregate over the order items the user can see
+        items = OrderItem.objects.all()
+        if not request.user.is_staff:
+            items = items.filter(order__customer_id=get_customer_id(request.user))
+        totals = items.aggregate(
+            orders_count=Count('order_id', distinct=True),
+            items_count=Coalesce(Sum('quantity'), 0),
+            total_price=Coalesce(
+                Sum(line_total('quantity', 'unit_price')), Decimal(0),
+                output_field=DecimalField(max_digits=12, decimal_places=2)))
+        serializer = OrderTotalsSerializer(totals)
+        return Response(serializer.data)
 
     def get_serializer_class(self):
         if self.request.method == 'POST':
             return CreateOrderSerializer
         if self.request.method == 'PATCH':
             return UpdateOrderSerializer
+        if self.request.method == 'GET':
+            return FastOrderSerializer
         return OrderSerializer
+
+
+class SalesViewSet(GenericViewSet):
+    """
+    Sales dashboards for staff, answered from the daily rollups of
+    store.analytics rather than the order items. Each action takes
+    ?start= and ?end= dates, the last 30 days by default, and the rankings
+    ?limit= and ?ordering=. They are as fresh as the last
+    update_sales_rollups run.
+    """
+    permission_classes = [IsAdminUser]
+
+    def get_query(self):
+        serializer = serializers.SalesQuerySerializer(data=self.request.query_params)
+        serializer.is_valid(raise_exception=True)
+        return serializer.validated_data
+
+    def get_rollups(self, model, query):
+        return model.objects.filter(day__range=(query['start'], query['end']))
+
+    def rank(self, model, field, query, titles=None):
+        # the top groups of the range, with their titles read for the page only
+        rows = list(summarize(self.get_rollups(model, query), field)
+                    .order_by(query['ordering'], field)[:query['limit']])
+        if titles is not None:
+            titles = dict(titles.filter(pk__in=[row[field] for row in rows])
+                          .values_list('id', 'title'))
+            for row in rows:
+                row['title'] = titles.get(row[field], '')
+        return rows
+
+    @action(detail=False)
+    def daily(self, request):
+        # one of ?product_id=, ?collection_id= or ?membership=, every
+        # completed order otherwise, each order has exactly one tier
+        query = self.get_query()
+        if 'product_id' in query:
+            rollups = self.get_rollups(ProductSales, query).filter(product_id=query['product_id'])
+        elif 'collection_id' in query:
+            rollups = self.get_rollups(CollectionSales, query) \
+                .filter(collection_id=query['collection_id'])
+        elif 'membership' in query:
+            rollups = self.get_rollups(MembershipSales, query) \
+                .filter(membership=query['membership'])
+        else:
+            rollups = self.get_rollups(MembershipSales, query)
+        rows = summarize(rollups, 'day').order_by('day')
+        return Response(serializers.DailySalesSerializer(rows, many=True).data)
+
+    @action(detail=False)
+    def products(self, request):
+        query = self.get_query()
+        rows = self.rank(ProductSales, 'product_id', query, Product.objects.all())
+        return Response(serializers.ProductSalesSerializer(rows, many=True).data)
+
+    @action(detail=False)
+    def collections(self, request):
+        query = self.get_query()
+        rows = self.rank(CollectionSales, 'collection_id', query, Collection.objects.all())
+        return Response(serializers.CollectionSalesSerializer(rows, many=True).data)
+
+    @action(detail=False)
+    def memberships(self, request):
+        query = self.get_query()
+        rows = self.rank(MembershipSales, 'membership', query)
+        return Response(serializers.MembershipSalesSerializer(rows, many=True).data)
+
+
+class MetricsView(APIView):
+    # histograms recorded by store.profiling.ProfilingMiddleware,
+    # ?format=prometheus for the Prometheus text format
+    permission_classes = [IsAdminUser]
+    renderer_classes = [*api_settings.DEFAULT_RENDERER_CLASSES, PrometheusRenderer]
+
+    def get(self, request):
+        return Response(registry.summary())
+
+    def delete(self, request):
+        registry.reset()
+        return Response(status=status.HTTP_204_NO_CONTENT)
@@ -51,12 +51,15 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    # first, so its timings include every other middleware
+    'store.profiling.ProfilingMiddleware',
     'debug_toolbar.middleware.DebugToolbarMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'store.dbrouting.ReplicaRoutingMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -101,6 +104,19 @@ DATABASES = {
     }
 }
 
+# Reads of the store, tags and likes viewsets go to these aliases of
+# DATABASES, replicas of 'default' (give them 'TEST': {'MIRROR': 'default'}).
+# With none, everything uses 'default'.
+DATABASE_ROUTERS = ['store.dbrouting.ReplicaRouter']
+STORE_DB_REPLICAS = []
+# replicas further behind are skipped, lag is checked every interval
+STORE_REPLICA_MAX_LAG = 5
+STORE_REPLICA_CHECK_INTERVAL = 10
+# clients read from 'default' for this long after a write, more than the lag
+STORE_REPLICA_STICKY_SECONDS = 10
+# cap on how long responses read from a replica are cached
+STORE_REPLICA_CACHE_TIMEOUT = 30
+
 
 # Password validation
 # https://docs.djangoproject.com/en/3.2/ref/settings/#auth-password-validators
@@ -148,10 +164,26 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 REST_FRAMEWORK = {
     'COERCE_DECIMAL_TO_STRING': False,
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        'store.authentication.JWTAuthentication',
     )
 }
 
+# how long store.authentication caches the user of a token
+STORE_PRINCIPAL_CACHE_TIMEOUT = 60
+# and store.permissions the users' permission sets, versioned
+STORE_PERMISSIONS_CACHE_TIMEOUT = 60
+
+# Without CACHES every process has its own local memory cache, and a
+# change made in one process shows in the others only once the entries
+# above expire, so keep the timeouts short. With a shared cache they can
+# be raised, `manage.py check --deploy` warns when there is none (store.W001):
+# CACHES = {
+#     'default': {
+#         'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+#         'LOCATION': 'redis://127.0.0.1:6379/1',
+#     }
+# }
+
 SIMPLE_JWT = {
     'AUTH_HEADER_TYPES': ('JWT',),
     'ACCESS_TOKEN_LIFETIME': timedelta(days=1)
@@ -164,3 +196,27 @@ DJOSER = {
         'user_create': 'core.serializers.UserCreateSerializer'
     }
 }
+
+# Where anonymous carts live until checkout, see store.carts.
+# 'store.carts.KeyValueCartStore' keeps them in Redis (STORE_CART_REDIS_URL)
+# or in process memory when no URL is set.
+STORE_CART_BACKEND = 'store.carts.ORMCartStore'
+STORE_CART_TTL = 7 * 24 * 60 * 60
+
+# Like counters are buffered per process and written in batches, see
+# likes.counters. 0 writes every like right away.
+LIKES_COUNTER_FLUSH_INTERVAL = 5
+LIKES_COUNTER_MAX_PENDING = 1000
+
+# Sampled request profiling, see store.profiling. Histograms are served to
+# staff at /store/metrics/ (?format=prometheus for Prometheus).
+STORE_PROFILING = False
+STORE_PROFILING_SAMPLE_RATE = 0.1
+
+# Serve the product, collection, review and cart reads with async views,
+# for ASGI deployments (uvicorn storefront.asgi:application).
+STORE_ASYNC_VIEWS = False
+
+# Sales rollups, see store.analytics. Orders changed more recently than this
+# wait for the next update_sales_rollups run, longer than any transaction.
+STORE_ANALYTICS_SETTLE_SECONDS = 60
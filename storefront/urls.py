@@ -20,6 +20,7 @@ from rest_framework_simplejwt.views import (
     TokenObtainPairView,
     TokenRefreshView,
 )
+from store.authentication import TokenObtainPairSerializer
 
 admin.site.site_header = 'Storefront Admin'
 admin.site.index_title = 'Admin'
@@ -27,8 +28,11 @@ admin.site.index_title = 'Admin'
 urlpatterns = [
     path('admin/', admin.site.urls),
     path('auth/', include('djoser.urls')),
+    # tokens carry the claims store.authentication.JWTAuthentication reads
+    path('auth/jwt/create/', TokenObtainPairView.as_view(serializer_class=TokenObtainPairSerializer)),
     path('auth/', include('djoser.urls.jwt')),
-    path('api/token/', TokenObtainPairView.as_view(), name='token_obtain_pair'),
+    path('api/token/', TokenObtainPairView.as_view(serializer_class=TokenObtainPairSerializer),
+         name='token_obtain_pair'),
     path('api/token/refresh/', TokenRefreshView.as_view(), name='token_refresh'),
     path('store/', include('store.urls')),
     path('playground/', include('playground.urls')),
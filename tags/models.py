@@ -2,6 +2,8 @@ from django.db import models
 from django.contrib.contenttypes.models import ContentType
 from django.contrib.contenttypes.fields import GenericForeignKey
 
+from core.generic import generic_condition, group_by_content_type
+
 
 class TaggedItemManager(models.Manager):
     def get_tags_for(self, obj_type, obj_id):
@@ -14,6 +16,22 @@ class TaggedItemManager(models.Manager):
                 object_id=obj_id
             )
 
+    def get_tags_for_many(self, targets):
+        """
+        Returns {(model, id): [tags]} for (model, ids) pairs, from a
+        single query whatever the number of models and ids.
+        """
+        groups = group_by_content_type(targets)
+        tags = {}
+        if not groups:
+            return tags
+        for item in self.select_related('tag') \
+                .filter(generic_condition(groups)) \
+                .order_by('tag__label'):
+            model, _ = groups[item.content_type_id]
+            tags.setdefault((model, item.object_id), []).append(item.tag)
+        return tags
+
 
 class Tag(models.Model):
     label = models.CharField(max_length=255)
@@ -28,3 +46,24 @@ class TaggedItem(models.Model):
     content_type = models.ForeignKey(ContentType, on_delete=models.CASCADE)
     object_id = models.PositiveIntegerField()
     content_object = GenericForeignKey()
+
+    class Meta:
+        # generic relations are always looked up by both columns
+        indexes = [
+            models.Index(fields=['content_type', 'object_id'],
+                         name='tags_taggeditem_object_idx'),
+        ]
+
+
+def prefetch_tags(instances, to_attr='tags'):
+    """
+    Sets `to_attr` on each instance to its list of tags, loading them
+    for all the instances, of any models, in one query. The tags
+    counterpart of prefetch_related_objects.
+    """
+    ids = {}
+    for instance in instances:
+        ids.setdefault(type(instance), []).append(instance.pk)
+    tags = TaggedItem.objects.get_tags_for_many(ids.items())
+    for instance in instances:
+        setattr(instance, to_attr, tags.get((type(instance), instance.pk), []))